@@ -1,11 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import asyncio
+import anyio
+import gc
 import pandas as pd
 import numpy as np
-from joblib import load
 import os
-from typing import Literal, List, Dict
+from typing import Literal, List, Dict, Optional
 import logging
+import threading
+import time
+
+from utils.features import FEATURE_COLS
+from utils.indicators import IndicatorEngine, WARMUP_BARS, bar_time as parse_bar_time, feature_vector
+from utils.outliers import FILTER_FILE, load_filter
+from utils.batcher import MicroBatcher, QueueFullError
+from utils.cache import PredictionCache
+from utils.registry import ModelRegistry, process_rss_bytes
+from utils.stream import RegimeStream
+from utils.prediction_log import PredictionLog
+from utils import metrics
+from utils.payload import latest_feature_entry, latest_columnar_entry, latest_binary_row, decode_columnar
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,34 +34,112 @@ PAIRS = [
     'USDCHF', 'USDHKD', 'USDNOK', 'USDSEK'
 ]
 MODEL_PATH = "models"
-FEATURE_COLS = [
-    'open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume',
-    'sma_14', 'adx_14', 'stoch_k', 'rsi_14', 'cci_20', 'roc_10', 'atr_14',
-    'bb_width', 'obv', 'mfi_14', 'macd_line', 'macd_hist', 'candle_body', 'candle_range'
-]
+PREDICTOR = os.getenv("PREDICTOR", "lightgbm")  # "lightgbm" or "compiled"
+MICRO_BATCH_WAIT_MS = float(os.getenv("MICRO_BATCH_WAIT_MS", "0"))  # 0 disables micro-batching
+MICRO_BATCH_MAX_ROWS = int(os.getenv("MICRO_BATCH_MAX_ROWS", "64"))
+MICRO_BATCH_MAX_QUEUE = int(os.getenv("MICRO_BATCH_MAX_QUEUE", "1000"))
+PREDICTION_CACHE_MB = float(os.getenv("PREDICTION_CACHE_MB", "0"))  # 0 disables the cache
+BROKER_UTC_OFFSET_HOURS = float(os.getenv("BROKER_UTC_OFFSET_HOURS", "0"))  # Bars open on the broker's clock, e.g. 2 or 3
+LAZY_MODELS = os.getenv("LAZY_MODELS", "0") == "1"  # Load each pair on its first request
+MODEL_LOAD_WORKERS = int(os.getenv("MODEL_LOAD_WORKERS", "4"))
+MODEL_WATCH_SECONDS = float(os.getenv("MODEL_WATCH_SECONDS", "10"))  # 0 disables hot reload
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "100"))  # Per worker process
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))  # Unsent messages before a client is dropped
+STREAM_MAX_BARS = int(os.getenv("STREAM_MAX_BARS", "500"))  # Bars accepted in one message
+PREDICTION_LOG_PATH = os.getenv("PREDICTION_LOG_PATH", "")  # SQLite file; empty disables logging
+PREDICTION_LOG_RETENTION_DAYS = float(os.getenv("PREDICTION_LOG_RETENTION_DAYS", "0"))  # 0 keeps everything
 
 trend_map = {-1: "Downtrend", 0: "Ranging", 1: "Uptrend"}
 vol_map = {0: "Low", 1: "Medium", 2: "High"}
 
+# === Model Registry ===
+def _on_model_swap(pair):
+    # Called from the watcher thread; cached results are from the old model
+    if prediction_cache is not None and main_loop is not None:
+        main_loop.call_soon_threadsafe(prediction_cache.clear)
+
+registry = ModelRegistry(
+    MODEL_PATH, PAIRS,
+    compiled=PREDICTOR == "compiled",
+    lazy=LAZY_MODELS,
+    on_swap=_on_model_swap
+)
+main_loop = None
+models_preloaded = False  # Set in the gunicorn master, which then also runs the hot reload
+
+# === Prediction log (written off the request path by a background thread) ===
+prediction_log = None
+
+def start_prediction_log():
+    global prediction_log
+    if PREDICTION_LOG_PATH:
+        prediction_log = PredictionLog(
+            PREDICTION_LOG_PATH,
+            retention_days=PREDICTION_LOG_RETENTION_DAYS or None
+        ).start()
+        logger.info(f"Logging predictions to {PREDICTION_LOG_PATH}")
+
+def preload_models():
+    """Load every pair before gunicorn forks its workers (see gunicorn.conf.py).
+
+    The workers inherit the loaded models as copy-on-write pages. Freezing the
+    collector keeps the cycle GC from touching, and so copying, those objects.
+    """
+    global models_preloaded
+    registry.load_all(MODEL_LOAD_WORKERS)
+    gc.freeze()
+    models_preloaded = True
+
+@asynccontextmanager
+async def lifespan(app):
+    global main_loop
+    main_loop = asyncio.get_running_loop()
+    if not LAZY_MODELS and not registry.ready():
+        await run_in_threadpool(registry.load_all, MODEL_LOAD_WORKERS)
+    # Preloaded models are watched by the gunicorn master instead: a reload
+    # in a worker would give it a private copy (see gunicorn.conf.py)
+    if MODEL_WATCH_SECONDS > 0 and not models_preloaded:
+        registry.watch(MODEL_WATCH_SECONDS)
+    start_batcher()
+    start_prediction_log()
+    yield
+    if batcher is not None:
+        await batcher.close()
+    registry.stop()
+    if prediction_log is not None:
+        prediction_log.close()
+
 # === FastAPI App ===
-app = FastAPI(title="Forex Prediction API (With Features Provided)")
+app = FastAPI(title="Forex Prediction API (With Features Provided)", lifespan=lifespan)
+app.add_middleware(
+    metrics.MetricsMiddleware,
+    paths=["/predict", "/predict_bars", "/predict_batch", "/predict_columnar"]
+)
 
-# === Load Models at Startup ===
-trend_models = {}
-vol_models = {}
+def _require_models(pair):
+    models = registry.get(pair)
+    if models is None:
+        raise HTTPException(status_code=404, detail=f"Models not found for {pair}")
+    return models
 
-@app.on_event("startup")
-def load_models():
-    for pair in PAIRS:
-        try:
-            trend_models[pair] = load(os.path.join(MODEL_PATH, f"{pair}_model.joblib"))
-            vol_models[pair] = load(os.path.join(MODEL_PATH, f"{pair}_vol_model.joblib"))
-            logger.info(f"Loaded type for {pair}: {type(trend_models[pair])}")
-            logger.info(f"Loaded type for {pair}: {type(vol_models[pair])}")
+async def _require_models_async(pair):
+    # Lazy loads read from disk, so keep them off the event loop
+    if registry.is_loaded(pair):
+        return registry.get(pair)
+    return await run_in_threadpool(_require_models, pair)
 
+# === Outlier filter for raw bars: the state saved by training, next to the models ===
+outlier_filter = load_filter(MODEL_PATH)
+if outlier_filter is None:
+    logger.warning(f"No {FILTER_FILE} in {MODEL_PATH}: raw bars are used without outlier replacement")
 
-        except Exception as e:
-            print(f"[ERROR] Could not load model for {pair}: {e}")
+def _clean_bars(pair, bars):
+    # Replaces outliers exactly as training did and keeps learning from new bars
+    return bars if outlier_filter is None else outlier_filter.clean_bars(pair, bars)
+
+# === Per-pair indicator state for raw OHLCV requests ===
+bar_engines = {}
+bar_locks = {pair: threading.Lock() for pair in PAIRS}
 
 # === Request Schema ===
 class FeatureInput(BaseModel):
@@ -53,42 +149,423 @@ class FeatureInput(BaseModel):
     ]
     data: List[Dict]  # Already processed with all feature columns
 
+class BarInput(BaseModel):
+    pair: Literal[
+        'AUDUSD', 'EURUSD', 'GBPUSD', 'NZDUSD', 'USDCAD',
+        'USDCHF', 'USDHKD', 'USDNOK', 'USDSEK'
+    ]
+    bars: List[Dict]  # Raw closed bars (time + OHLCV), oldest first
+    reset: bool = False  # Drop the stored state and rebuild from these bars
+
+class BatchInput(BaseModel):
+    items: List[FeatureInput]  # Any subset of PAIRS, one entry per request
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+def readiness_check():
+    # Passes once every pair's models are loaded in this worker
+    if not registry.ready():
+        missing = [pair for pair in PAIRS if not registry.is_loaded(pair)]
+        raise HTTPException(status_code=503, detail=f"Models not loaded: {missing}")
+    return {"status": "ready", "pid": os.getpid()}
+
+@app.get("/models")
+def model_info():
+    return {"ready": registry.ready(), "models": registry.snapshot()}
+
+# Score feature rows with both of a pair's models
+def _predict_rows(pair, X):
+    trend_model, vol_model = _require_models(pair)
+    with metrics.stage("trend_predict", pair):
+        trend_preds = trend_model.predict(X)
+    with metrics.stage("vol_predict", pair):
+        vol_preds = vol_model.predict(X)
+    results = [
+        {
+            "pair": pair,
+            "trend_class": int(trend_pred),
+            "trend_label": trend_map.get(trend_pred, "Unknown"),
+            "vol_class": int(vol_pred),
+            "vol_label": vol_map.get(vol_pred, "Unknown")
+        }
+        for trend_pred, vol_pred in zip(trend_preds, vol_preds)
+    ]
+    return results
+
+def _predict_row(pair, values):
+    return _predict_rows(pair, np.array(values).reshape(1, -1))[0]
+
+# Every served prediction is logged once, cache hits included, with the time
+# of the bar it scored in pred.py's format, so the two logs join on bar_time
+def _log_predictions(results, bar_times):
+    if prediction_log is None:
+        return
+    prediction_log.log_many([dict(result, bar_time=_log_bar_time(t)) for result, t in zip(results, bar_times)])
+
+def _log_bar_time(value):
+    if value is None:
+        return None
+    try:
+        return str(parse_bar_time(value))
+    except (TypeError, ValueError):
+        return str(value)
+
+def _predict_stream(pair, values, bar_time):
+    result = _predict_row(pair, values)
+    _log_predictions([result], [bar_time])
+    return result
+
+# === Micro-batching of concurrent /predict calls ===
+batcher = None
+
+def start_batcher():
+    global batcher
+    if MICRO_BATCH_WAIT_MS > 0:
+        batcher = MicroBatcher(
+            metrics.background("micro_batch")(_predict_rows),
+            max_wait_ms=MICRO_BATCH_WAIT_MS,
+            max_rows=MICRO_BATCH_MAX_ROWS,
+            max_queue=MICRO_BATCH_MAX_QUEUE
+        )
+        logger.info(f"Micro-batching enabled: {MICRO_BATCH_WAIT_MS} ms window, {MICRO_BATCH_MAX_ROWS} rows max")
+
+# === Prediction cache keyed by (pair, last complete bar time, feature vector) ===
+# Cached results expire when the broker's H4 bar closes: at 00/04/.../20 server time
+prediction_cache = PredictionCache(
+    int(PREDICTION_CACHE_MB * 1024 * 1024), offset=-int(BROKER_UTC_OFFSET_HOURS * 3600)
+) if PREDICTION_CACHE_MB > 0 else None
+
+async def _score(pair, bar_time, values):
+    if prediction_cache is None:
+        result = await _score_uncached(pair, values)
+    else:
+        key = (pair, bar_time, tuple(values))
+        result = await prediction_cache.get_or_compute(key, lambda: _score_uncached(pair, values))
+    _log_predictions([result], [bar_time])
+    return result
+
+async def _score_uncached(pair, values):
+    if batcher is not None:
+        return await batcher.submit(pair, values)
+    return await run_in_threadpool(_predict_row, pair, values)
+
+@app.get("/cache/stats")
+def cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return dict(prediction_cache.snapshot(), enabled=True)
+
+# === Prometheus Metrics ===
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    # Per process: with several workers each scrape reflects one worker
+    model_info = registry.snapshot()
+    memory = [({"pair": pair, "model": kind}, info[kind]["resident_bytes"])
+              for pair, info in model_info.items() for kind in ("trend", "vol")]
+    files = [({"pair": pair, "model": kind}, info[kind]["file_bytes"])
+             for pair, info in model_info.items() for kind in ("trend", "vol")]
+    extra = [
+        metrics.gauge_lines("process_resident_memory_bytes", "Resident memory size in bytes.",
+                            [({}, process_rss_bytes())]),
+        metrics.gauge_lines("forex_api_model_resident_bytes",
+                            "Approximate resident memory added by loading each model.", memory),
+        metrics.gauge_lines("forex_api_model_file_bytes", "Size of each model file.", files),
+        metrics.gauge_lines("forex_api_models_loaded", "Pairs with both models loaded.",
+                            [({}, len(model_info))]),
+    ]
+    if prediction_cache is not None:
+        extra.append(metrics.gauge_lines(
+            "forex_api_cache_events_total", "Prediction cache events.",
+            [({"event": event}, count) for event, count in prediction_cache.stats.items()], kind="counter"
+        ))
+        extra.append(metrics.gauge_lines("forex_api_cache_bytes", "Approximate prediction cache size.",
+                                         [({}, prediction_cache.bytes)]))
+    stream_stats = regime_stream.snapshot()
+    extra.append(metrics.gauge_lines("forex_api_stream_subscribers", "Open /stream connections.",
+                                     [({}, stream_stats.pop("subscribers"))]))
+    stream_stats.pop("max_subscribers")
+    extra.append(metrics.gauge_lines(
+        "forex_api_stream_events_total", "Streamed bars, predictions, regime changes and messages.",
+        [({"event": event}, count) for event, count in stream_stats.items()], kind="counter"
+    ))
+    if prediction_log is not None:
+        extra.append(metrics.gauge_lines(
+            "forex_api_prediction_log_events_total", "Prediction log rows, transactions, drops and errors.",
+            [({"event": event}, count) for event, count in prediction_log.stats.items()], kind="counter"
+        ))
+        extra.append(metrics.gauge_lines("forex_api_prediction_log_queue", "Batches waiting to be written.",
+                                         [({}, prediction_log.queue.qsize())]))
+    if batcher is not None:
+        extra.append(metrics.gauge_lines(
+            "forex_api_micro_batch_events_total", "Micro-batcher requests, batches and rejections.",
+            [({"event": event}, count) for event, count in batcher.stats.items()], kind="counter"
+        ))
+    return PlainTextResponse(metrics.render(extra), media_type="text/plain; version=0.0.4")
+
 # === Prediction Endpoint ===
 @app.post("/predict")
-def predict(request: FeatureInput):
+@metrics.timed
+async def predict(request: FeatureInput):
+    metrics.set_pair(request.pair)
+    if batcher is None and prediction_cache is None:
+        return await run_in_threadpool(_predict_frame, request)
+
     pair = request.pair
-    if pair not in trend_models or pair not in vol_models:
-        raise HTTPException(status_code=404, detail=f"Models not found for {pair}")
+    await _require_models_async(pair)
+
+    try:
+        with metrics.stage("extract"):
+            bar_time, values = latest_feature_entry(request.data, FEATURE_COLS)
+        with metrics.stage("score"):
+            return await _score(pair, bar_time, values)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+def _predict_frame(request: FeatureInput):
+    pair = request.pair
+    _require_models(pair)
 
     try:
-        df = pd.DataFrame(request.data)
+        with metrics.stage("dataframe"):
+            df = pd.DataFrame(request.data)
 
         # Check all required features are present
-        missing_cols = [col for col in FEATURE_COLS if col not in df.columns]
+        with metrics.stage("validation"):
+            missing_cols = [col for col in FEATURE_COLS if col not in df.columns]
         if missing_cols:
             raise ValueError(f"Missing feature columns: {missing_cols}")
 
-        df = df.dropna(subset=FEATURE_COLS)
+        with metrics.stage("dropna"):
+            # Infinite values are missing too, as on the other request paths (utils/payload.py)
+            df = df.replace([np.inf, -np.inf], np.nan).dropna(subset=FEATURE_COLS)
         if df.empty:
             raise ValueError("No complete row with all features available.")
 
         latest = df.iloc[-1]
         X = latest[FEATURE_COLS].values.reshape(1, -1)
 
-        trend_pred = trend_models[pair].predict(X)[0]
-        vol_pred = vol_models[pair].predict(X)[0]
+        result = _predict_rows(pair, X)[0]
+        _log_predictions([result], [latest.get('time')])
+        return result
 
-        return {
-            "pair": pair,
-            "trend_class": int(trend_pred),
-            "trend_label": trend_map.get(trend_pred, "Unknown"),
-            "vol_class": int(vol_pred),
-            "vol_label": vol_map.get(vol_pred, "Unknown")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+# === Raw OHLCV Prediction Endpoint ===
+@app.post("/predict_bars")
+@metrics.timed
+def predict_bars(request: BarInput):
+    pair = request.pair
+    metrics.set_pair(pair)
+    _require_models(pair)
+
+    try:
+        # Only bars newer than the stored state are consumed, so resending an
+        # overlapping window costs one indicator update per new bar.
+        with bar_locks[pair]:
+            with metrics.stage("outliers"):
+                bars = _clean_bars(pair, request.bars)
+            with metrics.stage("indicators"):
+                engine = bar_engines.get(pair)
+                if engine is None or request.reset:
+                    engine = IndicatorEngine()
+                    bar_engines[pair] = engine
+                engine.extend(bars)
+                latest = engine.latest
+                latest_time = engine.last_time
+
+        values = feature_vector(latest, FEATURE_COLS)
+        if values is None:
+            raise ValueError(
+                f"Not enough bars to compute all features for {pair} "
+                f"(have {engine.bars_seen}, need {WARMUP_BARS})."
+            )
+
+        result = _predict_row(pair, values)
+        _log_predictions([result], [latest_time])
+        result["time"] = latest_time.isoformat()
+        return result
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+# === Multi-pair Batch Prediction Endpoint ===
+@app.post("/predict_batch")
+@metrics.timed
+def predict_batch(request: BatchInput):
+    batch_start = time.perf_counter()
+    predictions = [None] * len(request.items)
+    errors = {}
+    per_pair_ms = {}
+
+    # Group the latest complete row of every item by pair (one model pair each)
+    groups = {}
+    for i, item in enumerate(request.items):
+        pair = item.pair
+        start = time.perf_counter()
+        if registry.get(pair) is None:
+            errors[i] = {"pair": pair, "error": f"Models not found for {pair}"}
+            continue
+        try:
+            with metrics.stage("extract", pair):
+                bar_time, row = latest_feature_entry(item.data, FEATURE_COLS)
+        except Exception as e:
+            errors[i] = {"pair": pair, "error": f"Prediction error: {str(e)}"}
+            continue
+        rows, indices, bar_times = groups.setdefault(pair, ([], [], []))
+        rows.append(row)
+        indices.append(i)
+        bar_times.append(bar_time)
+        per_pair_ms[pair] = per_pair_ms.get(pair, 0.0) + (time.perf_counter() - start) * 1000
+
+    # One vectorized call per model
+    for pair, (rows, indices, bar_times) in groups.items():
+        start = time.perf_counter()
+        try:
+            results = _predict_rows(pair, np.array(rows))
+        except Exception as e:
+            for i in indices:
+                errors[i] = {"pair": pair, "error": f"Prediction error: {str(e)}"}
+            continue
+        _log_predictions(results, bar_times)
+        for i, result in zip(indices, results):
+            predictions[i] = dict(result, index=i)
+        per_pair_ms[pair] += (time.perf_counter() - start) * 1000
+
+    return {
+        "predictions": [p for p in predictions if p is not None],
+        "errors": errors,
+        "latency_ms": {
+            "batch": round((time.perf_counter() - batch_start) * 1000, 3),
+            "per_pair": {pair: round(ms, 3) for pair, ms in per_pair_ms.items()}
         }
+    }
+
+# === Columnar / Binary Prediction Endpoint ===
+@app.post("/predict_columnar")
+@metrics.timed
+async def predict_columnar(request: Request, pair: Optional[str] = None, dtype: Literal['f4', 'f8'] = 'f8'):
+    # Bypasses pydantic and pandas: only the trailing complete row is converted.
+    # JSON/msgpack bodies are {"pair": ..., "columns": {field: [...]}}; an
+    # application/octet-stream body is raw little-endian column arrays in
+    # FEATURE_COLS order with the pair given as a query parameter.
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    # The body is read here rather than by FastAPI, so "decode" includes it
+    with metrics.stage("decode"):
+        body = await request.body()
+        try:
+            if content_type == "application/octet-stream":
+                bar_time = None
+                values = latest_binary_row(body, len(FEATURE_COLS), dtype)
+            else:
+                payload = decode_columnar(body, content_type)
+                pair = payload.get("pair", pair)
+                bar_time, values = latest_columnar_entry(payload["columns"], FEATURE_COLS)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid payload: {str(e)}")
+
+        if pair not in PAIRS:
+            raise HTTPException(status_code=422, detail=f"Unknown pair: {pair}")
+        metrics.set_pair(pair)
+
+    await _require_models_async(pair)
 
+    try:
+        with metrics.stage("score"):
+            return await _score(pair, bar_time, values)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+# === Regime Change Stream ===
+regime_stream = RegimeStream(
+    metrics.background("/stream")(_predict_stream),
+    FEATURE_COLS,
+    clean_fn=_clean_bars,
+    max_subscribers=STREAM_MAX_SUBSCRIBERS,
+    max_queue=STREAM_QUEUE_SIZE
+)
+
+@app.get("/stream/stats")
+def stream_stats():
+    return regime_stream.snapshot()
+
+@app.websocket("/stream")
+async def stream(websocket: WebSocket):
+    # Client messages (JSON):
+    #   {"action": "subscribe" | "unsubscribe", "pairs": [...]}
+    #   {"action": "bars", "pair": ..., "bars": [closed OHLCV bars, oldest first]}
+    # Server messages: "snapshot" (current regime on subscribe), "regime"
+    # (trend_label or vol_label changed) and "error".
+    await websocket.accept()
+    subscriber = regime_stream.add_subscriber()
+    if subscriber is None:
+        await websocket.close(code=1013, reason="Too many subscribers")
+        return
+
+    async def send_loop():
+        while True:
+            message = await subscriber.queue.get()
+            if subscriber.overflowed:
+                await websocket.close(code=1013, reason="Client too slow")
+                return
+            await websocket.send_json(message)
+
+    async def receive_loop():
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                subscriber.offer({"type": "error", "detail": "Messages must be JSON"})
+                continue
+            try:
+                await _handle_stream_message(subscriber, message)
+            except HTTPException as e:
+                subscriber.offer({"type": "error", "detail": e.detail})
+            except Exception as e:
+                subscriber.offer({"type": "error", "detail": f"Prediction error: {str(e)}"})
+
+    async def run_until_closed(loop):
+        # Whichever side stops first (disconnect or slow client) ends both
+        try:
+            await loop()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            tasks.cancel_scope.cancel()
+
+    try:
+        async with anyio.create_task_group() as tasks:
+            tasks.start_soon(run_until_closed, send_loop)
+            tasks.start_soon(run_until_closed, receive_loop)
+    finally:
+        regime_stream.remove_subscriber(subscriber)
+
+async def _handle_stream_message(subscriber, message):
+    action = message.get("action") if isinstance(message, dict) else None
+    if action in ("subscribe", "unsubscribe"):
+        pairs = message.get("pairs", [])
+        unknown = [pair for pair in pairs if pair not in PAIRS]
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown pairs: {unknown}")
+        if action == "subscribe":
+            regime_stream.subscribe(subscriber, pairs)
+        else:
+            regime_stream.unsubscribe(subscriber, pairs)
+    elif action == "bars":
+        pair, bars = message.get("pair"), message.get("bars", [])
+        if pair not in PAIRS:
+            raise HTTPException(status_code=422, detail=f"Unknown pair: {pair}")
+        if len(bars) > STREAM_MAX_BARS:
+            raise HTTPException(status_code=422, detail=f"At most {STREAM_MAX_BARS} bars per message")
+        await _require_models_async(pair)
+        await regime_stream.push(pair, bars)
+    else:
+        raise HTTPException(status_code=422, detail=f"Unknown action: {action}")
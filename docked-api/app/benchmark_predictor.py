@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import load
+
+from app_main import PAIRS, MODEL_PATH, FEATURE_COLS
+from utils.compiled import CompiledModel
+
+# Compares LightGBM's predict with the compiled NumPy evaluator on the same
+# feature rows: class outputs must be identical, then single-row and full-batch
+# latency are timed for each path. The NumPy traversal is forced for every
+# batch size here; in the API batches above MAX_COMPILED_ROWS go to LightGBM.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--input", default="../../sample_input.json")
+parser.add_argument("--repeats", type=int, default=200)
+args = parser.parse_args()
+
+payload = json.load(open(args.input))
+X = pd.DataFrame(payload["data"]).dropna(subset=FEATURE_COLS)[FEATURE_COLS].values
+print(f"Loaded {len(X)} rows from {args.input}\n")
+
+
+def time_ms(fn, rows, repeats):
+    fn(rows)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(rows)
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+results = []
+for pair in PAIRS:
+    for kind, filename in [("trend", f"{pair}_model.joblib"), ("vol", f"{pair}_vol_model.joblib")]:
+        path = os.path.join(MODEL_PATH, filename)
+        if not os.path.exists(path):
+            print(f"[SKIPPED] {path} not found")
+            continue
+
+        model = load(path)
+        start = time.perf_counter()
+        compiled = CompiledModel(model, max_rows=None)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        if not np.array_equal(model.predict(X), compiled.predict(X)):
+            raise AssertionError(f"Compiled predictions differ for {filename}")
+
+        row = X[-1:]
+        results.append({
+            "model": f"{pair} {kind}",
+            "compile_ms": compile_ms,
+            "lgbm_row_ms": time_ms(model.predict, row, args.repeats),
+            "compiled_row_ms": time_ms(compiled.predict, row, args.repeats),
+            "lgbm_batch_ms": time_ms(model.predict, X, max(args.repeats // 10, 1)),
+            "compiled_batch_ms": time_ms(compiled.predict, X, max(args.repeats // 10, 1)),
+        })
+
+summary = pd.DataFrame(results).set_index("model")
+pd.set_option("display.width", 120)
+print(summary.round(3))
+print("\nMean speed-up (single row):", round((summary.lgbm_row_ms / summary.compiled_row_ms).mean(), 2))
+print(f"Mean speed-up (batch of {len(X)}):", round((summary.lgbm_batch_ms / summary.compiled_batch_ms).mean(), 2))
+print("All compiled predictions identical to model.predict.")
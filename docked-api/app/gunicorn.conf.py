@@ -0,0 +1,50 @@
+# Multi-process serving: gunicorn -c gunicorn.conf.py app_main:app
+#
+# The app is imported once in the master and the models are loaded there
+# before forking, so every worker shares the same read-only model pages
+# instead of holding its own copy.
+#
+# Hot reload runs in the master for the same reason: a worker that reloaded a
+# pair itself would hold a private copy of it. The master reloads the changed
+# pairs and sends itself SIGHUP, which forks fresh workers (sharing the new
+# models) and stops the old ones gracefully. Recycled workers lose their
+# per-process state: prediction cache, /predict_bars indicators and /stream
+# connections (clients reconnect).
+import gc
+import os
+import signal
+import threading
+import time
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_WORKERS", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 60
+
+
+def when_ready(server):
+    # Runs in the master after the app import, before any worker is forked
+    import app_main
+    if not app_main.LAZY_MODELS:
+        app_main.preload_models()
+        server.log.info(f"Preloaded models for {len(app_main.PAIRS)} pairs")
+        if app_main.MODEL_WATCH_SECONDS > 0:
+            threading.Thread(target=_watch_models, args=(server, app_main.registry, app_main.MODEL_WATCH_SECONDS),
+                             name="model-watcher", daemon=True).start()
+
+
+def _watch_models(server, registry, interval):
+    swapped = []
+    registry.on_swap = swapped.append  # The master serves nothing, so there is no cache to clear
+    while True:
+        time.sleep(interval)
+        try:
+            registry.poll()
+        except Exception as e:
+            server.log.error(f"Model watcher error: {e}")
+        if swapped:
+            server.log.info(f"Reloaded models for {', '.join(swapped)}; replacing the workers")
+            swapped.clear()
+            gc.freeze()
+            os.kill(os.getpid(), signal.SIGHUP)
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Set
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class MicroBatcher:
+    """Gathers concurrent single-row requests per key into one batched call.
+
+    A batch for a key is flushed when it reaches `max_rows` or when its first
+    request has waited `max_wait_ms`, so batching never adds more than that
+    window to a request. `predict_fn(key, X)` runs in the threadpool and must
+    return one result per row of X. At most `max_queue` rows per key may be
+    waiting or in flight; further requests are rejected with QueueFullError.
+    Call close() on shutdown to flush what is queued and wait for it.
+    """
+
+    def __init__(self, predict_fn: Callable, max_wait_ms: float = 2.0,
+                 max_rows: int = 64, max_queue: int = 1000):
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait_ms / 1000
+        self.max_rows = max_rows
+        self.max_queue = max_queue
+        self.pending: Dict[str, List] = {}
+        self.timers: Dict[str, asyncio.TimerHandle] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.tasks: Set[asyncio.Task] = set()  # Running batches; the loop only keeps weak references
+        self.stats = {"requests": 0, "batches": 0, "rejected": 0}
+
+    async def submit(self, key: str, values: List[float]):
+        queue = self.pending.setdefault(key, [])
+        if len(queue) + self.in_flight.get(key, 0) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"Prediction queue full for {key}")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue.append((values, future))
+        self.stats["requests"] += 1
+
+        if len(queue) >= self.max_rows:
+            self._flush(key)
+        elif key not in self.timers:
+            self.timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key: str):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self.pending.pop(key, [])
+        if batch:
+            self.in_flight[key] = self.in_flight.get(key, 0) + len(batch)
+            task = asyncio.create_task(self._run(key, batch))
+            self.tasks.add(task)
+            task.add_done_callback(lambda done: self._done(done, key, batch))
+
+    def _done(self, task: asyncio.Task, key: str, batch: List):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Micro-batch for %s failed", key, exc_info=task.exception())
+        # Don't leave requests waiting on a batch that died
+        for _, future in batch:
+            if not future.done():
+                if task.cancelled():
+                    future.cancel()
+                else:
+                    future.set_exception(task.exception() or RuntimeError("Micro-batch returned too few results"))
+
+    async def close(self):
+        for key in list(self.pending):
+            self._flush(key)
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def _run(self, key: str, batch: List):
+        self.stats["batches"] += 1
+        try:
+            X = np.array([values for values, _ in batch])
+            results = await run_in_threadpool(self.predict_fn, key, X)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.in_flight[key] -= len(batch)
+
+        # Requests whose client went away are already cancelled
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,103 @@
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable
+
+H4_SECONDS = 4 * 60 * 60
+
+
+def next_bar_close(now: float, period: int = H4_SECONDS, offset: int = 0) -> float:
+    """Epoch seconds of the next bar boundary after `now`.
+
+    Boundaries fall on multiples of `period` in UTC, shifted by `offset`
+    seconds; a broker clock at UTC+2 has its H4 closes at offset -7200.
+    """
+    return ((now - offset) // period + 1) * period + offset
+
+
+def _entry_size(key, value) -> int:
+    # Rough resident size of one entry: key tuple, its items and the result dict
+    size = sys.getsizeof(key)
+    for part in key:
+        size += sys.getsizeof(part)
+        if isinstance(part, tuple):
+            size += sum(sys.getsizeof(item) for item in part)
+    size += sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return size
+
+
+class PredictionCache:
+    """LRU cache of prediction results that expires at the next H4 close.
+
+    `offset` shifts the H4 boundaries from UTC to the broker's server clock
+    (see next_bar_close).
+
+    Used from the event loop only. Concurrent misses for the same key share a
+    single computation that every caller awaits.
+    """
+
+    def __init__(self, max_bytes: int, period: int = H4_SECONDS, offset: int = 0):
+        self.max_bytes = max_bytes
+        self.period = period
+        self.offset = offset
+        self.entries = OrderedDict()  # key -> (expires_at, size, value)
+        self.in_flight = {}
+        self.generation = 0  # Bumped by clear() so in-flight results are not stored
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "collapsed": 0, "evictions": 0, "expirations": 0}
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[dict]]) -> dict:
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return dict(entry[2])
+            self._remove(key)
+            self.stats["expirations"] += 1
+
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.stats["collapsed"] += 1
+        else:
+            self.stats["misses"] += 1
+            # Run as its own task so a disconnecting caller does not cancel
+            # the computation the other waiters depend on
+            task = asyncio.ensure_future(compute())
+            self.in_flight[key] = task
+            generation = self.generation
+            task.add_done_callback(lambda done: self._finish(key, done, generation))
+        return dict(await asyncio.shield(task))
+
+    def _finish(self, key, task, generation):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled() and task.exception() is None and generation == self.generation:
+            self._store(key, task.result())
+
+    def _store(self, key, value):
+        size = _entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (next_bar_close(time.time(), self.period, self.offset), size, value)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        self.entries.clear()
+        self.in_flight.clear()
+        self.generation += 1
+        self.bytes = 0
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, entries=len(self.entries), bytes=self.bytes, max_bytes=self.max_bytes)
@@ -0,0 +1,146 @@
+import numpy as np
+
+# Flattened evaluator for the LightGBM trend/volatility models.
+# Every node of every tree is stored in contiguous arrays and leaves point to
+# themselves. Each vectorized step advances every (row, tree) pair that has not
+# reached a leaf yet, without per-call sklearn/LightGBM setup.
+
+ZERO_THRESHOLD = 1e-35  # LightGBM kZeroThreshold
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+
+
+# Above this many rows LightGBM's native batch predict is faster than NumPy
+MAX_COMPILED_ROWS = 16
+
+
+class CompiledModel:
+    """Drop-in `predict` for a fitted LGBMClassifier using pure NumPy traversal.
+
+    Batches larger than `max_rows` are handed to the wrapped model; pass
+    `max_rows=None` to always use the NumPy path.
+    """
+
+    def __init__(self, model, max_rows=MAX_COMPILED_ROWS):
+        self.model = model
+        self.max_rows = max_rows
+        booster = model.booster_
+        dump = booster.dump_model()
+        if dump['objective'].split()[0] not in ('multiclass', 'multiclassova', 'binary'):
+            raise ValueError(f"Unsupported objective: {dump['objective']}")
+
+        self.classes_ = np.asarray(model.classes_)
+        self.n_features = dump['max_feature_idx'] + 1
+        self.trees_per_iteration = dump['num_tree_per_iteration']
+
+        feature, threshold, left, right = [], [], [], []
+        default_left, missing_type, value = [], [], []
+        roots, depth = [], 0
+
+        for tree in dump['tree_info']:
+            roots.append(len(feature))
+            depth = max(depth, self._flatten(
+                tree['tree_structure'], feature, threshold, left, right,
+                default_left, missing_type, value
+            ))
+
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.missing_type = np.asarray(missing_type, dtype=np.int8)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        # Tree t contributes to class t % trees_per_iteration
+        self.class_matrix = np.eye(self.trees_per_iteration)[np.arange(len(roots)) % self.trees_per_iteration]
+        self.depth = depth
+        self.has_missing_rules = bool((self.missing_type != MISSING_NONE).any())
+
+    @staticmethod
+    def _flatten(node, feature, threshold, left, right, default_left, missing_type, value):
+        # Iterative pre-order walk; returns the depth of the tree
+        index = len(feature)
+        stack = [(node, index, 0)]
+        max_depth = 0
+        for _ in range(_count_nodes(node)):
+            feature.append(0)
+            threshold.append(0.0)
+            left.append(0)
+            right.append(0)
+            default_left.append(True)
+            missing_type.append(MISSING_NONE)
+            value.append(0.0)
+
+        next_free = index + 1
+        while stack:
+            node, i, level = stack.pop()
+            max_depth = max(max_depth, level)
+            if 'leaf_value' in node:
+                left[i] = right[i] = i
+                value[i] = node['leaf_value']
+                continue
+            if node['decision_type'] != '<=':
+                raise ValueError("Categorical splits are not supported.")
+            feature[i] = node['split_feature']
+            threshold[i] = node['threshold']
+            default_left[i] = node['default_left']
+            missing_type[i] = _MISSING_TYPES[node['missing_type']]
+            left[i], right[i] = next_free, next_free + 1
+            next_free += 2
+            stack.append((node['right_child'], right[i], level + 1))
+            stack.append((node['left_child'], left[i], level + 1))
+        return max_depth
+
+    def raw_score(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}")
+
+        n_trees = len(self.roots)
+        node = np.tile(self.roots, X.shape[0])  # row-major (row, tree)
+        active = np.arange(node.size)
+        for _ in range(self.depth):
+            # Drop (row, tree) pairs that already sit on a leaf
+            current = node[active]
+            internal = self.left[current] != current
+            active, current = active[internal], current[internal]
+            if not active.size:
+                break
+            fval = X[active // n_trees, self.feature[current]]
+            go_left = fval <= self.threshold[current]
+            if self.has_missing_rules or np.isnan(fval).any():
+                go_left = self._missing_direction(fval, current, go_left)
+            node[active] = np.where(go_left, self.left[current], self.right[current])
+
+        node = node.reshape(X.shape[0], n_trees)
+        return self.value[node] @ self.class_matrix
+
+    def _missing_direction(self, fval, node, go_left):
+        # Mirrors LightGBM NumericalDecision: NaN counts as 0 unless the split
+        # learned a NaN branch, and missing values follow default_left.
+        mtype = self.missing_type[node]
+        nan = np.isnan(fval)
+        fval = np.where(nan & (mtype != MISSING_NAN), 0.0, fval)
+        missing = ((mtype == MISSING_ZERO) & (np.abs(fval) <= ZERO_THRESHOLD)) | ((mtype == MISSING_NAN) & nan)
+        go_left = np.where(nan, fval <= self.threshold[node], go_left)
+        return np.where(missing, self.default_left[node], go_left)
+
+    def predict(self, X):
+        if self.max_rows is not None and len(X) > self.max_rows:
+            return self.model.predict(X)
+        scores = self.raw_score(X)
+        if self.trees_per_iteration == 1:
+            return self.classes_[(scores[:, 0] > 0).astype(int)]
+        return self.classes_[np.argmax(scores, axis=1)]
+
+
+def _count_nodes(node):
+    count, stack = 0, [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if 'leaf_value' not in node:
+            stack.append(node['left_child'])
+            stack.append(node['right_child'])
+    return count
@@ -0,0 +1,468 @@
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+# The one definition of every model feature, shared by training
+# (models-building/features), pred.py, getjson.py and the API. Features are
+# computed from OHLCV columns with pandas-ta 0.3.14b semantics; the
+# incremental IndicatorEngine in utils/indicators.py reproduces the serving
+# set bar by bar.
+#
+# Each feature (and each shared intermediate, named with a leading
+# underscore) is a step with declared inputs. `compute_features` resolves the
+# requested names to the steps they need, computes each step once and
+# returns only what was asked for, so intermediates such as the true range or
+# the 20-bar close mean are shared instead of recomputed.
+#
+# Steps are written against pandas objects, so the same code runs on one
+# pair's Series or on a panel (DataFrame, one column per pair).
+# `compute_panel_features` packs every pair into such a panel and computes
+# all of them in one vectorized pass; cross-sectional steps (e.g. USD
+# strength) see the pairs aligned on time.
+
+RAW_COLS = ['open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume']
+
+# Inputs of the trend and volatility models, in model column order
+FEATURE_COLS = RAW_COLS + [
+    'sma_14', 'adx_14', 'stoch_k', 'rsi_14', 'cci_20', 'roc_10', 'atr_14',
+    'bb_width', 'obv', 'mfi_14', 'macd_line', 'macd_hist', 'candle_body', 'candle_range'
+]
+
+EPSILON = np.finfo(float).eps  # pandas_ta non_zero_range guard
+
+
+class Step(NamedTuple):
+    inputs: Tuple[str, ...]
+    fn: Callable
+    cross_sectional: bool = False
+
+
+STEPS: Dict[str, Step] = {}
+
+
+def step(name, *inputs, cross_sectional=False):
+    def register(fn):
+        STEPS[name] = Step(inputs, fn, cross_sectional)
+        return fn
+    return register
+
+
+# === Moving averages (pandas_ta definitions) ===
+def sma(x, length):
+    return x.rolling(length, min_periods=length).mean()
+
+
+def rma(x, length):
+    """Wilder's moving average."""
+    return x.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+
+def ema(x, length):
+    """EMA seeded with the SMA of the first `length` values after any leading NaNs.
+
+    On a panel every column is seeded at its own first value.
+    """
+    values = x.to_numpy(dtype=float, copy=True)
+    matrix = values.reshape(len(values), -1)  # A view: writes go to `values`
+    rows = np.arange(len(matrix))[:, None]
+    valid = ~np.isnan(matrix)
+    first = np.where(valid.any(axis=0), valid.argmax(axis=0), len(matrix))
+    seed_row = first + length - 1
+    seed = np.where((rows >= first) & (rows <= seed_row), matrix, 0.0).sum(axis=0) / length
+    matrix[rows < seed_row] = np.nan
+    has_seed = seed_row < len(matrix)
+    matrix[seed_row[has_seed], np.flatnonzero(has_seed)] = seed[has_seed]
+    return _like(x, values).ewm(span=length, adjust=False).mean()
+
+
+def _rolling_mad(x, length):
+    # Mean absolute deviation from each window's own mean (pandas_ta `mad`)
+    values = x.to_numpy(dtype=float)
+    out = np.full(values.shape, np.nan)
+    if len(values) >= length:
+        windows = np.lib.stride_tricks.sliding_window_view(values, length, axis=0)
+        out[length - 1:] = np.abs(windows - windows.mean(axis=-1, keepdims=True)).mean(axis=-1)
+    return _like(x, out)
+
+
+def _like(x, values):
+    """`values` wrapped like the Series or DataFrame `x`."""
+    if isinstance(x, pd.DataFrame):
+        return pd.DataFrame(values, index=x.index, columns=x.columns)
+    return pd.Series(values, index=x.index)
+
+
+# === Shared intermediates ===
+@step('_prev_close', 'close')
+def _prev_close(v):
+    return v['close'].shift(1)
+
+
+@step('_close_diff', 'close', '_prev_close')
+def _close_diff(v):
+    return v['close'] - v['_prev_close']
+
+
+@step('_true_range', 'high', 'low', '_prev_close')
+def _true_range(v):
+    high, low, prev = v['high'], v['low'], v['_prev_close']
+    # NaN on the first bar, which has no previous close
+    return np.maximum(np.maximum(high - low, (high - prev).abs()), (prev - low).abs())
+
+
+@step('_typical_price', 'high', 'low', 'close')
+def _typical_price(v):
+    return (v['high'] + v['low'] + v['close']) / 3.0
+
+
+@step('_highest_14', 'high')
+def _highest_14(v):
+    return v['high'].rolling(14, min_periods=14).max()
+
+
+@step('_lowest_14', 'low')
+def _lowest_14(v):
+    return v['low'].rolling(14, min_periods=14).min()
+
+
+@step('_close_sma_20', 'close')
+def _close_sma_20(v):
+    return sma(v['close'], 20)
+
+
+@step('_close_std_20', 'close')
+def _close_std_20(v):
+    return v['close'].rolling(20, min_periods=20).std(ddof=0)
+
+
+@step('_ema_12', 'close')
+def _ema_12(v):
+    return ema(v['close'], 12)
+
+
+@step('_ema_26', 'close')
+def _ema_26(v):
+    return ema(v['close'], 26)
+
+
+# === Trend ===
+@step('sma_14', 'close')
+def _sma_14(v):
+    return sma(v['close'], 14)
+
+
+@step('ema_20', 'close')
+def _ema_20(v):
+    return ema(v['close'], 20)
+
+
+@step('atr_14', '_true_range')
+def _atr_14(v):
+    return rma(v['_true_range'], 14)
+
+
+@step('adx_14', 'high', 'low', 'atr_14')
+def _adx_14(v):
+    high, low = v['high'], v['low']
+    up = high - high.shift(1)
+    down = low.shift(1) - low
+    # NaN on the first bar (no previous high/low), 0 where the move does not count
+    pos = up.where((up > down) & (up > 0), 0.0).mask(up.isna())
+    neg = down.where((down > up) & (down > 0), 0.0).mask(down.isna())
+    k = 100.0 / v['atr_14']
+    dmp = k * rma(pos, 14)
+    dmn = k * rma(neg, 14)
+    dx = 100.0 * (dmp - dmn).abs() / (dmp + dmn)
+    return rma(dx, 14)
+
+
+# === Momentum ===
+@step('_stoch_14', 'close', '_highest_14', '_lowest_14')
+def _stoch_14(v):
+    span = v['_highest_14'] - v['_lowest_14']
+    return 100.0 * (v['close'] - v['_lowest_14']) / span.mask(span == 0, EPSILON)
+
+
+@step('stoch_k', '_stoch_14')
+def _stoch_k(v):
+    return sma(v['_stoch_14'], 3)
+
+
+@step('stoch_d', 'stoch_k')
+def _stoch_d(v):
+    return sma(v['stoch_k'], 3)
+
+
+@step('rsi_14', '_close_diff')
+def _rsi_14(v):
+    gain = rma(v['_close_diff'].clip(lower=0), 14)
+    loss = rma(v['_close_diff'].clip(upper=0), 14)
+    return 100.0 * gain / (gain + loss.abs())
+
+
+@step('cmo_14', '_close_diff')
+def _cmo_14(v):
+    gain = rma(v['_close_diff'].clip(lower=0), 14)
+    loss = rma(v['_close_diff'].clip(upper=0).abs(), 14)
+    return 100.0 * (gain - loss) / (gain + loss)
+
+
+@step('willr_14', 'close', '_highest_14', '_lowest_14')
+def _willr_14(v):
+    low = v['_lowest_14']
+    return 100.0 * ((v['close'] - low) / (v['_highest_14'] - low) - 1)
+
+
+@step('cci_20', '_typical_price')
+def _cci_20(v):
+    tp = v['_typical_price']
+    return (tp - sma(tp, 20)) / (0.015 * _rolling_mad(tp, 20))
+
+
+@step('roc_10', 'close')
+def _roc_10(v):
+    past = v['close'].shift(10)
+    return 100.0 * (v['close'] - past) / past
+
+
+@step('macd_line', '_ema_12', '_ema_26')
+def _macd_line(v):
+    return v['_ema_12'] - v['_ema_26']
+
+
+@step('_macd_signal', 'macd_line')
+def _macd_signal(v):
+    return ema(v['macd_line'], 9)
+
+
+@step('macd_hist', 'macd_line', '_macd_signal')
+def _macd_hist(v):
+    return v['macd_line'] - v['_macd_signal']
+
+
+# === Volatility ===
+@step('bb_mid', '_close_sma_20')
+def _bb_mid(v):
+    return v['_close_sma_20']
+
+
+@step('bb_upper', '_close_sma_20', '_close_std_20')
+def _bb_upper(v):
+    return v['_close_sma_20'] + 2.0 * v['_close_std_20']
+
+
+@step('bb_lower', '_close_sma_20', '_close_std_20')
+def _bb_lower(v):
+    return v['_close_sma_20'] - 2.0 * v['_close_std_20']
+
+
+@step('bb_width', 'bb_upper', 'bb_lower')
+def _bb_width(v):
+    """Band distance in price units (upper - lower)."""
+    return v['bb_upper'] - v['bb_lower']
+
+
+@step('bb_bandwidth', 'bb_upper', 'bb_lower', 'bb_mid')
+def _bb_bandwidth(v):
+    """Band distance as a percentage of the middle band (pandas_ta BBB)."""
+    return 100.0 * (v['bb_upper'] - v['bb_lower']) / v['bb_mid']
+
+
+# === Volume ===
+@step('obv', 'tick_volume', '_close_diff')
+def _obv(v):
+    # The first bar counts as an up bar (pandas_ta signed_series)
+    sign = np.sign(v['_close_diff']).fillna(1.0)
+    return (sign * v['tick_volume']).cumsum()
+
+
+@step('mfi_14', 'tick_volume', '_typical_price')
+def _mfi_14(v):
+    tp = v['_typical_price']
+    money_flow = tp * v['tick_volume']
+    change = tp.diff()
+    # Bars before a pair's first bar (panel padding) stay NaN
+    positive = money_flow.where(change > 0, 0.0).mask(money_flow.isna()).rolling(14, min_periods=14).sum()
+    negative = money_flow.where(change < 0, 0.0).mask(money_flow.isna()).rolling(14, min_periods=14).sum()
+    return 100.0 * positive / (positive + negative)
+
+
+# === Price action ===
+@step('candle_body', 'open', 'close')
+def _candle_body(v):
+    return (v['close'] - v['open']).abs()
+
+
+@step('candle_range', 'high', 'low')
+def _candle_range(v):
+    return v['high'] - v['low']
+
+
+# === Cross-sectional (panel only) ===
+@step('_log_return', 'close', '_prev_close')
+def _log_return(v):
+    return np.log(v['close'] / v['_prev_close'])
+
+
+def usd_sign(pair):
+    """+1 when the pair's price rises with USD (USDxxx), -1 for xxxUSD, NaN without USD."""
+    if pair.startswith('USD'):
+        return 1.0
+    if pair.endswith('USD'):
+        return -1.0
+    return np.nan
+
+
+@step('usd_strength', '_log_return', cross_sectional=True)
+def _usd_strength(v):
+    """USD against the other currencies: mean signed 1-bar log return, in percent.
+
+    Pairs with a missing bar at a timestamp are left out of its mean.
+    """
+    returns = v['_log_return']
+    sign = pd.Series({pair: usd_sign(pair) for pair in returns.columns})
+    return 100.0 * (returns * sign).mean(axis=1)
+
+
+# === Resolution ===
+def feature_plan(features: Iterable[str]) -> List[str]:
+    """Steps needed for `features`, in dependency order (raw columns excluded)."""
+    plan, seen = [], set()
+
+    def visit(name):
+        if name in seen or name in RAW_COLS:
+            return
+        if name not in STEPS:
+            raise ValueError(f"Unknown feature: {name}")
+        seen.add(name)
+        for dependency in STEPS[name].inputs:
+            visit(dependency)
+        plan.append(name)
+
+    for feature in features:
+        visit(feature)
+    return plan
+
+
+def required_columns(features: Iterable[str]) -> List[str]:
+    """Raw OHLCV columns that `features` are computed from."""
+    features = list(features)
+    needed = {name for name in features if name in RAW_COLS}
+    for name in feature_plan(features):
+        needed.update(col for col in STEPS[name].inputs if col in RAW_COLS)
+    return [col for col in RAW_COLS if col in needed]
+
+
+def compute_steps(values: Dict, features: Iterable[str]) -> Dict:
+    """Compute the steps for `features` into `values` (a dict of raw columns)."""
+    for name in feature_plan(features):
+        values[name] = STEPS[name].fn(values)
+    return values
+
+
+def compute_features(df: pd.DataFrame, features: Iterable[str] = FEATURE_COLS) -> pd.DataFrame:
+    """Return a copy of `df` (bars in time order) with the requested features added.
+
+    Only the indicators the features depend on are computed; intermediates
+    are dropped. Rows before an indicator's warm-up hold NaN.
+    """
+    features = list(features)
+    missing = [col for col in required_columns(features) if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing OHLCV columns: {missing}")
+
+    cross_sectional = [name for name in feature_plan(features) if STEPS[name].cross_sectional]
+    if cross_sectional:
+        raise ValueError(f"{cross_sectional} need every pair; use compute_panel_features")
+
+    values = {col: df[col].astype(float) for col in RAW_COLS if col in df.columns}
+    compute_steps(values, features)
+    out = df.copy()
+    for name in features:
+        if name not in RAW_COLS:
+            out[name] = values[name]
+    return out
+
+
+# === Panel (all pairs at once) ===
+class _TimeAlignment:
+    """Maps between the packed panel (rows = each pair's own bars) and time rows."""
+
+    def __init__(self, times: np.ndarray):
+        # `times`: packed datetime64 panel, NaT where a pair has no bar
+        valid = ~np.isnat(times)
+        self.rows, self.cols = np.nonzero(valid)
+        stamps = times[self.rows, self.cols]
+        self.index = np.unique(stamps)
+        self.time_rows = np.searchsorted(self.index, stamps)
+        self.shape = times.shape
+
+    def to_time(self, panel: pd.DataFrame) -> pd.DataFrame:
+        aligned = np.full((len(self.index), self.shape[1]), np.nan)
+        aligned[self.time_rows, self.cols] = panel.to_numpy()[self.rows, self.cols]
+        return pd.DataFrame(aligned, index=self.index, columns=panel.columns)
+
+    def to_panel(self, aligned, columns) -> pd.DataFrame:
+        values = aligned.to_numpy()
+        packed = np.full(self.shape, np.nan)
+        if values.ndim == 1:  # One value per timestamp, shared by every pair
+            packed[self.rows, self.cols] = values[self.time_rows]
+        else:
+            packed[self.rows, self.cols] = values[self.time_rows, self.cols]
+        return pd.DataFrame(packed, columns=columns)
+
+
+def compute_panel_features(frames: Dict[str, pd.DataFrame],
+                           features: Iterable[str] = FEATURE_COLS) -> Dict[str, pd.DataFrame]:
+    """`compute_features` for every pair in one vectorized pass; returns {pair: frame}.
+
+    Each pair's bars (in time order) fill one column of a bars x pairs panel,
+    aligned on the last bar, so every indicator sees exactly its own pair's
+    bars and the results equal `compute_features` per pair. Cross-sectional
+    features are computed on the panel re-aligned on the 'time' column.
+    """
+    features = list(features)
+    plan = feature_plan(features)
+    pairs = list(frames)
+    for pair, df in frames.items():
+        missing = [col for col in required_columns(features) if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing OHLCV columns for {pair}: {missing}")
+
+    lengths = np.array([len(frames[pair]) for pair in pairs], dtype=int)
+    rows = int(lengths.max(initial=0))
+    offsets = rows - lengths
+
+    def pack(column):
+        panel = np.full((rows, len(pairs)), np.nan)
+        for j, pair in enumerate(pairs):
+            panel[offsets[j]:, j] = frames[pair][column].to_numpy(dtype=float)
+        return panel
+
+    values = {col: pd.DataFrame(pack(col), columns=pairs) for col in required_columns(features)}
+    alignment = None
+    if any(STEPS[name].cross_sectional for name in plan):
+        if any('time' not in df.columns for df in frames.values()):
+            raise ValueError("Cross-sectional features need a 'time' column in every frame")
+        times = np.full((rows, len(pairs)), np.datetime64('NaT'), dtype='datetime64[ns]')
+        for j, pair in enumerate(pairs):
+            times[offsets[j]:, j] = pd.to_datetime(frames[pair]['time']).to_numpy(dtype='datetime64[ns]')
+        alignment = _TimeAlignment(times)
+
+    for name in plan:
+        current = STEPS[name]
+        if current.cross_sectional:
+            aligned = {col: alignment.to_time(values[col]) for col in current.inputs}
+            values[name] = alignment.to_panel(current.fn(aligned), pairs)
+        else:
+            values[name] = current.fn(values)
+
+    added = [name for name in features if name not in RAW_COLS]
+    arrays = {name: values[name].to_numpy() for name in added}
+    results = {}
+    for j, pair in enumerate(pairs):
+        df = frames[pair].drop(columns=added, errors='ignore')
+        block = pd.DataFrame({name: arrays[name][offsets[j]:, j] for name in added}, index=df.index)
+        results[pair] = pd.concat([df, block], axis=1)
+    return results
@@ -0,0 +1,346 @@
+import math
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from utils.features import FEATURE_COLS, RAW_COLS
+
+# Incremental versions of the model features defined in utils/features.py
+# (pandas-ta 0.3.14b semantics). Every update costs a fixed amount of work,
+# so a running engine only pays for the newest bar instead of recomputing the
+# whole 500-candle window.
+
+INDICATOR_COLS = [col for col in FEATURE_COLS if col not in RAW_COLS]
+
+# First bar index at which every indicator is defined (MACD histogram)
+WARMUP_BARS = 34
+
+NAN = float('nan')
+EPSILON = 2.220446049250313e-16  # pandas_ta non_zero_range guard
+
+
+def bar_time(value):
+    """Parse a bar timestamp (epoch seconds as returned by MT5, or a date string)."""
+    if isinstance(value, (int, float)):
+        return pd.Timestamp(value, unit='s')
+    return pd.Timestamp(value)
+
+
+# === Building blocks ===
+class _RollingSum:
+    """Fixed-length window sum, re-summed once per window to stop float drift."""
+
+    def __init__(self, length):
+        self.length = length
+        self.values = deque(maxlen=length)
+        self.total = 0.0
+        self._since_resum = 0
+
+    def update(self, value):
+        if len(self.values) == self.length:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        self._since_resum += 1
+        if self._since_resum >= self.length:
+            self.total = math.fsum(self.values)
+            self._since_resum = 0
+
+    @property
+    def full(self):
+        return len(self.values) == self.length
+
+    def mean(self):
+        return self.total / self.length if self.full else NAN
+
+
+class _RollingStd:
+    """Population standard deviation (ddof=0) over a fixed window.
+
+    Sums are kept around a shift value so prices near 1.0 do not lose precision.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.values = deque(maxlen=length)
+        self.shift = None
+        self.s1 = 0.0
+        self.s2 = 0.0
+
+    def update(self, value):
+        if self.shift is None:
+            self.shift = value
+        if len(self.values) == self.length:
+            old = self.values[0] - self.shift
+            self.s1 -= old
+            self.s2 -= old * old
+        self.values.append(value)
+        d = value - self.shift
+        self.s1 += d
+        self.s2 += d * d
+
+    def std(self):
+        if len(self.values) < self.length:
+            return NAN
+        mean = self.s1 / self.length
+        return math.sqrt(max(self.s2 / self.length - mean * mean, 0.0))
+
+
+class _RollingExtreme:
+    """Rolling max (or min) using a monotonic deque: amortised O(1) per bar."""
+
+    def __init__(self, length, use_max=True):
+        self.length = length
+        self.use_max = use_max
+        self.window = deque()  # (index, value)
+        self.index = -1
+
+    def update(self, value):
+        self.index += 1
+        if self.use_max:
+            while self.window and self.window[-1][1] <= value:
+                self.window.pop()
+        else:
+            while self.window and self.window[-1][1] >= value:
+                self.window.pop()
+        self.window.append((self.index, value))
+        if self.window[0][0] <= self.index - self.length:
+            self.window.popleft()
+
+    def value(self):
+        return self.window[0][1] if self.index >= self.length - 1 else NAN
+
+
+class _Ema:
+    """EMA seeded with the SMA of the first `length` values (pandas_ta `ema`)."""
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.seed = []
+        self.value = NAN
+
+    def update(self, value):
+        if math.isnan(value):
+            return self.value
+        if self.seed is not None:
+            self.seed.append(value)
+            if len(self.seed) == self.length:
+                self.value = math.fsum(self.seed) / self.length
+                self.seed = None
+            return self.value
+        self.value = self.alpha * value + (1.0 - self.alpha) * self.value
+        return self.value
+
+
+class _Rma:
+    """Wilder's moving average as `ewm(alpha=1/length, min_periods=length)`.
+
+    Leading NaNs are skipped, matching how pandas starts the average at the
+    first valid observation.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.num = 0.0
+        self.den = 0.0
+        self.count = 0
+
+    def update(self, value):
+        if math.isnan(value):
+            return self.value()
+        self.num = value + self.decay * self.num
+        self.den = 1.0 + self.decay * self.den
+        self.count += 1
+        return self.value()
+
+    def value(self):
+        return self.num / self.den if self.count >= self.length else NAN
+
+
+def _ratio(num, den):
+    return num / den if den != 0 else NAN
+
+
+# === Incremental indicator engine ===
+class IndicatorEngine:
+    """Running state for one pair; `update` consumes a single closed bar."""
+
+    def __init__(self):
+        self.bars_seen = 0
+        self.last_time = None
+        self.latest = None  # Most recent row of RAW_COLS + INDICATOR_COLS
+
+        self.prev_close = NAN
+        self.prev_high = NAN
+        self.prev_low = NAN
+        self.prev_tp = NAN
+
+        self.sma_14 = _RollingSum(14)
+        self.atr = _Rma(14)
+        self.dm_pos = _Rma(14)
+        self.dm_neg = _Rma(14)
+        self.adx = _Rma(14)
+        self.stoch_high = _RollingExtreme(14, use_max=True)
+        self.stoch_low = _RollingExtreme(14, use_max=False)
+        self.stoch_k = _RollingSum(3)
+        self.rsi_gain = _Rma(14)
+        self.rsi_loss = _Rma(14)
+        self.cci_tp = _RollingSum(20)
+        self.roc_closes = deque(maxlen=11)
+        self.bb_mid = _RollingSum(20)
+        self.bb_std = _RollingStd(20)
+        self.obv = 0.0
+        self.mfi_pos = _RollingSum(14)
+        self.mfi_neg = _RollingSum(14)
+        self.macd_fast = _Ema(12)
+        self.macd_slow = _Ema(26)
+        self.macd_signal = _Ema(9)
+
+    @property
+    def ready(self):
+        return self.bars_seen >= WARMUP_BARS
+
+    def extend(self, bars: Iterable[Dict]) -> int:
+        """Consume bars newer than the last one seen; returns how many were used."""
+        consumed = 0
+        for bar in bars:
+            t = bar_time(bar['time'])
+            if self.last_time is not None and t <= self.last_time:
+                continue
+            self.update(bar, t)
+            consumed += 1
+        return consumed
+
+    def update(self, bar: Dict, t=None) -> Dict:
+        missing = [col for col in RAW_COLS if col not in bar]
+        if missing:
+            raise ValueError(f"Missing OHLCV columns: {missing}")
+
+        o, h, l, c = float(bar['open']), float(bar['high']), float(bar['low']), float(bar['close'])
+        volume = float(bar['tick_volume'])
+        first = self.bars_seen == 0
+
+        # Trend
+        self.sma_14.update(c)
+        sma_14 = self.sma_14.mean()
+
+        # True range, ATR and directional movement (first bar has no previous close)
+        if first:
+            tr = up = dn = NAN
+        else:
+            tr = max(h - l, abs(h - self.prev_close), abs(self.prev_close - l))
+            up = h - self.prev_high
+            dn = self.prev_low - l
+        atr_14 = self.atr.update(tr)
+        pos = up if (up > dn and up > 0) else (NAN if first else 0.0)
+        neg = dn if (dn > up and dn > 0) else (NAN if first else 0.0)
+        dmp = self.dm_pos.update(pos)
+        dmn = self.dm_neg.update(neg)
+        if math.isnan(atr_14) or math.isnan(dmp) or math.isnan(dmn):
+            dx = NAN
+        else:
+            k = 100.0 / atr_14
+            dx = 100.0 * _ratio(abs(k * dmp - k * dmn), k * dmp + k * dmn)
+        adx_14 = self.adx.update(dx)
+
+        # Stochastic %K (14, smoothed by a 3-bar SMA)
+        self.stoch_high.update(h)
+        self.stoch_low.update(l)
+        hh, ll = self.stoch_high.value(), self.stoch_low.value()
+        stoch_k = NAN
+        if not math.isnan(hh):
+            span = hh - ll if hh != ll else EPSILON
+            self.stoch_k.update(100.0 * (c - ll) / span)
+            stoch_k = self.stoch_k.mean()
+
+        # RSI
+        change = NAN if first else c - self.prev_close
+        gain = self.rsi_gain.update(NAN if first else max(change, 0.0))
+        loss = self.rsi_loss.update(NAN if first else min(change, 0.0))
+        rsi_14 = 100.0 * _ratio(gain, gain + abs(loss))
+
+        # CCI: mean deviation needs the whole (fixed-size) window
+        tp = (h + l + c) / 3.0
+        self.cci_tp.update(tp)
+        cci_20 = NAN
+        if self.cci_tp.full:
+            window = self.cci_tp.values
+            centre = math.fsum(window) / len(window)
+            mad = math.fsum(abs(x - centre) for x in window) / len(window)
+            cci_20 = _ratio(tp - self.cci_tp.mean(), 0.015 * mad)
+
+        # Rate of change
+        self.roc_closes.append(c)
+        roc_10 = NAN
+        if len(self.roc_closes) == self.roc_closes.maxlen:
+            past = self.roc_closes[0]
+            roc_10 = 100.0 * _ratio(c - past, past)
+
+        # Bollinger band width (upper - lower = 4 * population std)
+        self.bb_mid.update(c)
+        self.bb_std.update(c)
+        bb_width = 4.0 * self.bb_std.std()
+
+        # OBV (first bar counts as an up bar, as in pandas_ta signed_series)
+        if first or c > self.prev_close:
+            self.obv += volume
+        elif c < self.prev_close:
+            self.obv -= volume
+
+        # MFI
+        money_flow = tp * volume
+        self.mfi_pos.update(money_flow if not first and tp > self.prev_tp else 0.0)
+        self.mfi_neg.update(money_flow if not first and tp < self.prev_tp else 0.0)
+        mfi_14 = NAN
+        if self.mfi_pos.full:
+            mfi_14 = 100.0 * _ratio(self.mfi_pos.total, self.mfi_pos.total + self.mfi_neg.total)
+
+        # MACD (12, 26, 9)
+        fast = self.macd_fast.update(c)
+        slow = self.macd_slow.update(c)
+        macd_line = fast - slow
+        signal = self.macd_signal.update(macd_line)
+        macd_hist = macd_line - signal
+
+        row = {col: float(bar[col]) for col in RAW_COLS}
+        row.update({
+            'sma_14': sma_14,
+            'adx_14': adx_14,
+            'stoch_k': stoch_k,
+            'rsi_14': rsi_14,
+            'cci_20': cci_20,
+            'roc_10': roc_10,
+            'atr_14': atr_14,
+            'bb_width': bb_width,
+            'obv': self.obv,
+            'mfi_14': mfi_14,
+            'macd_line': macd_line,
+            'macd_hist': macd_hist,
+            'candle_body': abs(c - o),
+            'candle_range': h - l,
+        })
+
+        self.prev_close, self.prev_high, self.prev_low, self.prev_tp = c, h, l, tp
+        self.bars_seen += 1
+        self.last_time = t if t is not None else bar_time(bar['time'])
+        self.latest = row
+        return row
+
+
+def compute_indicators_incremental(bars: List[Dict]) -> List[Dict]:
+    """Run a fresh engine over `bars` and return one feature row per bar."""
+    engine = IndicatorEngine()
+    return [engine.update(bar) for bar in bars]
+
+
+def feature_vector(row: Optional[Dict], feature_cols: List[str]) -> Optional[List[float]]:
+    """Return the row as a list ordered by `feature_cols`, or None if incomplete."""
+    if row is None:
+        return None
+    values = [row[col] for col in feature_cols]
+    if any(math.isnan(v) for v in values):
+        return None
+    return values
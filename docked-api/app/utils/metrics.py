@@ -0,0 +1,233 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Seconds; the 1.0 bucket is the SRS per-prediction target
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Per-request state: endpoint, pair and the timestamps the middleware needs.
+# Copied into threadpool calls, so sync handlers see the same dict.
+_request = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values (Prometheus text format)."""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple, List] = {}  # labels -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {values[-1]}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {values[-2]}")
+            lines.append(f"{self.name}_count{label_str} {values[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = dict(self.values)
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+def gauge_lines(name: str, help: str, samples: List[Tuple[Dict, float]], kind: str = "gauge") -> List[str]:
+    """Text lines for a metric whose values are read at scrape time."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {value}")
+    return lines
+
+
+STAGE_SECONDS = Histogram(
+    "forex_api_stage_seconds",
+    "Time spent in each stage of a prediction request.",
+    ("endpoint", "pair", "stage")
+)
+REQUEST_SECONDS = Histogram(
+    "forex_api_request_seconds",
+    "Server-side time from request start to the last response byte.",
+    ("endpoint", "pair")
+)
+REQUESTS = Counter(
+    "forex_api_requests_total",
+    "Requests handled, by response status.",
+    ("endpoint", "pair", "status")
+)
+
+
+def set_pair(pair: str):
+    """Label the current request's metrics with `pair`."""
+    state = _request.get()
+    if state is not None:
+        state["pair"] = pair
+
+
+@contextmanager
+def stage(name: str, pair: Optional[str] = None):
+    """Time a block as stage `name` of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        state = _request.get()
+        if state is None:
+            STAGE_SECONDS.observe(elapsed, "none", pair or "none", name)
+        else:
+            STAGE_SECONDS.observe(elapsed, state["endpoint"], pair or state["pair"], name)
+
+
+def background(endpoint: str):
+    """Record the stages of the decorated function under `endpoint`.
+
+    For work that is not owned by a single HTTP request, such as a micro-batch
+    shared by several requests or a streaming connection.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _request.set({"endpoint": endpoint, "pair": "none"})
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _request.reset(token)
+        return wrapper
+    return decorator
+
+
+def timed(endpoint):
+    """Mark when a route handler starts and returns.
+
+    The middleware turns these into the "parse" stage (request start to
+    handler entry: body read, JSON decode, validation) and the
+    "serialization" stage (handler return to the response being sent).
+    """
+    def enter():
+        state = _request.get()
+        if state is not None:
+            state["handler_start"] = time.perf_counter()
+        return state
+
+    def leave(state):
+        if state is not None:
+            state["handler_end"] = time.perf_counter()
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            state = enter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                leave(state)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            state = enter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                leave(state)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency for the given paths only."""
+
+    def __init__(self, app, paths: Iterable[str]):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"endpoint": scope["path"], "pair": "none", "start": time.perf_counter()}
+        token = _request.set(state)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                state["response_start"] = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request.reset(token)
+            self._record(state, status[0])
+
+    @staticmethod
+    def _record(state, status):
+        endpoint, pair = state["endpoint"], state["pair"]
+        end = time.perf_counter()
+        REQUEST_SECONDS.observe(end - state["start"], endpoint, pair)
+        REQUESTS.inc(endpoint, pair, str(status))
+        if "handler_start" in state:
+            STAGE_SECONDS.observe(state["handler_start"] - state["start"], endpoint, pair, "parse")
+        if "handler_end" in state and "response_start" in state:
+            STAGE_SECONDS.observe(state["response_start"] - state["handler_end"], endpoint, pair, "serialization")
+
+
+def render(extra: Iterable[List[str]] = ()) -> str:
+    lines = []
+    for metric in (REQUEST_SECONDS, REQUESTS, STAGE_SECONDS):
+        lines.extend(metric.render())
+    for family in extra:
+        lines.extend(family)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,306 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+
+from utils.features import RAW_COLS
+from utils.indicators import bar_time
+
+# Per-pair IQR outlier replacement for raw OHLCV bars, shared by training
+# (models-building/features/feature_engineering.py), pred.py and the API.
+#
+# Bars are filtered one at a time in time order. A value is an outlier when it
+# falls more than 3 IQR outside the pair's quartiles of the bars seen
+# *before* it, and is replaced by the mean of the pair's non-outlier values so
+# far. Prices trend, so their level says nothing about outliers: open, high,
+# low and close are tested as the change relative to the previous close. A
+# price is an outlier only if it is out of line with both the previous close
+# as received and as cleaned, so a spike is replaced but the bar after it is
+# not, and a genuine jump in level costs at most one replaced bar instead of
+# every bar after it. It becomes the previous cleaned close moved by the mean
+# change. Volumes and spread are tested as they are.
+#
+# The quartiles are P² estimates (Jain & Chlamtac, 1985): five markers per
+# quantile, so the state is a few numbers per pair and column however many
+# bars have been seen. The state left by the training run is saved next to
+# the models (FILTER_FILE) and serving continues from it, so live bars are
+# cleaned exactly as if they had been appended to the training data.
+
+FILTER_FILE = "outlier_filter.joblib"
+PRICE_COLS = ['open', 'high', 'low', 'close']  # Tested relative to the previous close
+QUANTILES = (0.25, 0.75)
+IQR_MULTIPLIER = 3.0  # Tukey's "far out" fence; 1.5 flags ~7% of H4 closes, i.e. ordinary big moves
+MIN_BARS = 100  # Bars of a pair seen before its values can be flagged
+
+
+def _time_ns(values) -> np.ndarray:
+    """Bar times as int64 nanoseconds; numbers are epoch seconds, as MT5 returns them."""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        values = pd.to_datetime(values, unit='s')
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+
+def _p2_init(shape, quantiles):
+    """Marker heights, positions and desired positions for P² estimators of `shape` (last axis: quantiles).
+
+    The five markers are the first axis, so each marker is one contiguous array.
+    """
+    p = np.broadcast_to(np.asarray(quantiles, dtype=float), shape)
+    increment = np.stack([0 * p, p / 2, p, (1 + p) / 2, 1 + 0 * p])
+    return {
+        'q': np.full((5,) + shape, np.inf),
+        'n': np.broadcast_to(np.arange(1.0, 6.0).reshape((5,) + (1,) * len(shape)), (5,) + shape).copy(),
+        'desired': 1 + 4 * increment,
+        'increment': increment,
+    }
+
+
+def _p2_update(sketch, count, x, active):
+    """Add `x` to every estimator where `active`; `count` is the number of values seen before.
+
+    Markers are (5, ...) and `count`, `x` and `active` are (...), so any
+    number of pairs, columns and quantiles step together.
+    """
+    q, n = sketch['q'], sketch['n']
+
+    # The first five values fill the markers, sorted once all are there
+    filling = active & (count < 5)
+    if filling.any():
+        q[(count[filling],) + np.nonzero(filling)] = x[filling]
+        full = filling & (count == 4)
+        q[:, full] = np.sort(q[:, full], axis=0)
+
+    running = active & (count >= 5)
+    if not running.any():
+        return
+    x = np.where(running, x, 0.0)
+    np.copyto(q[0], x, where=running & (x < q[0]))
+    np.copyto(q[4], x, where=running & (x > q[4]))
+    n[1:4] += running & (x < q[1:4])
+    n[4] += running
+    sketch['desired'] += running * sketch['increment']
+
+    # Move the middle markers that drifted a position away from where they should be
+    for i in (1, 2, 3):
+        qi, qlo, qhi = q[i], q[i - 1], q[i + 1]
+        ni, nlo, nhi = n[i], n[i - 1], n[i + 1]
+        drift = sketch['desired'][i] - ni
+        up = (drift >= 1) & (nhi - ni > 1)
+        down = (drift <= -1) & (nlo - ni < -1)
+        move = running & (up | down)
+        if not move.any():
+            continue
+        d = np.where(up, 1.0, -1.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            parabolic = qi + d / (nhi - nlo) * (
+                (ni - nlo + d) * (qhi - qi) / (nhi - ni) + (nhi - ni - d) * (qi - qlo) / (ni - nlo)
+            )
+            linear = np.where(up, qi + (qhi - qi) / (nhi - ni), qi - (qlo - qi) / (nlo - ni))
+        height = np.where((qlo < parabolic) & (parabolic < qhi), parabolic, linear)
+        np.copyto(qi, height, where=move)
+        ni += move * d
+
+
+class OutlierFilter:
+    """Streaming per-pair outlier replacement for the `columns` of raw bars.
+
+    `clean_frames` (training, pred.py) and `clean_bars` (API) run the same
+    per-bar step; bars not newer than the last one a pair has seen are cleaned
+    with the current state but do not update it, so overlapping windows can be
+    passed again. Thread-safe; each API worker process keeps its own copy.
+    """
+
+    def __init__(self, columns: Iterable[str] = RAW_COLS, k: float = IQR_MULTIPLIER, min_bars: int = MIN_BARS):
+        self.columns = list(columns)
+        self.relative = np.array([col in PRICE_COLS and 'close' in self.columns for col in self.columns], dtype=bool)
+        self.k = k
+        self.min_bars = min_bars
+        self.rows: Dict[str, int] = {}  # pair -> index into the state arrays
+        self.last_time: Dict[str, int] = {}  # pair -> newest bar seen (ns)
+        self.replaced: Dict[str, int] = {}  # pair -> values replaced so far
+        self.state = self._new_state(0)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _new_state(self, pairs):
+        shape = (pairs, len(self.columns))
+        return {
+            'quartiles': _p2_init(shape + (len(QUANTILES),), QUANTILES),
+            'count': np.zeros(shape, dtype=np.int64),
+            'kept_sum': np.zeros(shape),
+            'kept': np.zeros(shape, dtype=np.int64),
+            'prev_close': np.full(pairs, np.nan),  # As cleaned
+            'prev_raw': np.full(pairs, np.nan),  # As received
+        }
+
+    def _row(self, pair):
+        if pair not in self.rows:
+            self.rows[pair] = len(self.rows)
+            added = self._new_state(1)
+            self.state = _map_state(lambda old, new, axis: np.concatenate([old, new], axis), self.state, added)
+        return self.rows[pair]
+
+    def pairs(self) -> List[str]:
+        return list(self.rows)
+
+    def bounds(self, pair: str) -> Dict[str, tuple]:
+        """Current (lower, upper) outlier bounds per column (relative changes for prices)."""
+        median = self.state['quartiles']['q'][2, self.rows[pair]]
+        q1, q3 = median[:, 0], median[:, 1]
+        return {col: (lo, hi) for col, lo, hi in zip(self.columns, q1 - self.k * (q3 - q1), q3 + self.k * (q3 - q1))}
+
+    # === The per-bar step ===
+    def _step(self, state, x, update, prev_close, prev_raw):
+        """Clean one bar of every row of `state` (values `x`, NaN = missing) and learn from it where `update`."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            raw = x
+            x = np.where(self.relative, raw / prev_raw[:, None] - 1.0, raw)
+            x_cleaned = np.where(self.relative, raw / prev_close[:, None] - 1.0, raw)
+        present = ~np.isnan(x)  # A pair's first price has nothing to be relative to
+        median = state['quartiles']['q'][2]  # The middle marker estimates the quantile
+        q1, q3 = median[..., 0], median[..., 1]
+        count = state['count']
+        with np.errstate(invalid='ignore'):  # Markers are inf until five values are in
+            lower, upper = q1 - self.k * (q3 - q1), q3 + self.k * (q3 - q1)
+            outlier = (present & (count >= self.min_bars) & ((x < lower) | (x > upper))
+                       & ((x_cleaned < lower) | (x_cleaned > upper)))
+        mean = state['kept_sum'] / np.maximum(state['kept'], 1)
+        cleaned = np.where(outlier, np.where(self.relative, prev_close[:, None] * (1.0 + mean), mean), raw)
+
+        active = present & update[:, None]
+        keep = active & ~outlier
+        state['kept_sum'] += np.where(keep, x, 0.0)
+        state['kept'] += keep
+        width = len(QUANTILES)
+        _p2_update(state['quartiles'], np.repeat(count[..., None], width, -1),
+                   np.repeat(x[..., None], width, -1), np.repeat(active[..., None], width, -1))
+        state['count'] += active
+        return cleaned, outlier
+
+    def _run(self, pairs, values, times):
+        """Filter `values[pair]` (bars x columns, oldest first) for all `pairs` at once, one bar per step."""
+        rows = np.array([self._row(pair) for pair in pairs], dtype=np.intp)
+        contiguous = len(rows) > 0 and np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows)))
+        # Consecutive rows (always the case for one pair) are stepped in place through a view
+        index = slice(rows[0], rows[0] + len(rows)) if contiguous else rows
+        state = _map_state(lambda array, axis: array[(slice(None),) * axis + (index,)], self.state)
+        last = np.array([self.last_time.get(pair, np.iinfo(np.int64).min) for pair in pairs], dtype=np.int64)
+        length = max((len(v) for v in values), default=0)
+
+        # Bar i of every pair forms one step; shorter pairs are padded with NaN
+        panel = np.full((length, len(pairs), len(self.columns)), np.nan)
+        stamps = np.full((length, len(pairs)), np.iinfo(np.int64).min, dtype=np.int64)
+        for j, (v, t) in enumerate(zip(values, times)):
+            panel[:len(v), j] = v
+            stamps[:len(t), j] = t
+        cleaned = np.empty_like(panel)
+        outliers = np.zeros(panel.shape, dtype=bool)
+        close = self.columns.index('close') if self.relative.any() else None
+        prev_close = prev_raw = np.full(len(pairs), np.nan)
+        for i in range(length):
+            update = stamps[i] > last
+            last = np.where(update, stamps[i], last)
+            # A new bar follows the last one learned; a bar already seen follows its own previous bar
+            prev_close = np.where(update, state['prev_close'], prev_close)
+            prev_raw = np.where(update, state['prev_raw'], prev_raw)
+            cleaned[i], outliers[i] = self._step(state, panel[i], update, prev_close, prev_raw)
+            if close is not None:
+                received = ~np.isnan(panel[i, :, close])
+                prev_close = np.where(received, cleaned[i, :, close], prev_close)
+                prev_raw = np.where(received, panel[i, :, close], prev_raw)
+                np.copyto(state['prev_close'], prev_close, where=update)
+                np.copyto(state['prev_raw'], prev_raw, where=update)
+
+        if not contiguous:
+            def put(array, new, axis):
+                array[(slice(None),) * axis + (rows,)] = new
+                return array
+            self.state = _map_state(put, self.state, state)
+        for j, (pair, t) in enumerate(zip(pairs, last)):
+            if t != np.iinfo(np.int64).min:
+                self.last_time[pair] = int(t)
+            self.replaced[pair] = self.replaced.get(pair, 0) + int(outliers[:, j].sum())
+        return [(cleaned[:len(v), j], outliers[:len(v), j]) for j, v in enumerate(values)]
+
+    # === Entry points ===
+    def clean_frames(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """Copies of {pair: bars sorted by time} with outliers replaced; the filtered columns become float."""
+        pairs = list(frames)
+        columns = {pair: [col for col in self.columns if col in frames[pair]] for pair in pairs}
+        values = [
+            np.column_stack([
+                frames[pair][col].to_numpy(dtype=float) if col in frames[pair] else np.full(len(frames[pair]), np.nan)
+                for col in self.columns
+            ]) if self.columns else np.empty((len(frames[pair]), 0))
+            for pair in pairs
+        ]
+        times = [_time_ns(frames[pair]['time']) for pair in pairs]
+        with self._lock:
+            results = self._run(pairs, values, times)
+
+        cleaned_frames = {}
+        for pair, (cleaned, _) in zip(pairs, results):
+            df = frames[pair].copy()
+            for col in columns[pair]:
+                df[col] = cleaned[:, self.columns.index(col)]
+            cleaned_frames[pair] = df
+        return cleaned_frames
+
+    def clean_frame(self, pair: str, df: pd.DataFrame) -> pd.DataFrame:
+        return self.clean_frames({pair: df})[pair]
+
+    def clean_bars(self, pair: str, bars: List[Dict]) -> List[Dict]:
+        """Copies of raw bar dicts (oldest first) with outliers replaced, for the API."""
+        if not bars:
+            return []
+        values = np.array([[float(bar.get(col, np.nan)) for col in self.columns] for bar in bars])
+        times = np.array([bar_time(bar['time']).value for bar in bars], dtype=np.int64)
+        with self._lock:
+            [(cleaned, outliers)] = self._run([pair], [values], [times])
+        result = []
+        for bar, row, flags in zip(bars, cleaned, outliers):
+            bar = dict(bar)
+            for col, value, flag in zip(self.columns, row, flags):
+                if flag:
+                    bar[col] = float(value)
+            result.append(bar)
+        return result
+
+    # === Persistence ===
+    def save(self, path: str):
+        with self._lock:
+            dump(self, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'OutlierFilter':
+        return load(path)
+
+
+def _map_state(fn, state, *others, axis=0):
+    """Apply `fn(array, *matching arrays of others, pair axis)` to every array of a state dict.
+
+    The pair axis is 0, or 1 inside a P² sketch (whose first axis is the marker).
+    """
+    return {
+        key: _map_state(fn, value, *(other[key] for other in others), axis=1) if isinstance(value, dict)
+        else fn(value, *(other[key] for other in others), axis)
+        for key, value in state.items()
+    }
+
+
+def load_filter(model_dir: str) -> Optional[OutlierFilter]:
+    """The filter saved by the training run in `model_dir`, or None if there is none."""
+    path = os.path.join(model_dir, FILTER_FILE)
+    return OutlierFilter.load(path) if os.path.exists(path) else None
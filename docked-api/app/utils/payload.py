@@ -0,0 +1,125 @@
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # msgpack bodies are rejected when it is not installed
+    msgpack = None
+
+
+def _number(value, col):
+    """`value` as a float, None if missing, NaN or infinite; ValueError if it isn't a number.
+
+    Infinite values count as missing like NaN, as in `latest_binary_row`, so a
+    row is skipped the same way whatever the request format.
+    """
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Column '{col}' holds a non-numeric value: {value!r}") from None
+    return value if math.isfinite(value) else None
+
+
+def latest_feature_row(data: List[Dict], feature_cols: List[str]) -> List[float]:
+    """Return the last row of `data` that has every feature column set.
+
+    Equivalent to `pd.DataFrame(data).dropna(subset=feature_cols).iloc[-1]`
+    but walks the records from the end instead of building a DataFrame.
+    """
+    return latest_feature_entry(data, feature_cols)[1]
+
+
+def latest_feature_entry(data: List[Dict], feature_cols: List[str]) -> Tuple[Optional[str], List[float]]:
+    """Like `latest_feature_row`, but also returns that record's `time` (or None)."""
+    seen = set()
+    for record in reversed(data):
+        values = []
+        for col in feature_cols:
+            value = _number(record.get(col), col)
+            if value is None:
+                break
+            values.append(value)
+        if len(values) == len(feature_cols):
+            return record.get('time'), values
+        seen.update(record.keys())
+
+    missing_cols = [col for col in feature_cols if col not in seen]
+    if missing_cols:
+        raise ValueError(f"Missing feature columns: {missing_cols}")
+    raise ValueError("No complete row with all features available.")
+
+
+# === Columnar payloads (field -> array) ===
+def latest_columnar_row(columns: Dict[str, List], feature_cols: List[str]) -> List[float]:
+    """Return the last row of a columnar payload that has every feature set."""
+    return latest_columnar_entry(columns, feature_cols)[1]
+
+
+def latest_columnar_entry(columns: Dict[str, List], feature_cols: List[str]) -> Tuple[Optional[str], List[float]]:
+    """Like `latest_columnar_row`, but also returns that row's `time` (or None)."""
+    missing_cols = [col for col in feature_cols if col not in columns]
+    if missing_cols:
+        raise ValueError(f"Missing feature columns: {missing_cols}")
+
+    not_lists = [col for col in feature_cols if not isinstance(columns[col], list)]
+    if not_lists:
+        raise ValueError(f"Columns must be arrays of numbers: {not_lists}")
+
+    arrays = [columns[col] for col in feature_cols]
+    n_rows = len(arrays[0])
+    if any(len(arr) != n_rows for arr in arrays):
+        raise ValueError("Feature columns have different lengths.")
+    times = columns.get('time')
+    if not isinstance(times, list) or len(times) != n_rows:
+        times = None
+
+    for i in range(n_rows - 1, -1, -1):
+        values = []
+        for col, arr in zip(feature_cols, arrays):
+            value = _number(arr[i], col)
+            if value is None:
+                break
+            values.append(value)
+        if len(values) == len(feature_cols):
+            return (times[i] if times is not None else None), values
+    raise ValueError("No complete row with all features available.")
+
+
+def latest_binary_row(body: bytes, n_cols: int, dtype: str = 'f8') -> List[float]:
+    """Trailing complete row of raw little-endian column arrays.
+
+    The body is `n_cols` equally sized arrays laid end to end, one per feature
+    column in `FEATURE_COLS` order. Only the tail of each array is read.
+    """
+    itemsize = np.dtype(dtype).itemsize
+    if not body or len(body) % (n_cols * itemsize):
+        raise ValueError(f"Body size {len(body)} is not a multiple of {n_cols} columns of {dtype}.")
+
+    arr = np.frombuffer(body, dtype='<' + dtype).reshape(n_cols, -1)
+    for i in range(arr.shape[1] - 1, -1, -1):
+        row = arr[:, i]
+        # NaN and +-inf are missing, as in the JSON formats
+        if np.isfinite(row).all():
+            return row.astype(np.float64).tolist()
+    raise ValueError("No complete row with all features available.")
+
+
+def decode_columnar(body: bytes, content_type: str) -> Dict:
+    """Decode a JSON or msgpack body of the form {"pair": ..., "columns": {...}}."""
+    if content_type == 'application/json':
+        payload = json.loads(body)
+    elif content_type in ('application/msgpack', 'application/x-msgpack'):
+        if msgpack is None:
+            raise ValueError("msgpack is not installed on this server.")
+        payload = msgpack.unpackb(body, raw=False)
+    else:
+        raise ValueError(f"Unsupported content type: {content_type}")
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('columns'), dict):
+        raise ValueError("Expected an object with 'pair' and 'columns' fields.")
+    return payload
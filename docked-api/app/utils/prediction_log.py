@@ -0,0 +1,184 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['timestamp', 'pair', 'trend_class', 'trend_label', 'vol_class', 'vol_label', 'bar_time']
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        pair TEXT,
+        trend_class INTEGER,
+        trend_label TEXT,
+        vol_class INTEGER,
+        vol_label TEXT,
+        bar_time TEXT
+    )
+'''
+INDEX = 'CREATE INDEX IF NOT EXISTS idx_predictions_pair_timestamp ON predictions (pair, timestamp)'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class PredictionLog:
+    """SQLite prediction log written by a single background thread.
+
+    `log`/`log_many` only enqueue rows and never block: if `max_queue`
+    batches are already waiting, the rows are dropped and counted. The writer
+    owns one WAL-mode connection; once rows arrive it lingers `linger_seconds`
+    and then writes everything queued in one transaction, so a burst of
+    predictions costs one commit. With `retention_days`, rows older than that
+    are deleted every `compact_seconds` and the freed pages are returned to
+    the filesystem.
+    """
+
+    def __init__(self, path: str, retention_days: Optional[float] = None,
+                 compact_seconds: float = 3600, max_queue: int = 10000,
+                 linger_seconds: float = 0.05):
+        self.path = path
+        self.linger_seconds = linger_seconds
+        self.retention_days = retention_days
+        self.compact_seconds = compact_seconds
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"rows": 0, "transactions": 0, "dropped": 0, "pruned": 0, "errors": 0}
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+        self._last_compact = None
+
+    # === Producer side ===
+    def log(self, entry: Dict) -> bool:
+        return self.log_many([entry])
+
+    def log_many(self, entries: List[Dict]) -> bool:
+        """Queue rows to be written together; returns False if they were dropped."""
+        rows = [self._row(entry) for entry in entries]
+        if not rows:
+            return True
+        try:
+            self.queue.put_nowait(rows)
+            return True
+        except queue.Full:
+            self.stats["dropped"] += len(rows)
+            return False
+
+    @staticmethod
+    def _row(entry: Dict):
+        timestamp = entry.get('timestamp') or datetime.now().strftime(TIMESTAMP_FORMAT)
+        bar_time = entry.get('bar_time')
+        return (
+            timestamp, entry['pair'],
+            entry['trend_class'], entry['trend_label'],
+            entry['vol_class'], entry['vol_label'],
+            str(bar_time) if bar_time is not None else None
+        )
+
+    def flush(self):
+        """Block until everything queued so far is committed."""
+        self.queue.join()
+
+    # === Writer thread ===
+    def start(self):
+        """Start the writer; raises what opening the database raised, if it failed."""
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._error
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        # Takes effect on a new database as long as it precedes table creation;
+        # an existing one only switches over when rebuilt, done once here
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            logger.info(f"Rebuilding {self.path} once to enable incremental vacuum")
+            conn.execute('VACUUM')
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')  # Durable at checkpoints; safe with WAL
+        conn.execute(SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(predictions)')}
+        if 'bar_time' not in columns:
+            conn.execute('ALTER TABLE predictions ADD COLUMN bar_time TEXT')
+        conn.execute(INDEX)
+        conn.commit()
+        return conn
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self._error = e
+            return
+        finally:
+            self._ready.set()
+        insert = f'INSERT INTO predictions ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})'
+        stopping = False
+        while not stopping:
+            timeout = None
+            if self.retention_days:
+                if self._last_compact is None or time.monotonic() - self._last_compact >= self.compact_seconds:
+                    self._compact(conn)
+                timeout = self.compact_seconds - (time.monotonic() - self._last_compact)
+            try:
+                batches = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                batches = []
+            # Let a burst build up, then take whatever is waiting
+            if batches and batches[0] is not None and self.linger_seconds:
+                time.sleep(self.linger_seconds)
+            while True:
+                try:
+                    batches.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batches:
+                stopping = True
+            rows = [row for batch in batches if batch is not None for row in batch]
+
+            if rows:
+                try:
+                    with conn:
+                        conn.executemany(insert, rows)
+                    self.stats["rows"] += len(rows)
+                    self.stats["transactions"] += 1
+                except sqlite3.Error as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"Could not write {len(rows)} prediction(s): {e}")
+            for _ in batches:
+                self.queue.task_done()
+        conn.close()
+
+    def _compact(self, conn):
+        self._last_compact = time.monotonic()
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime(TIMESTAMP_FORMAT)
+        try:
+            with conn:
+                pruned = conn.execute('DELETE FROM predictions WHERE timestamp < ?', (cutoff,)).rowcount
+            if pruned:
+                conn.execute('PRAGMA incremental_vacuum').fetchall()  # Steps once per freed page
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                self.stats["pruned"] += pruned
+                logger.info(f"Pruned {pruned} prediction(s) older than {cutoff}")
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            logger.error(f"Could not prune prediction log: {e}")
@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from joblib import load
+
+from utils.compiled import CompiledModel
+
+logger = logging.getLogger(__name__)
+
+
+def process_rss_bytes() -> int:
+    """Resident set size of this process (Linux /proc, falls back to peak RSS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelRegistry:
+    """Trend and volatility models per pair, loaded lazily or in parallel.
+
+    `get(pair)` returns a `(trend_model, vol_model)` tuple. Each pair's entry
+    is replaced as a whole, so a request that already holds a tuple keeps
+    using it while a reload swaps in new models. `watch()` polls the model
+    directory and reloads a pair once its files have changed and stayed
+    unchanged for one poll interval (i.e. the copy has finished).
+    """
+
+    def __init__(self, model_dir: str, pairs: List[str], compiled: bool = False,
+                 lazy: bool = False, on_swap: Optional[Callable[[str], None]] = None):
+        self.model_dir = model_dir
+        self.pairs = list(pairs)
+        self.compiled = compiled
+        self.lazy = lazy
+        self.on_swap = on_swap
+        self.models: Dict[str, Tuple] = {}
+        self.info: Dict[str, Dict] = {}
+        self.locks = {pair: threading.Lock() for pair in self.pairs}
+        self._seen = {}  # pair -> file signature from the previous poll
+        self._failed = {}  # pair -> signature that failed to load (not retried)
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def paths(self, pair: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.model_dir, f"{pair}_model.joblib"),
+            os.path.join(self.model_dir, f"{pair}_vol_model.joblib"),
+        )
+
+    def _signature(self, pair: str):
+        try:
+            return tuple((st.st_mtime_ns, st.st_size) for st in map(os.stat, self.paths(pair)))
+        except OSError:
+            return None
+
+    def _load_one(self, path: str):
+        start = time.perf_counter()
+        rss_before = process_rss_bytes()
+        # No mmap_mode: it would only map the small numpy arrays (LightGBM
+        # boosters are parsed from their model string either way), and a file
+        # overwritten in place during hot reload would fault those mappings.
+        model = load(path)
+        kind = type(model).__name__
+        if self.compiled:
+            try:
+                model = CompiledModel(model)
+                kind = "CompiledModel"
+            except ValueError as e:
+                logger.warning(f"Falling back to LightGBM predict for {path}: {e}")
+        return model, {
+            "path": path,
+            "type": kind,
+            "file_bytes": os.path.getsize(path),
+            "load_seconds": round(time.perf_counter() - start, 4),
+            # Approximate when several models load in parallel
+            "resident_bytes": max(process_rss_bytes() - rss_before, 0),
+        }
+
+    def load(self, pair: str) -> Optional[Tuple]:
+        """Load (or reload) both models of a pair and swap them in."""
+        with self.locks[pair]:
+            signature = self._signature(pair)
+            if signature is None:
+                logger.error(f"Model file(s) missing for {pair}")
+                return self.models.get(pair)
+            try:
+                trend_path, vol_path = self.paths(pair)
+                trend_model, trend_info = self._load_one(trend_path)
+                vol_model, vol_info = self._load_one(vol_path)
+            except Exception as e:
+                logger.error(f"Could not load model for {pair}: {e}")
+                self._failed[pair] = signature
+                return self.models.get(pair)
+
+            reloaded = pair in self.models
+            self.models[pair] = (trend_model, vol_model)
+            self.info[pair] = {
+                "trend": trend_info,
+                "vol": vol_info,
+                "signature": signature,
+                "loaded_at": time.time(),
+            }
+            self._seen[pair] = signature
+            logger.info(
+                f"{'Reloaded' if reloaded else 'Loaded'} models for {pair} in "
+                f"{trend_info['load_seconds'] + vol_info['load_seconds']:.3f}s"
+            )
+        if reloaded and self.on_swap is not None:
+            self.on_swap(pair)
+        return self.models[pair]
+
+    def load_all(self, workers: int = 4):
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            list(pool.map(self.load, self.pairs))
+
+    def get(self, pair: str) -> Optional[Tuple]:
+        models = self.models.get(pair)
+        if models is None and self.lazy and pair in self.locks:
+            models = self.load(pair)
+        return models
+
+    def is_loaded(self, pair: str) -> bool:
+        return pair in self.models
+
+    def ready(self) -> bool:
+        return all(pair in self.models for pair in self.pairs)
+
+    # === Hot reload ===
+    def poll(self):
+        for pair in self.pairs:
+            if self.lazy and pair not in self.info:
+                continue  # Loaded on first use
+            signature = self._signature(pair)
+            if signature is None:
+                continue
+            loaded = self.info.get(pair, {}).get("signature")
+            stable = signature == self._seen.get(pair)
+            if signature != loaded and stable and signature != self._failed.get(pair):
+                self.load(pair)
+            self._seen[pair] = signature
+
+    def watch(self, interval: float):
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.error(f"Model watcher error: {e}")
+
+        self._watcher = threading.Thread(target=run, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> Dict:
+        return {
+            pair: {
+                "trend": info["trend"],
+                "vol": info["vol"],
+                "loaded_at": info["loaded_at"],
+            }
+            for pair, info in self.info.items()
+        }
@@ -0,0 +1,134 @@
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from utils.indicators import IndicatorEngine, feature_vector
+
+
+class Subscriber:
+    """One streaming connection: its pairs and a bounded outgoing queue.
+
+    A consumer that lets `max_queue` messages pile up is marked `overflowed`
+    and is expected to be disconnected; it gets the current regimes again as
+    snapshots when it resubscribes, so nothing is lost for good.
+    """
+
+    def __init__(self, max_queue: int):
+        self.pairs = set()
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def offer(self, message: Dict) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.overflowed = True
+            return False
+
+
+class RegimeStream:
+    """Per-pair indicator state fed by pushed bars; publishes regime changes.
+
+    Each pair has one IndicatorEngine shared by every connection, whose
+    fixed-length windows are the only history kept. Bars older than the
+    newest one seen are ignored, so several publishers may push the same bar.
+    `predict_fn(pair, values, bar_time)` runs in the threadpool and returns a
+    result with `trend_label`/`vol_label`; subscribers of the pair receive it
+    only when either label differs from the previous prediction. `clean_fn(pair,
+    bars)`, if given, is applied to pushed bars first (outlier replacement).
+    Used from the event loop only.
+    """
+
+    def __init__(self, predict_fn: Callable, feature_cols: List[str],
+                 clean_fn: Optional[Callable] = None,
+                 max_subscribers: int = 100, max_queue: int = 64):
+        self.predict_fn = predict_fn
+        self.feature_cols = feature_cols
+        self.clean_fn = clean_fn
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+        self.engines: Dict[str, IndicatorEngine] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.latest: Dict[str, Dict] = {}
+        self.subscribers = set()
+        self.stats = {"bars": 0, "predictions": 0, "changes": 0, "messages": 0,
+                      "overflows": 0, "rejected": 0}
+
+    # === Subscribers ===
+    def add_subscriber(self) -> Optional[Subscriber]:
+        if len(self.subscribers) >= self.max_subscribers:
+            self.stats["rejected"] += 1
+            return None
+        subscriber = Subscriber(self.max_queue)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def remove_subscriber(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def subscribe(self, subscriber: Subscriber, pairs: Iterable[str]):
+        for pair in pairs:
+            subscriber.pairs.add(pair)
+            if pair in self.latest:
+                self._deliver(subscriber, dict(self.latest[pair], type="snapshot"))
+
+    def unsubscribe(self, subscriber: Subscriber, pairs: Iterable[str]):
+        subscriber.pairs.difference_update(pairs)
+
+    def _deliver(self, subscriber: Subscriber, message: Dict):
+        if subscriber.offer(message):
+            self.stats["messages"] += 1
+        else:
+            self.stats["overflows"] += 1
+
+    def _publish(self, pair: str, message: Dict):
+        for subscriber in list(self.subscribers):
+            if pair in subscriber.pairs and not subscriber.overflowed:
+                self._deliver(subscriber, message)
+
+    # === Bars ===
+    def _advance(self, pair: str, bars: List[Dict]):
+        # Runs in the threadpool under the pair's lock
+        engine = self.engines.get(pair)
+        if engine is None:
+            engine = self.engines[pair] = IndicatorEngine()
+        if self.clean_fn is not None:
+            bars = self.clean_fn(pair, bars)
+        consumed = engine.extend(bars)
+        if not consumed:
+            return 0, None
+        values = feature_vector(engine.latest, self.feature_cols)
+        if values is None:
+            return consumed, None  # Still warming up
+        result = self.predict_fn(pair, values, engine.last_time)
+        result["time"] = engine.last_time.isoformat()
+        return consumed, result
+
+    async def push(self, pair: str, bars: List[Dict]) -> Optional[Dict]:
+        """Consume new closed bars for `pair`; returns the new prediction, if any.
+
+        Only the newest bar of a push is scored, so a regime that lasted less
+        than one push is not reported.
+        """
+        lock = self.locks.setdefault(pair, asyncio.Lock())
+        async with lock:
+            consumed, result = await run_in_threadpool(self._advance, pair, bars)
+            self.stats["bars"] += consumed
+            if result is None:
+                return None
+
+            self.stats["predictions"] += 1
+            previous = self.latest.get(pair)
+            self.latest[pair] = result
+            if previous is None or any(previous[k] != result[k] for k in ("trend_label", "vol_label")):
+                self.stats["changes"] += 1
+                message = dict(result, type="regime")
+                if previous is not None:
+                    message["previous"] = {k: previous[k] for k in ("trend_label", "vol_label", "time")}
+                self._publish(pair, message)
+            return result
+
+    def snapshot(self) -> Dict:
+        return dict(self.stats, subscribers=len(self.subscribers), max_subscribers=self.max_subscribers)
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from utils.batcher import MicroBatcher, QueueFullError
+
+# Each test drives the batcher on its own event loop; predict_fn runs in the
+# threadpool exactly as it does in the API.
+
+LONG_WAIT_MS = 60_000  # Longer than any test: a flush must come from elsewhere
+
+
+class Recorder:
+    """predict_fn that returns each row's first value and records the batches."""
+
+    def __init__(self, error=None, drop_last=False):
+        self.batches = []
+        self.error = error
+        self.drop_last = drop_last
+
+    def __call__(self, key, X):
+        self.batches.append((key, X.tolist()))
+        if self.error is not None:
+            raise self.error
+        results = [row[0] for row in X]
+        return results[:-1] if self.drop_last else results
+
+
+async def _submit_all(batcher, key, rows):
+    return await asyncio.gather(*(batcher.submit(key, row) for row in rows), return_exceptions=True)
+
+
+def test_flushes_when_batch_is_full():
+    async def main():
+        predict = Recorder()
+        batcher = MicroBatcher(predict, max_wait_ms=LONG_WAIT_MS, max_rows=3)
+        # Times out unless the third row flushes the batch
+        results = await asyncio.wait_for(_submit_all(batcher, "EURUSD", [[1.0], [2.0], [3.0]]), timeout=5)
+        return predict, batcher, results
+
+    predict, batcher, results = asyncio.run(main())
+    assert results == [1.0, 2.0, 3.0]
+    assert predict.batches == [("EURUSD", [[1.0], [2.0], [3.0]])]
+    assert batcher.timers == {} and batcher.pending == {}
+
+
+def test_flushes_partial_batch_after_max_wait():
+    async def main():
+        predict = Recorder()
+        batcher = MicroBatcher(predict, max_wait_ms=50, max_rows=64)
+        start = time.perf_counter()
+        results = await _submit_all(batcher, "EURUSD", [[1.0], [2.0]])
+        return predict, results, time.perf_counter() - start
+
+    predict, results, elapsed = asyncio.run(main())
+    assert results == [1.0, 2.0]
+    assert predict.batches == [("EURUSD", [[1.0], [2.0]])]
+    assert elapsed >= 0.05
+
+
+def test_keys_are_batched_separately():
+    async def main():
+        predict = Recorder()
+        batcher = MicroBatcher(predict, max_wait_ms=20, max_rows=64)
+        results = await asyncio.gather(batcher.submit("EURUSD", [1.0]), batcher.submit("USDJPY", [2.0]),
+                                       batcher.submit("EURUSD", [3.0]))
+        return predict, results
+
+    predict, results = asyncio.run(main())
+    assert results == [1.0, 2.0, 3.0]
+    assert sorted(predict.batches) == [("EURUSD", [[1.0], [3.0]]), ("USDJPY", [[2.0]])]
+
+
+def test_predict_error_reaches_every_waiter():
+    async def main():
+        batcher = MicroBatcher(Recorder(error=ValueError("model failed")), max_wait_ms=LONG_WAIT_MS, max_rows=3)
+        results = await asyncio.wait_for(_submit_all(batcher, "EURUSD", [[1.0], [2.0], [3.0]]), timeout=5)
+        return batcher, results
+
+    batcher, results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) and str(result) == "model failed" for result in results)
+    # The failed rows no longer count against the queue
+    assert batcher.in_flight["EURUSD"] == 0
+
+
+def test_too_few_results_fail_the_unanswered_waiters():
+    async def main():
+        batcher = MicroBatcher(Recorder(drop_last=True), max_wait_ms=LONG_WAIT_MS, max_rows=3)
+        return await asyncio.wait_for(_submit_all(batcher, "EURUSD", [[1.0], [2.0], [3.0]]), timeout=5)
+
+    results = asyncio.run(main())
+    assert results[:2] == [1.0, 2.0]
+    assert isinstance(results[2], RuntimeError)
+
+
+def test_close_drains_queued_requests():
+    async def main():
+        predict = Recorder()
+        batcher = MicroBatcher(predict, max_wait_ms=LONG_WAIT_MS, max_rows=64)
+        waiters = [asyncio.create_task(batcher.submit(key, [value]))
+                   for key, value in [("EURUSD", 1.0), ("USDJPY", 2.0), ("EURUSD", 3.0)]]
+        await asyncio.sleep(0)  # Let every request reach the queue
+        assert predict.batches == []
+
+        await asyncio.wait_for(batcher.close(), timeout=5)
+        assert all(waiter.done() for waiter in waiters)
+        return predict, batcher, [waiter.result() for waiter in waiters]
+
+    predict, batcher, results = asyncio.run(main())
+    assert results == [1.0, 2.0, 3.0]
+    assert len(predict.batches) == 2
+    assert batcher.pending == {} and batcher.timers == {} and batcher.tasks == set()
+
+
+def test_rejects_requests_beyond_max_queue():
+    async def main():
+        batcher = MicroBatcher(Recorder(), max_wait_ms=LONG_WAIT_MS, max_rows=64, max_queue=2)
+        waiters = [asyncio.create_task(batcher.submit("EURUSD", [value])) for value in (1.0, 2.0)]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await batcher.submit("EURUSD", [3.0])
+        # Other keys have their own queue
+        other = asyncio.create_task(batcher.submit("USDJPY", [4.0]))
+        await asyncio.sleep(0)
+        await batcher.close()
+        return batcher, [waiter.result() for waiter in waiters + [other]]
+
+    batcher, results = asyncio.run(main())
+    assert results == [1.0, 2.0, 4.0]
+    assert batcher.stats == {"requests": 3, "batches": 2, "rejected": 1}
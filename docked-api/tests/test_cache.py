@@ -0,0 +1,157 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from utils import cache as cache_module
+from utils.cache import H4_SECONDS, PredictionCache, next_bar_close
+
+# Entries must expire exactly when the bar they were computed for is
+# superseded, on the broker's clock; concurrent misses share one computation
+# and clear() (model reload) must not let an old computation repopulate.
+
+BROKER_UTC_OFFSET_HOURS = 2  # Broker server at UTC+2: H4 bars open at 22, 02, 06 ... UTC
+OFFSET = -BROKER_UTC_OFFSET_HOURS * 3600  # As app_main passes it
+RESULT = {"trend": "up", "volatility": "low"}
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(_utc(2025, 7, 7, 5, 0))
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+class Counter:
+    """compute() that counts its calls and can be held until released."""
+
+    def __init__(self, value=RESULT):
+        self.calls = 0
+        self.value = value
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return dict(self.value, call=self.calls)
+
+
+def test_next_bar_close_follows_the_broker_clock():
+    # 05:00 UTC is 07:00 on the broker; its bar (04:00-08:00 broker) closes at 06:00 UTC
+    assert next_bar_close(_utc(2025, 7, 7, 5, 0), offset=OFFSET) == _utc(2025, 7, 7, 6, 0)
+    assert next_bar_close(_utc(2025, 7, 7, 5, 0)) == _utc(2025, 7, 7, 8, 0)
+    # A boundary itself belongs to the bar that opens there
+    assert next_bar_close(_utc(2025, 7, 7, 6, 0), offset=OFFSET) == _utc(2025, 7, 7, 10, 0)
+    # Across midnight UTC: the 22:00 UTC bar (00:00 broker) closes at 02:00 UTC
+    assert next_bar_close(_utc(2025, 7, 7, 23, 30), offset=OFFSET) == _utc(2025, 7, 8, 2, 0)
+
+
+def test_entry_expires_exactly_at_the_offset_h4_close(clock):
+    async def main():
+        cache = PredictionCache(1 << 20, offset=OFFSET)
+        compute = Counter()
+        key = ("EURUSD", "2025-07-07 04:00", (1.0, 2.0))
+
+        await cache.get_or_compute(key, compute)
+        assert cache.entries[key][0] == _utc(2025, 7, 7, 6, 0)
+
+        clock.now = _utc(2025, 7, 7, 6, 0) - 0.001
+        assert (await cache.get_or_compute(key, compute))["call"] == 1
+        clock.now = _utc(2025, 7, 7, 6, 0)
+        assert (await cache.get_or_compute(key, compute))["call"] == 2
+        # The refreshed entry lives until the following close
+        assert cache.entries[key][0] == _utc(2025, 7, 7, 6, 0) + H4_SECONDS
+        return cache
+
+    cache = asyncio.run(main())
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 2
+    assert cache.stats["expirations"] == 1
+
+
+def test_concurrent_misses_share_one_computation(clock):
+    async def main():
+        cache = PredictionCache(1 << 20, offset=OFFSET)
+        compute = Counter()
+        compute.release.clear()
+        key = ("EURUSD", "2025-07-07 04:00", (1.0, 2.0))
+
+        callers = [asyncio.create_task(cache.get_or_compute(key, compute)) for _ in range(5)]
+        await asyncio.sleep(0)
+        # A caller that goes away must not cancel the shared computation
+        callers[0].cancel()
+        await asyncio.sleep(0)
+        compute.release.set()
+        results = await asyncio.gather(*callers[1:])
+        assert callers[0].cancelled()
+
+        # Each caller gets its own copy of the result
+        results[0]["trend"] = "changed"
+        return cache, compute, results, await cache.get_or_compute(key, compute)
+
+    cache, compute, results, cached = asyncio.run(main())
+    assert compute.calls == 1
+    assert [result["call"] for result in results] == [1, 1, 1, 1]
+    assert cached == dict(RESULT, call=1)
+    assert cache.stats["misses"] == 1 and cache.stats["collapsed"] == 4 and cache.stats["hits"] == 1
+    assert cache.in_flight == {}
+
+
+def test_clear_discards_entries_and_in_flight_results(clock):
+    async def main():
+        cache = PredictionCache(1 << 20, offset=OFFSET)
+        stored, pending = ("EURUSD", 1), ("USDJPY", 1)
+        await cache.get_or_compute(stored, Counter())
+
+        old_model = Counter({"trend": "old"})
+        old_model.release.clear()
+        waiter = asyncio.create_task(cache.get_or_compute(pending, old_model))
+        await asyncio.sleep(0)
+
+        cache.clear()  # Models reloaded while the old model is still scoring
+        assert cache.entries == {} and cache.bytes == 0 and cache.generation == 1
+        old_model.release.set()
+        # The caller still gets its answer, but it is not cached
+        assert (await waiter)["trend"] == "old"
+        assert pending not in cache.entries
+
+        new_model = Counter({"trend": "new"})
+        assert (await cache.get_or_compute(pending, new_model))["trend"] == "new"
+        assert (await cache.get_or_compute(stored, new_model))["trend"] == "new"
+        return cache, new_model
+
+    cache, new_model = asyncio.run(main())
+    assert new_model.calls == 2
+    assert set(cache.entries) == {("EURUSD", 1), ("USDJPY", 1)}
+
+
+def test_evicts_least_recently_used_within_max_bytes(clock):
+    async def main():
+        one = cache_module._entry_size(("EURUSD", 0), dict(RESULT, call=1))
+        cache = PredictionCache(2 * one + one // 2, offset=OFFSET)
+        for key in [("EURUSD", 0), ("USDJPY", 0)]:
+            await cache.get_or_compute(key, Counter())
+        await cache.get_or_compute(("EURUSD", 0), Counter())  # Now the most recently used
+        await cache.get_or_compute(("GBPUSD", 0), Counter())
+        return cache
+
+    cache = asyncio.run(main())
+    assert list(cache.entries) == [("EURUSD", 0), ("GBPUSD", 0)]
+    assert cache.stats["evictions"] == 1
+    assert cache.bytes <= cache.max_bytes
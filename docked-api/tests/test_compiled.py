@@ -0,0 +1,119 @@
+import os
+import sys
+
+import lightgbm as lgb
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from utils.compiled import MAX_COMPILED_ROWS, CompiledModel
+
+# CompiledModel walks the dumped trees itself, so it must agree with LightGBM
+# on every row, including the missing-value rules (NaN branches, zero as
+# missing) and models cut short by early stopping.
+
+N_FEATURES = 6
+
+
+def _data(n, n_classes, seed=0, nan_rate=0.0, zero_rate=0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, N_FEATURES))
+    y = np.digitize(X[:, 0] + 0.5 * X[:, 1] + 0.3 * rng.normal(size=n),
+                    np.linspace(-1, 1, n_classes - 1))
+    X[rng.random(X.shape) < nan_rate] = np.nan
+    X[rng.random(X.shape) < zero_rate] = 0.0
+    return X, y
+
+
+def _fit(X, y, **params):
+    params = dict(n_estimators=30, num_leaves=15, min_child_samples=5, verbose=-1, **params)
+    return lgb.LGBMClassifier(**params).fit(X, y)
+
+
+def _assert_matches(model, X):
+    compiled = CompiledModel(model, max_rows=None)
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+    # Raw scores too, so a near tie cannot hide a wrong leaf
+    np.testing.assert_allclose(compiled.raw_score(X).squeeze(), model.predict(X, raw_score=True), rtol=1e-9, atol=1e-9)
+
+
+def test_multiclass_with_nan():
+    X, y = _data(600, n_classes=3, nan_rate=0.15)
+    model = _fit(X, y)
+    assert (CompiledModel(model).missing_type == 2).any()  # Learned NaN branches
+
+    X_test, _ = _data(200, n_classes=3, seed=1, nan_rate=0.15)
+    X_test[:5] = np.nan  # Rows with every feature missing
+    _assert_matches(model, X_test)
+
+
+def test_zero_as_missing():
+    X, y = _data(600, n_classes=3, nan_rate=0.05, zero_rate=0.15)
+    model = _fit(X, y, zero_as_missing=True)
+    assert (CompiledModel(model).missing_type == 1).any()
+
+    X_test, _ = _data(200, n_classes=3, seed=1, nan_rate=0.05, zero_rate=0.15)
+    X_test[:10, :2] = [1e-40, -1e-40]  # Below kZeroThreshold: also missing
+    _assert_matches(model, X_test)
+
+
+def test_binary():
+    X, y = _data(600, n_classes=2, nan_rate=0.1)
+    model = _fit(X, np.where(y == 1, 'up', 'down'))
+    compiled = CompiledModel(model, max_rows=None)
+    assert compiled.trees_per_iteration == 1
+
+    X_test, _ = _data(200, n_classes=2, seed=1, nan_rate=0.1)
+    _assert_matches(model, X_test)
+    assert set(compiled.predict(X_test)) <= {'up', 'down'}
+
+
+def test_early_stopped_model_uses_best_iteration():
+    X, y = _data(800, n_classes=3, nan_rate=0.05)
+    X_val, y_val = _data(200, n_classes=3, seed=2, nan_rate=0.05)
+    model = lgb.LGBMClassifier(n_estimators=500, learning_rate=0.3, num_leaves=31, min_child_samples=5, verbose=-1)
+    model.fit(X, y, eval_set=[(X_val, y_val)], callbacks=[lgb.early_stopping(5, verbose=False)])
+    assert 0 < model.best_iteration_ < 500
+
+    # Only the trees up to the best iteration may be evaluated
+    compiled = CompiledModel(model, max_rows=None)
+    assert len(compiled.roots) == model.best_iteration_ * compiled.trees_per_iteration
+    _assert_matches(model, _data(200, n_classes=3, seed=3, nan_rate=0.05)[0])
+
+
+class _CountingModel:
+    """Forwards to a fitted model and counts the batches it predicts."""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = []
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        return self.model.predict(X)
+
+
+@pytest.mark.parametrize("max_rows", [MAX_COMPILED_ROWS, 4])
+def test_large_batches_fall_back_to_lightgbm(max_rows):
+    X, y = _data(600, n_classes=3, nan_rate=0.1)
+    model = _CountingModel(_fit(X, y))
+    compiled = CompiledModel(model, max_rows=max_rows)
+    X_test, _ = _data(max_rows + 1, n_classes=3, seed=1, nan_rate=0.1)
+
+    small = compiled.predict(X_test[:max_rows])
+    assert model.calls == []
+    large = compiled.predict(X_test)
+    assert model.calls == [max_rows + 1]
+
+    np.testing.assert_array_equal(small, model.model.predict(X_test[:max_rows]))
+    np.testing.assert_array_equal(large, model.model.predict(X_test))
+
+
+def test_rejects_wrong_feature_count():
+    X, y = _data(300, n_classes=3)
+    compiled = CompiledModel(_fit(X, y), max_rows=None)
+    with pytest.raises(ValueError):
+        compiled.predict(np.zeros((2, N_FEATURES + 1)))
@@ -0,0 +1,94 @@
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, os.path.join(ROOT, "docked-api", "app"))
+from utils.features import FEATURE_COLS, RAW_COLS, compute_features
+from utils.indicators import INDICATOR_COLS, WARMUP_BARS, IndicatorEngine, compute_indicators_incremental
+
+# The incremental IndicatorEngine must reproduce compute_features (the
+# definition training uses) bar by bar: same values within float noise, and
+# NaN at exactly the same warm-up positions.
+
+PAIR_FILES = sorted(glob.glob(os.path.join(ROOT, "models-building", "data", "separate data", "*_H4.csv")))
+SAMPLE_FILE = os.path.join(ROOT, "sample_input.json")
+
+RTOL = 1e-7
+ATOL = 1e-8
+
+
+def _incremental(df):
+    return pd.DataFrame(compute_indicators_incremental(df.to_dict('records')))[FEATURE_COLS]
+
+
+def _assert_matches(expected, actual):
+    for col in FEATURE_COLS:
+        np.testing.assert_allclose(actual[col].to_numpy(float), expected[col].to_numpy(float),
+                                   rtol=RTOL, atol=ATOL, equal_nan=True, err_msg=col)
+
+
+@pytest.fixture(scope="module")
+def sample():
+    with open(SAMPLE_FILE) as f:
+        return pd.DataFrame(json.load(f)['data'])
+
+
+def test_pair_files_present():
+    assert len(PAIR_FILES) == 10
+
+
+@pytest.mark.parametrize("path", PAIR_FILES, ids=os.path.basename)
+def test_engine_matches_compute_features(path):
+    df = pd.read_csv(path)
+    expected = compute_features(df)[FEATURE_COLS]
+    actual = _incremental(df)
+
+    # Same warm-up: identical NaN positions in every column...
+    for col in FEATURE_COLS:
+        assert (expected[col].isna().to_numpy() == actual[col].isna().to_numpy()).all(), col
+    # ...and every feature is defined from the WARMUP_BARS-th bar on, not before
+    complete = actual.notna().all(axis=1).to_numpy()
+    assert not complete[:WARMUP_BARS - 1].any()
+    assert complete[WARMUP_BARS - 1:].all()
+
+    _assert_matches(expected, actual)
+
+
+def test_engine_ready_and_extend_skip_seen_bars():
+    df = pd.read_csv(PAIR_FILES[0])
+    bars = df.to_dict('records')
+    engine = IndicatorEngine()
+    assert engine.extend(bars[:WARMUP_BARS - 1]) == WARMUP_BARS - 1
+    assert not engine.ready
+    # Overlapping pushes only consume the new bars
+    assert engine.extend(bars[:WARMUP_BARS + 10]) == 11
+    assert engine.ready
+    expected = compute_features(df.iloc[:WARMUP_BARS + 10])[FEATURE_COLS].iloc[-1]
+    np.testing.assert_allclose([engine.latest[col] for col in FEATURE_COLS], expected.to_numpy(float),
+                               rtol=RTOL, atol=ATOL)
+
+
+def test_sample_input_matches_compute_features(sample):
+    expected = compute_features(sample[['time'] + RAW_COLS])[FEATURE_COLS]
+    _assert_matches(expected, _incremental(sample))
+
+
+def test_sample_input_tail_matches_stored_indicators(sample):
+    # The stored values were computed over a longer history; once the
+    # exponential smoothings have converged the last rows must agree. OBV is a
+    # running total from the first bar, so only its bar-to-bar changes do.
+    tail = 50
+    actual = _incremental(sample).iloc[-tail:]
+    stored = sample.iloc[-tail:]
+    for col in INDICATOR_COLS:
+        if col == 'obv':
+            np.testing.assert_allclose(np.diff(actual[col]), np.diff(stored[col]), atol=1e-6, err_msg=col)
+        else:
+            np.testing.assert_allclose(actual[col].to_numpy(float), stored[col].to_numpy(float),
+                                       rtol=1e-5, atol=1e-7, err_msg=col)
@@ -0,0 +1,96 @@
+import json
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from utils.payload import decode_columnar, latest_binary_row, latest_columnar_entry, latest_feature_entry
+
+# The same bars must give the same row whatever the request format: NaN and
+# +-inf both mark a row as incomplete, and the row before it is scored.
+
+COLS = ['open', 'close', 'rsi_14']
+ROWS = [
+    [1.0, 1.1, 40.0],
+    [1.1, 1.2, 50.0],
+    [1.2, 1.3, 60.0],
+]
+TIMES = ["2025-07-07T12:00:00", "2025-07-07T16:00:00", "2025-07-07T20:00:00"]
+
+
+def _with_last(value):
+    rows = [list(row) for row in ROWS]
+    rows[-1][1] = value
+    return rows
+
+
+def _records(rows):
+    return [dict(zip(COLS, row), time=t) for row, t in zip(rows, TIMES)]
+
+
+def _columns(rows):
+    return dict({col: [row[j] for row in rows] for j, col in enumerate(COLS)}, time=TIMES)
+
+
+def _binary(rows, dtype='f8'):
+    return np.array(rows, dtype='<' + dtype).T.tobytes()
+
+
+@pytest.mark.parametrize("bad", [math.nan, math.inf, -math.inf, None])
+def test_records_skip_incomplete_rows(bad):
+    assert latest_feature_entry(_records(_with_last(bad)), COLS) == (TIMES[1], ROWS[1])
+
+
+@pytest.mark.parametrize("bad", [math.nan, math.inf, -math.inf, None])
+def test_columnar_json_skips_incomplete_rows(bad):
+    # json.dumps writes NaN / Infinity, which json.loads (and the endpoint) accept
+    body = json.dumps({"pair": "EURUSD", "columns": _columns(_with_last(bad))}).encode()
+    payload = decode_columnar(body, 'application/json')
+    assert latest_columnar_entry(payload["columns"], COLS) == (TIMES[1], ROWS[1])
+
+
+@pytest.mark.parametrize("bad", [math.nan, math.inf, -math.inf])
+def test_columnar_msgpack_skips_incomplete_rows(bad):
+    msgpack = pytest.importorskip("msgpack")
+    body = msgpack.packb({"pair": "EURUSD", "columns": _columns(_with_last(bad))})
+    payload = decode_columnar(body, 'application/msgpack')
+    assert latest_columnar_entry(payload["columns"], COLS) == (TIMES[1], ROWS[1])
+
+
+@pytest.mark.parametrize("dtype", ['f4', 'f8'])
+@pytest.mark.parametrize("bad", [math.nan, math.inf, -math.inf])
+def test_binary_skips_incomplete_rows(bad, dtype):
+    expected = np.array(ROWS[1], dtype=dtype).astype(float).tolist()
+    assert latest_binary_row(_binary(_with_last(bad), dtype), len(COLS), dtype) == expected
+
+
+def test_complete_last_row_is_used_by_every_format():
+    body = json.dumps({"pair": "EURUSD", "columns": _columns(ROWS)}).encode()
+    assert latest_feature_entry(_records(ROWS), COLS) == (TIMES[2], ROWS[2])
+    assert latest_columnar_entry(decode_columnar(body, 'application/json')["columns"], COLS) == (TIMES[2], ROWS[2])
+    assert latest_binary_row(_binary(ROWS), len(COLS)) == ROWS[2]
+
+
+def test_no_complete_row():
+    rows = [[math.inf] * len(COLS)]
+    with pytest.raises(ValueError, match="No complete row"):
+        latest_feature_entry([dict(zip(COLS, rows[0]))], COLS)
+    with pytest.raises(ValueError, match="No complete row"):
+        latest_columnar_entry({col: [math.inf] for col in COLS}, COLS)
+    with pytest.raises(ValueError, match="No complete row"):
+        latest_binary_row(_binary(rows), len(COLS))
+
+
+@pytest.mark.parametrize("columns, message", [
+    ({'open': 1.0, 'close': [1.0], 'rsi_14': [1.0]}, "must be arrays"),
+    ({'open': [[1.0]], 'close': [1.0], 'rsi_14': [1.0]}, "non-numeric"),
+    ({'open': ["abc"], 'close': [1.0], 'rsi_14': [1.0]}, "non-numeric"),
+    ({'open': [1.0], 'close': [1.0]}, "Missing feature columns"),
+])
+def test_invalid_columns_raise_value_error(columns, message):
+    # ValueError becomes a 422 at the endpoint
+    with pytest.raises(ValueError, match=message):
+        latest_columnar_entry(columns, COLS)
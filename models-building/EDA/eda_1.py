@@ -2,9 +2,15 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bar_store import UNIFIED_FILE, read_unified
+from dataset import PairDataset
+from plots import Chart, render_charts
 
-df = pd.read_csv("data/ohlcv.csv") 
+dataset = PairDataset(read_unified(UNIFIED_FILE), pair_col="pair")
+df = dataset.frame
 
 # Display the first few rows
 print("Head of the dataset:")
@@ -19,52 +25,38 @@ df['time'] = pd.to_datetime(df['time'])
 
 print(df.describe())
 
-#dropping row with volume <=0 some indicator depend on it
-df = df[df['tick_volume'] > 0]
-
 # UNIVARIATE ANALYSIS
-def analyze_forex_pairs(df, output_dir="Visualizations_1"):
+def plot_distribution(values, pair_name, col):
+    plt.figure(figsize=(10, 4))
+    sns.histplot(values, bins=50, kde=True, color='skyblue')
+    plt.title(f"{pair_name}: Distribution of {col.capitalize()}")
+    plt.xlabel(col.capitalize())
+    plt.ylabel('Frequency')
+    plt.grid(True)
+
+def analyze_forex_pairs(dataset, output_dir="Visualizations_1"):
     # OHLCV columns to plot
     ohlcv_cols = ['open', 'high', 'low', 'close', 'tick_volume']
-    
-    # Create output folder if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Detect all currency pair columns
-    pair_cols = [col for col in df.columns if col.startswith('pair_')]
-    print(f"Found {len(pair_cols)} currency pairs:\n{pair_cols}")
 
-    # Loop through each pair
-    for pair_col in pair_cols:
-        pair_name = pair_col.replace("pair_", "")
-        print(f"\nAnalyzing {pair_name} ...")
+    # Currency pairs present in the data
+    pairs = dataset.pairs()
+    print(f"Found {len(pairs)} currency pairs:\n{pairs}")
 
-        # Filter rows where this pair is active
-        pair_df = df[df[pair_col] == 1]
-        
-        if pair_df.empty:
-            print(f"No rows with {pair_col} == 1. Skipping...")
-            continue
+    # One chart per (pair, column); a pair is a contiguous slice of the dataset
+    charts = []
+    for pair_name, pair_df in dataset:
+        #dropping row with volume <=0 some indicator depend on it
+        pair_df = pair_df[pair_df['tick_volume'] > 0]
 
         for col in ohlcv_cols:
             if col not in pair_df.columns:
                 print(f"Column '{col}' not found in data. Skipping...")
                 continue
+            path = os.path.join(output_dir, f"{pair_name}_{col}.png")
+            charts.append(Chart(path, plot_distribution, pair_df[col], {'pair_name': pair_name, 'col': col}))
 
-            plt.figure(figsize=(10, 4))
-            sns.histplot(pair_df[col], bins=50, kde=True, color='skyblue')
-            plt.title(f"{pair_name}: Distribution of {col.capitalize()}")
-            plt.xlabel(col.capitalize())
-            plt.ylabel('Frequency')
-            plt.grid(True)
-            plt.tight_layout()
-
-            # Save plot
-            filename = f"{pair_name}_{col}.png"
-            filepath = os.path.join(output_dir, filename)
-            plt.savefig(filepath)
-            plt.close()  # Close the figure to avoid memory leaks
-
-            print(f"Saved plot: {filepath}")
+    # Drawn in parallel; charts whose data hasn't changed are skipped
+    drawn, unchanged = render_charts(charts)
+    print(f"Saved {drawn} plots in {output_dir} ({unchanged} unchanged)")
 
-analyze_forex_pairs(df)
+analyze_forex_pairs(dataset)
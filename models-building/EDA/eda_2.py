@@ -1,62 +1,50 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 from statsmodels.graphics.tsaplots import plot_acf
 import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bar_store import UNIFIED_FILE, read_unified
+from dataset import PairDataset
+from plots import Chart, render_charts
 
-df = pd.read_csv("data/ohlcv.csv")  
-df['time'] = pd.to_datetime(df['time'])
+dataset = PairDataset(read_unified(UNIFIED_FILE), pair_col="pair")
 
 # Folder to save visualizations
 output_dir = "visualizations_2"
-os.makedirs(output_dir, exist_ok=True)
 
-# Detect pair columns like 'pair_EURUSD', 'pair_USDJPY', etc.
-pair_cols = [col for col in df.columns if col.startswith('pair_')]
+# 1. OHLC line plot
+def plot_ohlc(pair_df, pair_name):
+    pair_df.set_index('time').plot(figsize=(15, 6), title=f'{pair_name} - OHLC Over Time')
 
-# Loop through each currency pair
-for pair_col in pair_cols:
-    pair_name = pair_col.replace("pair_", "")
-    pair_df = df[df[pair_col] == 1].copy()
+# 2. Volume plot
+def plot_volume(pair_df, pair_name):
+    pair_df.set_index('time')['tick_volume'].plot(figsize=(15, 3), title=f'{pair_name} - Tick Volume Over Time', color='orange')
 
-    if pair_df.empty:
-        print(f"No data for {pair_name}. Skipping...")
-        continue
-
-    # Prepare time index
-    pair_df.set_index('time', inplace=True)
-
-    # Calculate rolling stats
-    for window in [10, 20, 50, 200]:
+# 3. Rolling Means
+def plot_rolling_means(pair_df, pair_name, windows=(50, 200)):
+    pair_df = pair_df.set_index('time')
+    for window in windows:
         pair_df[f'rolling_mean_{window}'] = pair_df['close'].rolling(window).mean()
-        pair_df[f'rolling_std_{window}'] = pair_df['close'].rolling(window).std()
-
-    # 1. OHLC line plot
-    pair_df[['open', 'high', 'low', 'close']].plot(figsize=(15, 6), title=f'{pair_name} - OHLC Over Time')
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/{pair_name}_ohlc_trend.png")
-    plt.close()
-
-    # 2. Volume plot
-    pair_df['tick_volume'].plot(figsize=(15, 3), title=f'{pair_name} - Tick Volume Over Time', color='orange')
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/{pair_name}_volume_trend.png")
-    plt.close()
-
-    # 3. Rolling Means
-    pair_df[['close', 'rolling_mean_50', 'rolling_mean_200']].plot(figsize=(15, 5), title=f'{pair_name} - Close with Rolling Means')
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/{pair_name}_rolling_means.png")
-    plt.close()
-
-    # 4. Autocorrelation (ACF) plot
+    pair_df.plot(figsize=(15, 5), title=f'{pair_name} - Close with Rolling Means')
+
+# 4. Autocorrelation (ACF) plot
+def plot_close_acf(close, pair_name, lags=40):
     fig, ax = plt.subplots(figsize=(10, 4))
-    plot_acf(pair_df['close'].dropna(), lags=40, ax=ax)
+    plot_acf(close.dropna(), lags=lags, ax=ax)
     plt.title(f'{pair_name} - ACF of Close Price')
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/{pair_name}_acf.png")
-    plt.close()
-
-    print(f" Saved all plots for {pair_name}")
 
-print(f"\n All charts saved in: {output_dir}")
+# Each chart gets only the columns it draws, so its cache key only changes with them
+charts = []
+for pair_name, pair_df in dataset:
+    params = {'pair_name': pair_name}
+    charts += [
+        Chart(f"{output_dir}/{pair_name}_ohlc_trend.png", plot_ohlc, pair_df[['time', 'open', 'high', 'low', 'close']], params),
+        Chart(f"{output_dir}/{pair_name}_volume_trend.png", plot_volume, pair_df[['time', 'tick_volume']], params),
+        Chart(f"{output_dir}/{pair_name}_rolling_means.png", plot_rolling_means, pair_df[['time', 'close']], params),
+        Chart(f"{output_dir}/{pair_name}_acf.png", plot_close_acf, pair_df['close'], params),
+    ]
+
+# Drawn in parallel; charts whose data hasn't changed are skipped
+drawn, unchanged = render_charts(charts)
+print(f"\n Saved {drawn} charts in: {output_dir} ({unchanged} unchanged)")
@@ -1,58 +1,51 @@
-import pandas as pd
 import os
+import sys
 import joblib
 import matplotlib.pyplot as plt
 from sklearn.metrics import ConfusionMatrixDisplay, confusion_matrix
 
-# Load labeled dataset
-df = pd.read_csv("data/final_vol.csv")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset import PairDataset
+from plots import Chart, render_charts
 
 # Target label column (adjust if using 'trend_label' instead)
 target_col = 'volatility_label'  # or 'trend_label'
-exclude_cols = ['time', 'pair_name', target_col] + [col for col in df.columns if col.startswith('pair_')]
-features = [col for col in df.columns if col not in exclude_cols]
+
+# Load labeled dataset, sorted by (pair, time)
+dataset = PairDataset.read_csv("data/final_vol.csv", target=target_col)
+features = dataset.feature_columns()
 
 # Output folder for confusion matrices
 output_dir = "visualizations/confusion_matrices"
-os.makedirs(output_dir, exist_ok=True)
 
-# Process each pair
-for pair in df['pair_name'].dropna().unique():
-    print(f"[INFO] Generating confusion matrix for {pair}...")
+# Runs in a plotting worker: load the pair's model and score its test rows
+def plot_confusion_matrix(test_df, pair, model_path):
+    model = joblib.load(model_path)
+    y_pred = model.predict(test_df[features])
 
-    # Filter data for this pair and sort chronologically
-    pair_df = df[df['pair_name'] == pair].sort_values(by='time').dropna(subset=[target_col])
-    
-    if len(pair_df) < 100:
+    cm = confusion_matrix(test_df[target_col], y_pred, labels=[0, 1, 2])
+    disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=['Low', 'Medium', 'High'])
+
+    fig, ax = plt.subplots(figsize=(6, 5))
+    disp.plot(ax=ax, cmap='Blues', values_format='d')
+    plt.title(f"Confusion Matrix - {pair} (Volatility)")
+
+# One chart per pair; it is redrawn when the test rows or the model file change
+charts = []
+for pair in dataset.pairs():
+    if dataset.size(pair) < 100:
         print(f"[SKIPPED] {pair}: Not enough labeled data.")
         continue
 
-    # Time-aware split
-    split_idx = int(0.8 * len(pair_df))
-    test_df = pair_df.iloc[split_idx:]
-    X_test = test_df[features]
-    y_test = test_df[target_col]
-
-    # Load the corresponding saved model
     model_path = f"models/{pair}_vol_model.joblib"
     if not os.path.exists(model_path):
         print(f"[SKIPPED] {pair}: Model file not found at {model_path}.")
         continue
 
-    model = joblib.load(model_path)
-
-    # Predict on test data
-    y_pred = model.predict(X_test)
-
-    # Generate and save confusion matrix
-    cm = confusion_matrix(y_test, y_pred, labels=[0, 1, 2])
-    disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=['Low', 'Medium', 'High'])
-
-    fig, ax = plt.subplots(figsize=(6, 5))
-    disp.plot(ax=ax, cmap='Blues', values_format='d')
-    plt.title(f"Confusion Matrix - {pair} (Volatility)")
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, f"{pair}_conf_matrix.png"))
-    plt.close()
+    # Time-aware split, same boundary as training
+    _, test_df = dataset.split(pair)
+    charts.append(Chart(os.path.join(output_dir, f"{pair}_conf_matrix.png"), plot_confusion_matrix,
+                        test_df[features + [target_col]], {'pair': pair, 'model_path': model_path}, files=(model_path,)))
 
-print("\nConfusion matrices saved in:", output_dir)
+drawn, unchanged = render_charts(charts)
+print(f"\nConfusion matrices saved in: {output_dir} ({drawn} drawn, {unchanged} unchanged)")
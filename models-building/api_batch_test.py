@@ -0,0 +1,38 @@
+import requests, json, time
+
+API_URL = "http://localhost:8000"
+PAIRS = [
+    'AUDUSD', 'EURUSD', 'GBPUSD', 'NZDUSD', 'USDCAD',
+    'USDCHF', 'USDHKD', 'USDNOK', 'USDSEK'
+]
+ROUNDS = 20
+
+# sample.json holds one pair's processed rows; reuse them for every pair
+data = json.load(open("sample.json"))
+items = [{"pair": pair, "data": data} for pair in PAIRS]
+
+# === /predict in a loop (one request per pair) ===
+start = time.perf_counter()
+for _ in range(ROUNDS):
+    for item in items:
+        requests.post(f"{API_URL}/predict", json=item).raise_for_status()
+loop_ms = (time.perf_counter() - start) * 1000 / ROUNDS
+
+# === /predict_batch (all pairs in one request) ===
+start = time.perf_counter()
+for _ in range(ROUNDS):
+    res = requests.post(f"{API_URL}/predict_batch", json={"items": items})
+    res.raise_for_status()
+batch_ms = (time.perf_counter() - start) * 1000 / ROUNDS
+
+result = res.json()
+for pred in result["predictions"]:
+    print(pred)
+if result["errors"]:
+    print("Errors:", result["errors"])
+
+print(f"\nServer batch latency: {result['latency_ms']['batch']:.2f} ms")
+for pair, ms in result["latency_ms"]["per_pair"].items():
+    print(f"  {pair}: {ms:.2f} ms")
+print(f"\n/predict loop over {len(items)} pairs: {loop_ms:.1f} ms per round")
+print(f"/predict_batch:                 {batch_ms:.1f} ms per round ({loop_ms / batch_ms:.1f}x)")
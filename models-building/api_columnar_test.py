@@ -0,0 +1,45 @@
+import requests, json, time
+import numpy as np
+import msgpack
+
+API_URL = "http://localhost:8000"
+FEATURE_COLS = [
+    'open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume',
+    'sma_14', 'adx_14', 'stoch_k', 'rsi_14', 'cci_20', 'roc_10', 'atr_14',
+    'bb_width', 'obv', 'mfi_14', 'macd_line', 'macd_hist', 'candle_body', 'candle_range'
+]
+ROUNDS = 50
+
+data = json.load(open("sample.json"))
+columns = {col: [row.get(col) for row in data] for col in FEATURE_COLS}
+
+requests_by_format = {
+    "row JSON (/predict)": (
+        f"{API_URL}/predict",
+        json.dumps({"pair": "EURUSD", "data": data}),
+        "application/json",
+    ),
+    "columnar JSON": (
+        f"{API_URL}/predict_columnar",
+        json.dumps({"pair": "EURUSD", "columns": columns}),
+        "application/json",
+    ),
+    "columnar msgpack": (
+        f"{API_URL}/predict_columnar",
+        msgpack.packb({"pair": "EURUSD", "columns": columns}),
+        "application/msgpack",
+    ),
+    "raw float64": (
+        f"{API_URL}/predict_columnar?pair=EURUSD",
+        np.array([columns[col] for col in FEATURE_COLS], dtype='<f8').tobytes(),
+        "application/octet-stream",
+    ),
+}
+
+for name, (url, body, content_type) in requests_by_format.items():
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        res = requests.post(url, data=body, headers={"Content-Type": content_type})
+        res.raise_for_status()
+    ms = (time.perf_counter() - start) * 1000 / ROUNDS
+    print(f"{name:20s} {len(body) / 1024:8.1f} KiB  {ms:7.2f} ms  {res.json()}")
@@ -0,0 +1,187 @@
+import glob
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from bar_store import STORE_DIR, BarStore
+
+# Bar providers for pred.py. Every source returns closed bars only, as a
+# DataFrame with the MetaTrader5 rate columns and 'time' as a datetime.
+
+BAR_COLS = ['time', 'open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume']
+H4 = timedelta(hours=4)
+
+
+class MT5Source:
+    """Live bars from a running MetaTrader5 terminal.
+
+    The MetaTrader5 package is not safe to call from several threads at once,
+    so calls into it are serialized; fetches from concurrent workers queue up.
+    `login` (login, password, server) is passed to mt5.initialize; without it
+    the terminal's current account is used.
+    """
+
+    def __init__(self, period=H4, settle_seconds=5, poll_seconds=60, **login):
+        import MetaTrader5 as mt5  # Only needed for live data
+
+        self.mt5 = mt5
+        self.timeframe = mt5.TIMEFRAME_H4
+        self.period = period
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.lock = threading.RLock()
+        if not mt5.initialize(**login):
+            raise RuntimeError(f"MetaTrader5 initialization failed: {mt5.last_error()}")
+
+    def fetch(self, pair, since=None, count=500):
+        """Closed bars after `since`, or the last `count` closed bars."""
+        with self.lock:
+            if since is None:
+                # Position 0 is the bar still forming
+                rates = self.mt5.copy_rates_from_pos(pair, self.timeframe, 1, count)
+            else:
+                # Bar times are naive epoch seconds; MetaTrader5 reads naive datetimes as
+                # local time, so pass them UTC-aware to keep the range from shifting.
+                # Generous upper bound: server time runs ahead of UTC; the forming bar is dropped below
+                start = datetime.fromtimestamp(pd.Timestamp(since).timestamp() + 1, tz=timezone.utc)
+                end = datetime.now(timezone.utc) + timedelta(days=1)
+                rates = self.mt5.copy_rates_range(pair, self.timeframe, start, end)
+            forming = self._forming_bar_time(pair)
+        if rates is None or len(rates) == 0:
+            return pd.DataFrame(columns=BAR_COLS)
+        df = pd.DataFrame(rates)
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        if forming is not None:
+            df = df[df['time'] < forming]
+        if since is not None:
+            df = df[df['time'] > since]
+        return df[BAR_COLS].reset_index(drop=True)
+
+    def _forming_bar_time(self, pair):
+        with self.lock:
+            rates = self.mt5.copy_rates_from_pos(pair, self.timeframe, 0, 1)
+        if rates is None or len(rates) == 0:
+            return None
+        return pd.to_datetime(rates[0]['time'], unit='s')
+
+    def wait_for_next_close(self, pair):
+        """Sleep until the bar forming on `pair` has closed (in server time)."""
+        with self.lock:
+            tick = self.mt5.symbol_info_tick(pair)
+        forming = self._forming_bar_time(pair)
+        if tick is None or forming is None:
+            wait = self.poll_seconds
+        else:
+            server_now = pd.to_datetime(tick.time, unit='s')
+            wait = (forming + self.period - server_now).total_seconds() + self.settle_seconds
+            # Market closed (stale tick) or clock skew: check again later
+            if wait <= 0:
+                wait = self.poll_seconds
+        time.sleep(min(wait, self.period.total_seconds()))
+
+    def close(self):
+        self.mt5.shutdown()
+
+
+class ReplaySource:
+    """Replays stored bars (`{pair: DataFrame}`) as if they were live.
+
+    The replay clock starts once `warmup` bars of every pair are available;
+    each `wait_for_next_close` reveals the next bar and raises StopIteration
+    when the data is exhausted. With `delay`, bars close every `delay`
+    seconds on a fixed schedule, like a live feed: a caller that takes longer
+    than that falls behind and gets the missed bars without waiting.
+    """
+
+    def __init__(self, frames, warmup=500, delay=0.0):
+        self.frames = {pair: df[BAR_COLS].sort_values('time').reset_index(drop=True) for pair, df in frames.items()}
+        self.index = {pair: pd.DatetimeIndex(df['time']) for pair, df in self.frames.items()}
+        self.delay = delay
+        self.deadline = None
+        self.times = pd.DatetimeIndex(np.unique(np.concatenate([df['time'].to_numpy() for df in self.frames.values()])))
+        start = max(df['time'].iloc[min(warmup, len(df)) - 1] for df in self.frames.values())
+        self.position = self.times.get_loc(start)
+
+    @property
+    def clock(self):
+        # Open time of the newest bar treated as closed
+        return self.times[self.position]
+
+    def fetch(self, pair, since=None, count=500):
+        df = self.frames.get(pair)
+        if df is None:
+            return pd.DataFrame(columns=BAR_COLS)
+        # Binary search on the sorted times, so long histories replay in O(log n) per fetch
+        index = self.index[pair]
+        end = index.searchsorted(self.clock, side='right')
+        start = max(end - count, 0) if since is None else index.searchsorted(since, side='right')
+        return df.iloc[start:end].reset_index(drop=True)
+
+    def wait_for_next_close(self, pair=None):
+        if self.position + 1 >= len(self.times):
+            raise StopIteration("Replay data exhausted")
+        if self.delay:
+            now = time.monotonic()
+            self.deadline = (self.deadline or now) + self.delay
+            time.sleep(max(self.deadline - now, 0))
+        self.position += 1
+
+    def close(self):
+        pass
+
+
+class CSVReplaySource(ReplaySource):
+    """Replays the exported `{pair}_H4.csv` files."""
+
+    def __init__(self, data_dir="data/separate data", pairs=None, warmup=500, delay=0.0):
+        frames = {}
+        for file in sorted(glob.glob(os.path.join(data_dir, "*_H4.csv"))):
+            pair = os.path.basename(file).split("_")[0]
+            if pairs is None or pair in pairs:
+                frames[pair] = pd.read_csv(file, parse_dates=['time'])
+        if not frames:
+            raise FileNotFoundError(f"No *_H4.csv files for {pairs} in {data_dir}")
+        super().__init__(frames, warmup, delay)
+
+
+class StoreReplaySource(ReplaySource):
+    """Replays the bars in a BarStore (see bar_store.py)."""
+
+    def __init__(self, root=STORE_DIR, pairs=None, warmup=500, delay=0.0):
+        store = BarStore(root)
+        frames = {pair: store.frame(pair) for pair in store.pairs() if pairs is None or pair in pairs}
+        if not frames:
+            raise FileNotFoundError(f"No stored bars for {pairs} in {root}")
+        super().__init__(frames, warmup, delay)
+
+
+class SyntheticSource(ReplaySource):
+    """Random-walk H4 bars for load testing, `bars` per pair.
+
+    Prices follow a geometric random walk (one `seed` for all pairs), so runs
+    are reproducible and histories can be made far longer than the exports.
+    """
+
+    def __init__(self, pairs, bars=3000, warmup=500, delay=0.0, seed=0, start="2000-01-03"):
+        rng = np.random.default_rng(seed)
+        times = pd.date_range(start, periods=bars, freq=H4)
+        frames = {}
+        for pair in pairs:
+            close = np.exp(np.cumsum(rng.normal(0, 0.002, bars)))
+            open_ = np.concatenate(([1.0], close[:-1]))
+            wick = np.abs(rng.normal(0, 0.001, (2, bars)))
+            frames[pair] = pd.DataFrame({
+                'time': times,
+                'open': open_,
+                'high': np.maximum(open_, close) * (1 + wick[0]),
+                'low': np.minimum(open_, close) * (1 - wick[1]),
+                'close': close,
+                'tick_volume': rng.integers(500, 20000, bars),
+                'spread': rng.integers(0, 30, bars),
+                'real_volume': np.zeros(bars, dtype=np.int64),
+            })
+        super().__init__(frames, warmup, delay)
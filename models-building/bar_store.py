@@ -0,0 +1,227 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Append-only columnar store for OHLCV bars.
+#
+# Each pair lives in its own directory ({root}/{PAIR}_{TIMEFRAME}/) with one
+# raw little-endian file per column. Reads are np.memmap views, so slicing a
+# time range touches only the pages it needs and copies nothing. The time
+# column is written last on append and defines the row count, so a partially
+# written append is ignored and overwritten by the next one.
+
+COLUMNS = {
+    'time': '<i8',  # Epoch seconds (broker server time, as MetaTrader5 returns it)
+    'open': '<f8',
+    'high': '<f8',
+    'low': '<f8',
+    'close': '<f8',
+    'tick_volume': '<i8',
+    'spread': '<i4',
+    'real_volume': '<i8',
+}
+STORE_DIR = "data/bars"
+
+
+def _epoch_seconds(values):
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.int64)
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+
+class BarStore:
+    def __init__(self, root=STORE_DIR, timeframe="H4"):
+        self.root = root
+        self.timeframe = timeframe
+
+    def _dir(self, pair):
+        return os.path.join(self.root, f"{pair}_{self.timeframe}")
+
+    def _path(self, pair, column):
+        return os.path.join(self._dir(pair), column)
+
+    def pairs(self):
+        suffix = f"_{self.timeframe}"
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-len(suffix)] for name in os.listdir(self.root) if name.endswith(suffix))
+
+    def __len__(self):
+        return sum(self.count(pair) for pair in self.pairs())
+
+    def count(self, pair):
+        path = self._path(pair, 'time')
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // np.dtype(COLUMNS['time']).itemsize
+
+    def last_time(self, pair):
+        """Epoch seconds of the newest stored bar, or None."""
+        n = self.count(pair)
+        if n == 0:
+            return None
+        return int(np.memmap(self._path(pair, 'time'), dtype=COLUMNS['time'], mode='r', offset=(n - 1) * 8, shape=(1,))[0])
+
+    # === Writing ===
+    def append(self, pair, bars):
+        """Append bars newer than the last stored one; returns how many were written.
+
+        `bars` is a DataFrame (or dict of arrays) with the COLUMNS fields;
+        'time' may be epoch seconds or datetimes.
+        """
+        times = _epoch_seconds(bars['time'])
+        order = np.argsort(times, kind='stable')
+        last = self.last_time(pair)
+        keep = order if last is None else order[times[order] > last]
+        # Duplicate timestamps inside the batch keep their first row
+        if len(keep):
+            keep = keep[np.concatenate(([True], np.diff(times[keep]) > 0))]
+        if not len(keep):
+            return 0
+
+        os.makedirs(self._dir(pair), exist_ok=True)
+        n = self.count(pair)
+        # 'time' goes last: until it is written the new rows do not exist
+        for column in sorted(COLUMNS, key=lambda column: column == 'time'):
+            dtype = COLUMNS[column]
+            values = times[keep] if column == 'time' else np.asarray(bars[column])[keep]
+            path = self._path(pair, column)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                # Drop the tail of an interrupted append before writing
+                f.truncate(n * np.dtype(dtype).itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+        return len(keep)
+
+    def import_csv(self, path, pair=None):
+        pair = pair or os.path.basename(path).split("_")[0]
+        return self.append(pair, pd.read_csv(path))
+
+    # === Reading ===
+    def read(self, pair, start=None, end=None, columns=None):
+        """Zero-copy column views for bars with start <= time < end.
+
+        `start`/`end` are epoch seconds or anything pd.Timestamp accepts.
+        """
+        n = self.count(pair)
+        columns = list(columns or COLUMNS)
+        if n == 0:
+            return {column: np.empty(0, dtype=COLUMNS[column]) for column in columns}
+
+        times = np.memmap(self._path(pair, 'time'), dtype=COLUMNS['time'], mode='r', shape=(n,))
+        lo = 0 if start is None else int(np.searchsorted(times, self._bound(start), 'left'))
+        hi = n if end is None else int(np.searchsorted(times, self._bound(end), 'left'))
+        return {
+            column: np.memmap(self._path(pair, column), dtype=COLUMNS[column], mode='r', shape=(n,))[lo:hi]
+            for column in columns
+        }
+
+    @staticmethod
+    def _bound(value):
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        return int(pd.Timestamp(value).timestamp())
+
+    def frame(self, pair, start=None, end=None, columns=None):
+        """Bars as a DataFrame with 'time' as datetime64 (the MT5/CSV layout)."""
+        return _frame(self.read(pair, start, end, columns))
+
+    def iter_frames(self, pair, chunk_rows=100_000, columns=None):
+        """The pair's bars as consecutive DataFrames of at most `chunk_rows` rows."""
+        arrays = self.read(pair, columns=columns)
+        rows = len(next(iter(arrays.values()), []))
+        for start in range(0, rows, chunk_rows):
+            yield _frame({column: values[start:start + chunk_rows] for column, values in arrays.items()})
+
+
+def _frame(arrays):
+    df = pd.DataFrame({column: np.asarray(values) for column, values in arrays.items()})
+    if 'time' in df:
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+    return df
+
+
+# === Unified file: every pair's bars in one compressed .npz (unify.py) ===
+# Columnar like the store, with the pair as a small integer code into
+# 'pair_names' and prices as integer multiples of 1/PRICE_SCALE, which is
+# exact for quotes with up to 5 decimals and compresses far better than
+# float text or float64.
+
+UNIFIED_FILE = "data/ohlcv.npz"
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+PRICE_SCALE = 10 ** 5
+
+
+def write_unified(path, chunks):
+    """Write `(pair, DataFrame)` chunks, rows grouped by pair, as one .npz; returns the row count."""
+    names, columns = [], {column: [] for column in COLUMNS}
+    codes = []
+    for pair, df in chunks:
+        if pair not in names:
+            names.append(pair)
+        codes.append(np.full(len(df), names.index(pair), dtype=np.uint8))
+        columns['time'].append(_epoch_seconds(df['time']))
+        for column in COLUMNS:
+            if column in PRICE_COLUMNS:
+                values = df[column].to_numpy(dtype=float)
+                scaled = np.round(values * PRICE_SCALE)
+                # Tolerates float noise in the source (7.794399999999999 is stored as 7.7944)
+                if not np.allclose(scaled / PRICE_SCALE, values, rtol=1e-9, atol=0):
+                    raise ValueError(f"{pair} {column} has prices with more than {len(str(PRICE_SCALE)) - 1} decimals")
+                columns[column].append(scaled.astype('<i4'))
+            elif column != 'time':
+                columns[column].append(df[column].to_numpy(dtype=COLUMNS[column]))
+    arrays = {column: np.concatenate(parts) if parts else np.empty(0, dtype=COLUMNS[column])
+              for column, parts in columns.items()}
+    arrays['pair'] = np.concatenate(codes) if codes else np.empty(0, dtype=np.uint8)
+    np.savez_compressed(path, pair_names=np.array(names), **arrays)
+    return len(arrays['pair'])
+
+
+def read_unified(path):
+    """The bars of write_unified as a DataFrame: 'time' datetime64, float prices, 'pair' categorical."""
+    with np.load(path) as data:
+        arrays = {column: data[column] for column in COLUMNS}
+        for column in PRICE_COLUMNS:
+            arrays[column] = arrays[column] / PRICE_SCALE
+        df = _frame(arrays)
+        df['pair'] = pd.Categorical.from_codes(data['pair'], categories=data['pair_names'].tolist())
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the columnar OHLCV bar store.")
+    parser.add_argument("command", choices=["import", "info", "bench"])
+    parser.add_argument("--csv-dir", default="data/separate data", help="Directory of {pair}_H4.csv files.")
+    parser.add_argument("--root", default=STORE_DIR)
+    args = parser.parse_args()
+    store = BarStore(args.root)
+
+    if args.command == "import":
+        for file in sorted(glob.glob(os.path.join(args.csv_dir, "*_H4.csv"))):
+            added = store.import_csv(file)
+            print(f"{os.path.basename(file)}: {added} new bars")
+    elif args.command == "info":
+        for pair in store.pairs():
+            times = store.read(pair, columns=['time'])['time']
+            print(f"{pair}: {len(times)} bars, {pd.to_datetime(times[0], unit='s')} .. {pd.to_datetime(times[-1], unit='s')}")
+    else:
+        files = sorted(glob.glob(os.path.join(args.csv_dir, "*_H4.csv")))
+        start = time.perf_counter()
+        rows = sum(len(pd.read_csv(file, parse_dates=['time'])) for file in files)
+        csv_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        stored = sum(len(store.frame(pair)) for pair in store.pairs())
+        frame_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for pair in store.pairs():
+            store.read(pair)
+        read_seconds = time.perf_counter() - start
+        print(f"read_csv: {rows} bars in {csv_seconds * 1000:.1f} ms")
+        print(f"store frame(): {stored} bars in {frame_seconds * 1000:.1f} ms")
+        print(f"store read() (memmap views): {read_seconds * 1000:.2f} ms")
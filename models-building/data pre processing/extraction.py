@@ -1,6 +1,9 @@
-import MetaTrader5 as mt5
-import pandas as pd
-from datetime import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bar_sources import MT5Source
+from bar_store import BarStore
 
 # Account credentials
 LOGIN = ***
@@ -15,39 +18,40 @@ usd_pairs = [
 
 # Connect to MetaTrader 5
 print("Connecting to MetaTrader 5...")
-if not mt5.initialize(login=LOGIN, password=PASSWORD, server=SERVER):
-    print("Login failed:", mt5.last_error())
+try:
+    source = MT5Source(login=LOGIN, password=PASSWORD, server=SERVER)
+except RuntimeError as e:
+    print("Login failed:", e)
     quit()
 print("Login successful!")
 
 # Parameters
-timeframe = mt5.TIMEFRAME_H4
 bars = 3000
-utc_to = datetime.now()
 data_dict = {}
+store = BarStore()  # data/bars, relative to models-building
 
 # Fetch data for each pair
 for symbol in usd_pairs:
-    if not mt5.symbol_select(symbol, True):
+    if not source.mt5.symbol_select(symbol, True):
         print(f"Warning: Could not enable {symbol} in Market Watch")
         continue
 
-    rates = mt5.copy_rates_from(symbol, timeframe, utc_to, bars)
-    if rates is None or len(rates) == 0:
+    # Closed bars only: the bar still forming would be stored with its partial
+    # OHLC for good, since later appends skip bars that are already stored
+    df = source.fetch(symbol, count=bars)
+    if df.empty:
         print(f"No data retrieved for {symbol}")
         continue
 
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
     data_dict[symbol] = df
     print(f"{symbol}: {len(df)} H4 candles fetched")
 
-    # Save to CSV
-    df.to_csv(f"{symbol}_H4.csv", index=False)
-    print(f"Saved {symbol}_H4.csv")
+    # Append to the bar store; bars already stored are skipped, so reruns only add new ones
+    added = store.append(symbol, df)
+    print(f"Stored {added} new {symbol} bars ({store.count(symbol)} total)")
 
 # Disconnect from MT5
-mt5.shutdown()
+source.close()
 print("Disconnected from MetaTrader 5")
 
 # Sample preview of EURUSD
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+# A multi-pair dataset sorted once by (pair, time).
+#
+# Every pair's rows end up contiguous, so a pair is just a [start, stop) row
+# range: selecting it is an iloc slice (a view, no copy and no scan of the
+# other pairs) and its chronological train/test split is an offset inside
+# that range.
+
+TRAIN_FRACTION = 0.8
+
+
+class PairDataset:
+    def __init__(self, df, pair_col='pair_name', time_col='time', target=None):
+        """`target`, if given, drops the rows where it is missing (unlabeled bars) before indexing."""
+        df = df.dropna(subset=[pair_col] if target is None else [pair_col, target])
+        df = df.sort_values([pair_col, time_col], kind='stable').reset_index(drop=True)
+        self.frame = df
+        self.pair_col = pair_col
+        self.time_col = time_col
+        self.target = target
+
+        names = df[pair_col].to_numpy()
+        starts = np.concatenate(([0], np.flatnonzero(names[1:] != names[:-1]) + 1)) if len(df) else np.empty(0, dtype=int)
+        stops = np.append(starts[1:], len(df))
+        self.bounds = {str(names[start]): (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+    @classmethod
+    def read_csv(cls, path, pair_col='pair_name', time_col='time', target=None, **kwargs):
+        kwargs.setdefault('dtype', {})[pair_col] = 'category'
+        return cls(pd.read_csv(path, **kwargs), pair_col, time_col, target)
+
+    def pairs(self):
+        return list(self.bounds)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __iter__(self):
+        """(pair, rows) for every pair, in pair order."""
+        for pair in self.bounds:
+            yield pair, self[pair]
+
+    def __getitem__(self, pair):
+        start, stop = self.bounds[pair]
+        return self.frame.iloc[start:stop]
+
+    def size(self, pair):
+        start, stop = self.bounds[pair]
+        return stop - start
+
+    def split_index(self, pair, fraction=TRAIN_FRACTION):
+        """Row position (within the pair) where the test set starts."""
+        return int(fraction * self.size(pair))
+
+    def split(self, pair, fraction=TRAIN_FRACTION):
+        """Chronological (train, test) views: the first `fraction` of the pair's rows, then the rest."""
+        rows = self[pair]
+        split_idx = self.split_index(pair, fraction)
+        return rows.iloc[:split_idx], rows.iloc[split_idx:]
+
+    def panel(self, column):
+        """`column` as a bars x pairs array, each pair's bars from row 0 and NaN after its last one.
+
+        Column-wise operations that only look back (rolling, ewm, expanding)
+        then run for every pair in one call; `unpack` maps the result back.
+        """
+        lengths = [stop - start for start, stop in self.bounds.values()]
+        panel = np.full((max(lengths, default=0), len(lengths)), np.nan)
+        values = self.frame[column].to_numpy(dtype=float)
+        for j, (start, stop) in enumerate(self.bounds.values()):
+            panel[:stop - start, j] = values[start:stop]
+        return panel
+
+    def unpack(self, panel):
+        """The inverse of `panel`: one value per row of the frame."""
+        panel = np.asarray(panel)
+        if not self.bounds:
+            return np.empty(0, dtype=panel.dtype)
+        return np.concatenate([panel[:stop - start, j] for j, (start, stop) in enumerate(self.bounds.values())])
+
+    def feature_columns(self, exclude=()):
+        """Every column except time, the pair, the target and `exclude`."""
+        skip = {self.time_col, self.pair_col, self.target, *exclude}
+        return [col for col in self.frame.columns if col not in skip]
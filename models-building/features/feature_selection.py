@@ -8,15 +8,17 @@ print(df.columns)
 
 
 # Step 1: Identify and separate columns to exclude
-pair_columns = [col for col in df.columns if col.startswith("pair_")]
-columns_to_exclude = pair_columns + ['time', 'pair_name']
+columns_to_exclude = ['time', 'pair_name']
 df_excluded = df[columns_to_exclude].copy()
 
 # Step 2: Drop them from the feature set
 df_features = df.drop(columns=columns_to_exclude)
 
 # Step 3: Compute correlation matrix
-correlation_matrix = df_features.corr()
+# Per pair, then averaged: features are unscaled, so pooling the pairs would
+# correlate everything that follows the price level (atr_14, bb_width, ...)
+correlation_matrix = df_features.groupby(df['pair_name']).corr().groupby(level=1).mean()
+correlation_matrix = correlation_matrix.loc[df_features.columns, df_features.columns]
 
 # Optional: Visualize the correlation heatmap
 plt.figure(figsize=(18, 14))
@@ -1,9 +1,14 @@
 import MetaTrader5 as mt5
 import pandas as pd
 import numpy as np
-import pandas_ta as ta
 from datetime import datetime
 import json
+import os
+import sys
+
+# Feature definitions are shared with pred.py, training and the API service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "docked-api", "app"))
+from utils.features import FEATURE_COLS, compute_features
 
 # === Configuration ===
 TIMEFRAME = mt5.TIMEFRAME_H4
@@ -17,43 +22,6 @@ if not mt5.initialize():
     print("MetaTrader5 initialization failed")
     quit()
 
-# === Technical Indicator Computation Function ===
-def compute_indicators(df):
-    df.ta.sma(length=14, append=True)
-    df.ta.adx(length=14, append=True)
-    df.ta.stoch(k=14, d=3, smooth_k=3, append=True)
-    df.ta.rsi(length=14, append=True)
-    df.ta.cci(length=20, append=True)
-    df.ta.roc(length=10, append=True)
-    df.ta.atr(length=14, append=True)
-
-    bb = df.ta.bbands(length=20, std=2.0, append=True)
-    df['bb_width'] = bb['BBU_20_2.0'] - bb['BBL_20_2.0']
-
-    df['volume'] = df['tick_volume']
-    df.ta.obv(append=True)
-    df.ta.mfi(length=14, append=True)
-    df.ta.macd(append=True)
-
-    df['candle_body'] = abs(df['close'] - df['open'])
-    df['candle_range'] = df['high'] - df['low']
-
-    rename_map = {
-        'SMA_14': 'sma_14',
-        'ADX_14': 'adx_14',
-        'STOCHk_14_3_3': 'stoch_k',
-        'RSI_14': 'rsi_14',
-        'CCI_20_0.015': 'cci_20',
-        'ROC_10': 'roc_10',
-        'ATRr_14': 'atr_14',
-        'OBV': 'obv',
-        'MFI_14': 'mfi_14',
-        'MACD_12_26_9': 'macd_line',
-        'MACDh_12_26_9': 'macd_hist'
-    }
-    df.rename(columns=rename_map, inplace=True)
-    return df
-
 # === Fetch & Process Data ===
 rates = mt5.copy_rates_from_pos(user_pair, TIMEFRAME, 0, CANDLES)
 
@@ -62,7 +30,7 @@ if rates is None or len(rates) < 60:
 else:
     df = pd.DataFrame(rates)
     df['time'] = pd.to_datetime(df['time'], unit='s')
-    df = compute_indicators(df)
+    df = compute_features(df, FEATURE_COLS)
     df.dropna(inplace=True)
     df['pair'] = user_pair
 
@@ -0,0 +1,107 @@
+import argparse
+import os
+import sys
+
+import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset import PairDataset
+from plots import Chart, render_charts
+
+# Charts of the labeled datasets, drawn after (and apart from) labeling:
+# market_direction_label.py and volatility_label.py only write their CSVs.
+# Charts whose pair slice hasn't changed since the last run are skipped.
+
+TREND_VIS_DIR = "visualizations/market_trend_vis"
+DIST_VIS_DIR = "visualizations/market_trend_vis/distribution"
+VOL_VIS_DIR = "volatility_vis"
+
+# Mapping for labels (optional for readability)
+vol_label_names = {0: 'Low', 1: 'Medium', 2: 'High'}
+
+
+def plot_trend(pair_df, pair, method):
+    # Close price with trend label
+    plt.figure(figsize=(14, 4))
+    plt.plot(pair_df['time'], pair_df['close'], label='Close Price', alpha=0.6)
+    plt.plot(pair_df['time'], pair_df['trend_label'], label='Trend Label', linewidth=1.2)
+    plt.title(f"Trend Label (ATR-Adjusted, {method}) for {pair}")
+    plt.xlabel("Time")
+    plt.ylabel("Value")
+    plt.legend()
+    plt.grid(True)
+
+
+def plot_trend_distribution(labels, pair):
+    label_counts = labels.value_counts(dropna=True).sort_index()
+    label_counts = label_counts.reindex([-1, 0, 1], fill_value=0)
+
+    plt.figure(figsize=(6, 4))
+    label_counts.plot(kind='bar', color=['red', 'gray', 'green'])
+    plt.title(f"Trend Label Distribution: {pair}")
+    plt.xlabel("Trend Label (-1: Down, 0: Range, 1: Up)")
+    plt.ylabel("Count")
+    plt.grid(axis='y')
+
+
+def plot_volatility_distribution(labels, pair):
+    label_counts = labels.value_counts().sort_index()
+    label_counts = label_counts.reindex([0, 1, 2], fill_value=0)  # Ensure all labels exist
+
+    plt.figure(figsize=(6, 4))
+    plt.bar(
+        [vol_label_names[i] for i in label_counts.index],
+        label_counts.values,
+        color=['green', 'orange', 'red']
+    )
+    plt.title(f'Volatility Label Distribution - {pair}')
+    plt.xlabel('Volatility Label')
+    plt.ylabel('Count')
+    plt.grid(axis='y')
+
+
+def trend_charts(path, method):
+    dataset = PairDataset.read_csv(path, parse_dates=['time'])
+    charts = []
+    for pair, pair_df in dataset:
+        # Skip if no valid labels
+        if pair_df['trend_label'].dropna().empty:
+            continue
+        charts.append(Chart(os.path.join(TREND_VIS_DIR, f"{pair}_trend.png"), plot_trend,
+                            pair_df[['time', 'close', 'trend_label']], {'pair': pair, 'method': method}))
+        charts.append(Chart(os.path.join(DIST_VIS_DIR, f"{pair}_distribution.png"), plot_trend_distribution,
+                            pair_df['trend_label'], {'pair': pair}))
+    return charts
+
+
+def volatility_charts(path):
+    dataset = PairDataset.read_csv(path)
+    return [Chart(os.path.join(VOL_VIS_DIR, f"volatility_vis_{pair}_volatility_label_dist.png"),
+                  plot_volatility_distribution, pair_df['volatility_label'], {'pair': pair})
+            for pair, pair_df in dataset]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Draw the label charts of the labeled datasets.")
+    parser.add_argument("--trend", default="final_trend_direction.csv", help="Output of market_direction_label.py.")
+    parser.add_argument("--volatility", default="final_vol.csv", help="Output of volatility_label.py.")
+    parser.add_argument("--sma", action="store_true", help="The trend labels used simple moving averages.")
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes (-1: one per CPU).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    charts = []
+    for path, build in ((args.trend, lambda p: trend_charts(p, 'SMA' if args.sma else 'EMA')),
+                        (args.volatility, volatility_charts)):
+        if os.path.exists(path):
+            charts += build(path)
+        else:
+            print(f"[SKIPPED] {path} not found.")
+
+    drawn, unchanged = render_charts(charts, n_jobs=args.jobs)
+    print(f"{drawn} charts drawn, {unchanged} unchanged")
+    print(f"Trend plots saved in: {TREND_VIS_DIR}")
+    print(f"Distributions saved in: {DIST_VIS_DIR}")
+    print(f"Volatility plots saved in: {VOL_VIS_DIR}")
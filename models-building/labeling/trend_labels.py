@@ -0,0 +1,108 @@
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset import PairDataset
+
+# Vectorized ATR-adjusted trend labels, for one scheme or a whole grid of them.
+#
+# A bar is Uptrend (1) / Downtrend (-1) when the short moving average of the
+# close is above / below the long one by at least `multiplier` x ATR, and
+# Ranging (0) otherwise (ATR here is the rolling mean of high - low). Every
+# pair's bars fill one column of a bars x pairs panel, so each moving average
+# and ATR is one pandas call for all pairs, and each window is computed once
+# however many variants use it.
+
+
+def variant_name(short, long, atr, multiplier):
+    return f"trend_{short}_{long}_{atr}_{multiplier:g}"
+
+
+def trend_variants(dataset, short_windows, long_windows, atr_windows, multipliers, use_ema=True):
+    """One label column per (short, long, atr, multiplier) combination, aligned with dataset.frame.
+
+    Combinations with short >= long are skipped. Labels are -1/0/1, NaN
+    while a moving average or the ATR is still warming up.
+    """
+    close = pd.DataFrame(dataset.panel('close'))
+    hl_range = pd.DataFrame(dataset.panel('high') - dataset.panel('low'))
+
+    def moving_average(window):
+        if use_ema:
+            return close.ewm(span=window, adjust=False).mean().to_numpy()
+        return close.rolling(window=window).mean().to_numpy()
+
+    averages = {window: moving_average(window) for window in sorted(set(short_windows) | set(long_windows))}
+    atrs = {window: hl_range.rolling(window=window).mean().to_numpy() for window in sorted(set(atr_windows))}
+
+    labels = {}
+    for short, long in itertools.product(short_windows, long_windows):
+        if short >= long:
+            continue
+        diff = averages[short] - averages[long]
+        trend = np.where(diff > 0, 1.0, -1.0)
+        for atr_window, multiplier in itertools.product(atr_windows, multipliers):
+            atr = atrs[atr_window]
+            label = np.where(np.abs(diff) < atr * multiplier, 0.0, trend)
+            label[np.isnan(diff) | np.isnan(atr)] = np.nan
+            labels[variant_name(short, long, atr_window, multiplier)] = dataset.unpack(label)
+    return pd.DataFrame(labels, index=dataset.frame.index)
+
+
+def summarize(dataset, labels):
+    """Per variant: labeled rows, share of each class and mean length of a label run."""
+    pair_codes = pd.factorize(dataset.frame[dataset.pair_col])[0]
+    rows = []
+    for name in labels.columns:
+        values = labels[name].to_numpy()
+        valid = ~np.isnan(values)
+        # A run goes on while the pair and the label stay the same
+        continues = np.zeros(len(values), dtype=bool)
+        continues[1:] = valid[1:] & valid[:-1] & (pair_codes[1:] == pair_codes[:-1]) & (values[1:] == values[:-1])
+        runs = np.count_nonzero(valid & ~continues)
+        counts = {label: np.count_nonzero(values == label) for label in (-1, 0, 1)}
+        total = max(int(valid.sum()), 1)
+        rows.append({
+            'variant': name,
+            'labeled': int(valid.sum()),
+            'down': counts[-1] / total,
+            'range': counts[0] / total,
+            'up': counts[1] / total,
+            'mean_run': valid.sum() / max(runs, 1),
+        })
+    return pd.DataFrame(rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compute a grid of trend labeling schemes side by side.")
+    parser.add_argument("--input", default="data/semifinal_ohlcv_2.csv")
+    parser.add_argument("--output", default="data/trend_label_variants.csv")
+    parser.add_argument("--short", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--long", type=int, nargs="+", default=[20, 25, 50])
+    parser.add_argument("--atr", type=int, nargs="+", default=[14])
+    parser.add_argument("--multiplier", type=float, nargs="+", default=[0.25, 0.5, 1.0])
+    parser.add_argument("--sma", action="store_true", help="Simple instead of exponential moving averages.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    dataset = PairDataset.read_csv(args.input)
+
+    start = time.perf_counter()
+    labels = trend_variants(dataset, args.short, args.long, args.atr, args.multiplier, use_ema=not args.sma)
+    seconds = time.perf_counter() - start
+    print(f"{labels.shape[1]} variants x {len(dataset)} rows ({len(dataset.pairs())} pairs) in {seconds:.2f}s")
+
+    pd.set_option("display.width", 120)
+    print(summarize(dataset, labels).round(3).to_string(index=False))
+
+    out = pd.concat([dataset.frame[[dataset.time_col, dataset.pair_col]], labels], axis=1)
+    out.to_csv(args.output, index=False)
+    print(f"\nSaved label variants to: {args.output}")
@@ -0,0 +1,122 @@
+import argparse
+import bisect
+import math
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset import PairDataset
+
+# Causal volatility labels: Low (0) / Medium (1) / High (2).
+#
+# A bar's volatility (atr_14) is compared with the 33% and 66% quantiles of
+# its pair's last WINDOW bars, the bar itself included, so a label only ever
+# depends on the past and never changes once given. The quantiles are order
+# statistics ('lower' interpolation: element int(q * (n - 1)) of the sorted
+# window) rather than interpolated values, which is what lets the batch path
+# (pandas' rolling quantile, a skiplist per column) and the live path (a
+# sorted list kept with bisect) agree exactly.
+
+VOL_COLUMN = 'atr_14'
+QUANTILES = (0.33, 0.66)
+WINDOW = 1500       # ~1 year of 4h bars; None for an expanding window
+MIN_PERIODS = 100   # Bars needed before the first label
+
+
+def _label(values, low, high):
+    labels = np.where(values < low, 0.0, np.where(values < high, 1.0, 2.0))
+    labels[np.isnan(values) | np.isnan(low) | np.isnan(high)] = np.nan
+    return labels
+
+
+def volatility_labels(dataset, column=VOL_COLUMN, window=WINDOW, quantiles=QUANTILES, min_periods=MIN_PERIODS):
+    """Labels aligned with dataset.frame; NaN where the value is missing or fewer than `min_periods` bars are known."""
+    values = pd.DataFrame(dataset.panel(column))
+    if window is None:
+        rolling = values.expanding(min_periods=min_periods)
+    else:
+        rolling = values.rolling(window=window, min_periods=min_periods)
+    low, high = (rolling.quantile(q, interpolation='lower').to_numpy() for q in quantiles)
+    return pd.Series(dataset.unpack(_label(values.to_numpy(), low, high)), index=dataset.frame.index)
+
+
+class VolatilityLabeler:
+    """The same labels one bar at a time, for one pair.
+
+    `recent` holds the window in arrival order (to know what to evict) and
+    `ordered` the same non-missing values sorted, so an insert, an eviction
+    and a quantile are each a bisect plus one list shift.
+    """
+
+    def __init__(self, window=WINDOW, quantiles=QUANTILES, min_periods=MIN_PERIODS):
+        self.window = window
+        self.quantiles = quantiles
+        self.min_periods = min_periods
+        self.recent = deque()
+        self.ordered = []
+
+    def thresholds(self):
+        """(low, high) for the current window, or None while warming up."""
+        n = len(self.ordered)
+        if n < self.min_periods or n == 0:
+            return None
+        return tuple(self.ordered[int(q * (n - 1))] for q in self.quantiles)
+
+    def update(self, value):
+        """Add the next bar's volatility and return its label (NaN if it has none yet)."""
+        value = float(value)
+        self.recent.append(value)
+        if not math.isnan(value):
+            bisect.insort(self.ordered, value)
+        if self.window is not None and len(self.recent) > self.window:
+            old = self.recent.popleft()
+            if not math.isnan(old):
+                del self.ordered[bisect.bisect_left(self.ordered, old)]
+
+        limits = self.thresholds()
+        if limits is None or math.isnan(value):
+            return math.nan
+        low, high = limits
+        return 0.0 if value < low else 1.0 if value < high else 2.0
+
+
+def replay(dataset, column=VOL_COLUMN, **kwargs):
+    """Labels from feeding every pair's bars to its own VolatilityLabeler, in order."""
+    labels = np.empty(len(dataset))
+    values = dataset.frame[column].to_numpy(dtype=float)
+    for start, stop in dataset.bounds.values():
+        labeler = VolatilityLabeler(**kwargs)
+        labels[start:stop] = [labeler.update(value) for value in values[start:stop]]
+    return pd.Series(labels, index=dataset.frame.index)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Label volatility causally and check the live labeler against the batch one.")
+    parser.add_argument("--input", default="data/semifinal_ohlcv_2.csv")
+    parser.add_argument("--column", default=VOL_COLUMN)
+    parser.add_argument("--window", type=int, default=WINDOW, help="0 for an expanding window.")
+    parser.add_argument("--min-periods", type=int, default=MIN_PERIODS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    dataset = PairDataset.read_csv(args.input)
+    params = dict(window=args.window or None, min_periods=args.min_periods)
+
+    start = time.perf_counter()
+    batch = volatility_labels(dataset, args.column, **params)
+    batch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    live = replay(dataset, args.column, **params)
+    live_seconds = time.perf_counter() - start
+
+    print(f"{len(dataset)} rows ({len(dataset.pairs())} pairs): batch {batch_seconds:.3f}s, "
+          f"bar by bar {live_seconds:.3f}s ({live_seconds / max(len(dataset), 1) * 1e6:.1f} us/bar)")
+    print(f"Identical: {batch.equals(live)}")
+    print(batch.value_counts(dropna=False).sort_index().to_string())
@@ -1,21 +1,32 @@
+import argparse
 import pandas as pd
 import os
+import sys
+import time
 from sklearn.metrics import classification_report, f1_score, accuracy_score
 from sklearn.model_selection import GridSearchCV
 from lightgbm import LGBMClassifier
 from joblib import dump
 
-# Load the dataset
-df = pd.read_csv("data/final_trend_direction.csv")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset import PairDataset
+from halving_search import SuccessiveHalvingSearch
 
 # Define columns
 target_col = 'trend_label'
-exclude_cols = ['time', 'trend_label', 'pair_name'] + [col for col in df.columns if col.startswith('pair_')]
-features = [col for col in df.columns if col not in exclude_cols]
+
+# Load the labeled rows once, sorted by (pair, time)
+dataset = PairDataset.read_csv("data/final_trend_direction.csv", target=target_col)
+features = dataset.feature_columns()
 
 # Create output folders
 os.makedirs("model_logs", exist_ok=True)
 os.makedirs("models", exist_ok=True)
+summary_file = "model_logs/summary_metrics.csv"
+
+# Search modes: the cross-validated search is the default (its model is kept),
+# successive halving always runs next to it so both are recorded
+search_modes = ("grid", "halving")
 
 # Grid search space
 param_grid = {
@@ -28,78 +39,102 @@ param_grid = {
     'colsample_bytree': [0.8, 1.0]
 }
 
-# Store results
-results = {}
-
-for pair in df['pair_name'].dropna().unique():
+# Tune with one search mode; returns the fitted search and its wall time.
+# `n_jobs` candidates are fitted at once, each with `threads` LightGBM threads.
+def tune(mode, X_train, y_train, n_jobs=-1, threads=None):
+    # Base model for tuning
+    base_model = LGBMClassifier(objective='multiclass', num_class=3, random_state=42, n_jobs=threads)
+
+    if mode == "grid":
+        search = GridSearchCV(
+            estimator=base_model,
+            param_grid=param_grid,
+            scoring='f1_macro',
+            cv=3,
+            n_jobs=n_jobs,
+            verbose=1
+        )
+    else:
+        # Every grid combination, scored on the latest 20% of the training rows
+        search = SuccessiveHalvingSearch(base_model, param_grid, n_jobs=n_jobs, random_state=42)
+
+    start = time.perf_counter()
+    search.fit(X_train, y_train)
+    return search, time.perf_counter() - start
+
+# Tune, evaluate and save one pair's model; `modes` are the search modes to
+# run, the first one's model is kept
+def process_pair(pair, modes=search_modes, n_jobs=-1, threads=None):
     print(f"\n[INFO] Processing {pair}...")
 
-    # Prepare data
-    pair_df = df[df['pair_name'] == pair].sort_values('time').dropna(subset=[target_col])
-
-    if len(pair_df) < 100:
+    if dataset.size(pair) < 100:
         print(f"[SKIPPED] {pair}: Not enough labeled samples.")
-        continue
+        return None
 
-    # Time-aware split
-    split_idx = int(0.8 * len(pair_df))
-    train_df = pair_df.iloc[:split_idx]
-    test_df = pair_df.iloc[split_idx:]
+    # Time-aware split (views into the dataset, nothing is copied)
+    train_df, test_df = dataset.split(pair)
 
     X_train = train_df[features]
     y_train = train_df[target_col]
     X_test = test_df[features]
     y_test = test_df[target_col]
 
-    # Base model for tuning
-    base_model = LGBMClassifier(objective='multiclass', num_class=3, random_state=42)
-
-    # Grid search
-    grid_search = GridSearchCV(
-        estimator=base_model,
-        param_grid=param_grid,
-        scoring='f1_macro',
-        cv=3,
-        n_jobs=-1,
-        verbose=1
-    )
-    grid_search.fit(X_train, y_train)
-
-    # Best model
-    best_model = grid_search.best_estimator_
-    y_pred = best_model.predict(X_test)
-
-    # Evaluation
-    acc = accuracy_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred, average='macro')
-    report = classification_report(y_test, y_pred, digits=3)
-
-    print(f"[RESULT] Accuracy: {acc:.4f}, Macro-F1: {f1:.4f}")
-    print(f"[BEST PARAMS] {grid_search.best_params_}")
-
-    # Save results
-    results[pair] = {
-        'accuracy': acc,
-        'f1_macro': f1,
-        'report': report,
-        'best_params': grid_search.best_params_
-    }
+    # Each mode is evaluated on the same held-out test rows
+    runs = {}
+    for mode in modes:
+        search, seconds = tune(mode, X_train, y_train, n_jobs, threads)
+        y_pred = search.best_estimator_.predict(X_test)
+        runs[mode] = {
+            'search': search,
+            'seconds': seconds,
+            'accuracy': accuracy_score(y_test, y_pred),
+            'f1_macro': f1_score(y_test, y_pred, average='macro'),
+            'report': classification_report(y_test, y_pred, digits=3),
+        }
+        print(f"[{mode.upper()}] {pair} - {seconds:.1f}s, Accuracy: {runs[mode]['accuracy']:.4f}, Macro-F1: {runs[mode]['f1_macro']:.4f}")
+
+    # The model of the selected mode is the one kept
+    run = runs[modes[0]]
+    best_model = run['search'].best_estimator_
+    best_params = run['search'].best_params_
+    acc, f1, report = run['accuracy'], run['f1_macro'], run['report']
+
+    print(f"[RESULT] {pair} - Accuracy: {acc:.4f}, Macro-F1: {f1:.4f}")
+    print(f"[BEST PARAMS] {best_params}")
 
     # Save report
     with open(f"model_logs/{pair}_report.txt", "w") as f:
         f.write(f"== {pair} ==\n")
         f.write(f"Accuracy: {acc:.4f}\nMacro-F1: {f1:.4f}\n")
-        f.write(f"Best Params: {grid_search.best_params_}\n\n")
+        f.write(f"Best Params: {best_params}\n")
+        f.write(f"Search: {modes[0]}\n\n")
+        for mode, r in runs.items():
+            f.write(f"{mode:<8} Macro-F1: {r['f1_macro']:.4f}  Accuracy: {r['accuracy']:.4f}  Wall time: {r['seconds']:.1f}s\n")
+        f.write("\n")
         f.write(report)
 
     # Save model
     dump(best_model, f"models/{pair}_model.joblib")
 
-# Save summary
-summary = pd.DataFrame([
-    {'pair': pair, 'accuracy': res['accuracy'], 'f1_macro': res['f1_macro']}
-    for pair, res in results.items()
-]).sort_values(by='f1_macro', ascending=False)
-
-summary.to_csv("model_logs/summary_metrics.csv", index=False)
-print("\nAll tuned models saved in /models and reports in /model_logs.")
+    result = {'pair': pair, 'accuracy': acc, 'f1_macro': f1, 'search': modes[0]}
+    for mode, r in runs.items():
+        result[f'{mode}_f1_macro'] = r['f1_macro']
+        result[f'{mode}_seconds'] = r['seconds']
+    return result
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tune and train one trend model per pair (train_all.py trains both models).")
+    parser.add_argument("--search", choices=search_modes, default=search_modes[0],
+                        help="Mode whose model is saved: the exhaustive 3-fold grid search (default) or successive "
+                             "halving with early stopping. Both always run and are reported side by side.")
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="CPU budget for the whole run.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    modes = [args.search] + [m for m in search_modes if m != args.search]
+
+    # Pairs, candidates and LightGBM threads share one CPU budget
+    from train_all import train
+    train({'trend': modes}, cores=args.cores)
+    print("\nAll tuned models saved in /models and reports in /model_logs.")
@@ -0,0 +1,95 @@
+import math
+
+import lightgbm
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+# Successive halving over LightGBM boosting rounds.
+#
+# Every candidate is trained for a few rounds on the older part of the
+# training rows and scored (macro-F1) on the most recent part. The best
+# 1/eta of them go on to the next rung, with eta times more rounds, until the
+# last rung trains the few that are left for the full number of rounds.
+# Every fit also stops early once the loss on the recent rows stops
+# improving. The winner is then refit on all the training rows for the
+# number of rounds it needed.
+
+VALIDATION_FRACTION = 0.2   # Most recent share of the training rows used to score candidates
+ETA = 3                     # 1/ETA of the candidates survive each rung
+MIN_ROUNDS = 10
+MAX_ROUNDS = 300
+EARLY_STOPPING_ROUNDS = 20
+
+
+def _fit_candidate(estimator, params, rounds, X_fit, y_fit, X_val, y_val, early_stopping_rounds):
+    model = clone(estimator).set_params(**params, n_estimators=rounds)
+    # Early stopping can only use the classes the model was trained on
+    seen = y_val.isin(np.unique(y_fit)).to_numpy()
+    model.fit(X_fit, y_fit, eval_set=[(X_val[seen], y_val[seen])],
+              callbacks=[lightgbm.early_stopping(early_stopping_rounds, verbose=False)])
+    score = f1_score(y_val, model.predict(X_val), average='macro')
+    return score, model.best_iteration_ or rounds
+
+
+class SuccessiveHalvingSearch:
+    """Used like GridSearchCV / RandomizedSearchCV: fit(X, y), then best_estimator_, best_params_, best_score_.
+
+    Starts from every combination of `param_space` when `n_candidates` is
+    None, otherwise from that many random ones. Rounds are the budget, so
+    'n_estimators' in `param_space` is not searched: its largest value is
+    the rounds of the last rung (MAX_ROUNDS without it). X and y must be in
+    time order. `rungs_` lists, per rung, the candidates, their rounds and
+    the best validation macro-F1.
+    """
+
+    def __init__(self, estimator, param_space, n_candidates=None, eta=ETA, min_rounds=MIN_ROUNDS,
+                 validation_fraction=VALIDATION_FRACTION, early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                 n_jobs=None, random_state=None):
+        self.estimator = estimator
+        self.param_space = {k: v for k, v in param_space.items() if k != 'n_estimators'}
+        self.max_rounds = max(param_space.get('n_estimators', [MAX_ROUNDS]))
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.min_rounds = min_rounds
+        self.validation_fraction = validation_fraction
+        self.early_stopping_rounds = early_stopping_rounds
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def _candidates(self):
+        if self.n_candidates is None:
+            return list(ParameterGrid(self.param_space))
+        return list(ParameterSampler(self.param_space, self.n_candidates, random_state=self.random_state))
+
+    def _rungs(self, n):
+        """(candidates, rounds) per rung: candidates shrink by eta, rounds grow by eta up to max_rounds."""
+        sizes = [n]
+        while sizes[-1] > self.eta:
+            sizes.append(math.ceil(sizes[-1] / self.eta))
+        last = len(sizes) - 1
+        return [(size, max(self.min_rounds, int(self.max_rounds / self.eta ** (last - i)))) for i, size in enumerate(sizes)]
+
+    def fit(self, X, y):
+        split = int(len(X) * (1 - self.validation_fraction))
+        X_fit, y_fit, X_val, y_val = X.iloc[:split], y.iloc[:split], X.iloc[split:], y.iloc[split:]
+
+        candidates = self._candidates()
+        self.rungs_ = []
+        for size, rounds in self._rungs(len(candidates)):
+            candidates = candidates[:size]
+            results = Parallel(n_jobs=self.n_jobs)(
+                delayed(_fit_candidate)(self.estimator, params, rounds, X_fit, y_fit, X_val, y_val,
+                                        self.early_stopping_rounds)
+                for params in candidates)
+            order = sorted(range(len(candidates)), key=lambda i: -results[i][0])
+            candidates = [candidates[i] for i in order]
+            results = [results[i] for i in order]
+            self.rungs_.append({'candidates': size, 'rounds': rounds, 'best_f1': results[0][0]})
+
+        self.best_score_, best_rounds = results[0]
+        self.best_params_ = dict(candidates[0], n_estimators=best_rounds)
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
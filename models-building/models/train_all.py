@@ -0,0 +1,115 @@
+import argparse
+import importlib
+import os
+import sys
+import time
+
+import pandas as pd
+from joblib import Parallel, delayed, parallel_config
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Trains the trend and volatility models of every pair under one CPU budget.
+#
+# Work is split on three levels: (model, pair) jobs run in `pair_jobs`
+# worker processes, each job fits `search_jobs` search candidates at once in
+# threads, and each fit uses `threads` LightGBM threads. Their product never
+# exceeds the budget, so no level starts its own "all cores" pool on top of
+# another. Each job's wall time and CPU time are reported; CPU utilization is
+# CPU time over wall time x the cores the job was given.
+
+# Trainer module of each model; they load their dataset on import
+TRAINERS = {'trend': 'direction_train', 'volatility': 'vol_train'}
+SUMMARY_FILE = "model_logs/training_summary.csv"
+
+
+def split_cores(cores, jobs, pair_jobs=None, threads=1):
+    """(pair_jobs, search_jobs, threads) whose product is at most `cores`."""
+    threads = max(1, min(threads, cores))
+    slots = max(1, cores // threads)
+    pair_jobs = max(1, min(pair_jobs or slots, jobs, slots))
+    search_jobs = max(1, slots // pair_jobs)
+    return pair_jobs, search_jobs, threads
+
+
+def _train_pair(model, pair, modes, search_jobs, threads):
+    # Runs in a pair worker. The search's candidates run in threads of this
+    # process, so the process CPU time below covers all of them.
+    trainer = importlib.import_module(TRAINERS[model])
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    with parallel_config(backend="threading"):
+        result = trainer.process_pair(pair, modes, n_jobs=search_jobs, threads=threads)
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    if result is None:
+        return None
+    cores = search_jobs * threads
+    return dict(result, model=model, cores=cores, wall_seconds=wall, cpu_seconds=cpu,
+                cpu_utilization=cpu / (wall * cores))
+
+
+def train(modes, cores=None, pair_jobs=None, threads=1):
+    """Train every pair of each model in `modes` ({model: search modes}); returns one row per (model, pair)."""
+    jobs = [(model, pair) for model in modes for pair in importlib.import_module(TRAINERS[model]).dataset.pairs()]
+    if cores and cores > os.cpu_count():
+        print(f"[WARNING] --cores {cores} is more than the {os.cpu_count()} CPUs here; using {os.cpu_count()}.")
+    cores = min(cores or os.cpu_count(), os.cpu_count())
+    pair_jobs, search_jobs, threads = split_cores(cores, len(jobs), pair_jobs, threads)
+    # No level may oversubscribe another: the three together fit the budget
+    assert pair_jobs * search_jobs * threads <= cores <= os.cpu_count()
+    print(f"[INFO] {len(jobs)} jobs on {cores} of {os.cpu_count()} CPUs: {pair_jobs} pair workers x "
+          f"{search_jobs} search jobs x {threads} LightGBM threads = {pair_jobs * search_jobs * threads} cores")
+
+    start_wall = time.perf_counter()
+    results = Parallel(n_jobs=pair_jobs)(
+        delayed(_train_pair)(model, pair, modes[model], search_jobs, threads) for model, pair in jobs)
+    wall = time.perf_counter() - start_wall
+    results = [res for res in results if res is not None]
+    if not results:
+        print("[WARNING] Nothing was trained.")
+        return pd.DataFrame()
+
+    # Each trainer's own summary, plus timings, in the trainer's column order
+    for model in modes:
+        rows = pd.DataFrame([res for res in results if res['model'] == model])
+        if not rows.empty:
+            summary = rows.drop(columns='model').sort_values(by='f1_macro', ascending=False)
+            summary.to_csv(importlib.import_module(TRAINERS[model]).summary_file, index=False)
+    results = pd.DataFrame(results)
+    # The combined file keeps the rows of models not retrained this time
+    results = results[['model', 'pair'] + [col for col in results.columns if col not in ('model', 'pair')]]
+    combined = results
+    if os.path.exists(SUMMARY_FILE):
+        previous = pd.read_csv(SUMMARY_FILE)
+        combined = pd.concat([previous[~previous['model'].isin(results['model'])], results], ignore_index=True)
+    combined.to_csv(SUMMARY_FILE, index=False)
+
+    cpu = results['cpu_seconds'].sum()
+    print(results[['model', 'pair', 'f1_macro', 'wall_seconds', 'cpu_seconds', 'cpu_utilization']]
+          .round(3).to_string(index=False))
+    print(f"[TOTAL] {wall:.1f}s wall, {cpu:.1f}s CPU, utilization {cpu / (wall * pair_jobs * search_jobs * threads):.0%} "
+          f"of {pair_jobs * search_jobs * threads} cores; per job in {SUMMARY_FILE}")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the trend and volatility models of every pair under one CPU budget.")
+    parser.add_argument("--models", nargs="+", choices=list(TRAINERS), default=list(TRAINERS))
+    parser.add_argument("--halving", action="store_true",
+                        help="Save the successive-halving model instead of the cross-validated search's (grid / random). "
+                             "Both modes always run and are reported side by side.")
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="CPU budget for the whole run.")
+    parser.add_argument("--pair-jobs", type=int, help="Pairs trained at once (default: as many as the budget allows).")
+    parser.add_argument("--threads", type=int, default=1, help="LightGBM threads per fit.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    modes = {}
+    for model in args.models:
+        search_modes = importlib.import_module(TRAINERS[model]).search_modes
+        selected = "halving" if args.halving else search_modes[0]
+        modes[model] = [selected] + [m for m in search_modes if m != selected]
+
+    train(modes, args.cores, args.pair_jobs, args.threads)
+    print("\nAll models saved in /models and reports in /model_logs.")
@@ -1,23 +1,34 @@
+import argparse
 import pandas as pd
 import os
+import sys
+import time
 from sklearn.metrics import classification_report, f1_score, accuracy_score
 from sklearn.model_selection import RandomizedSearchCV
 from lightgbm import LGBMClassifier
-from joblib import dump, Parallel, delayed
+from joblib import dump
 import warnings
 warnings.filterwarnings("ignore")
 
-
-df = pd.read_csv("data/final_vol.csv")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset import PairDataset
+from halving_search import SuccessiveHalvingSearch
 
 # Column setup
 target_col = 'volatility_label'
-exclude_cols = ['time', target_col, 'pair_name'] + [col for col in df.columns if col.startswith('pair_')]
-features = [col for col in df.columns if col not in exclude_cols]
+
+# Labeled rows, sorted by (pair, time) once
+dataset = PairDataset.read_csv("data/final_vol.csv", target=target_col)
+features = dataset.feature_columns()
 
 # Output directories
 os.makedirs("model_logs", exist_ok=True)
 os.makedirs("models", exist_ok=True)
+summary_file = "model_logs/volatility_summary_metrics.csv"
+
+# Search modes: the cross-validated search is the default (its model is kept),
+# successive halving always runs next to it so both are recorded
+search_modes = ("random", "halving")
 
 # Search space for randomized tuning
 param_dist = {
@@ -30,45 +41,63 @@ param_dist = {
     'colsample_bytree': [0.6, 0.8, 1.0]
 }
 
-# Function to process each pair
-def process_pair(pair):
+# Tune with one search mode; returns the fitted search and its wall time.
+# `n_jobs` candidates are fitted at once, each with `threads` LightGBM threads.
+def tune(mode, X_train, y_train, n_jobs=-1, threads=None):
+    # Initialize base model
+    base_model = LGBMClassifier(objective='multiclass', num_class=3, random_state=42, n_jobs=threads)
+
+    if mode == "random":
+        # Randomized search
+        search = RandomizedSearchCV(
+            estimator=base_model,
+            param_distributions=param_dist,
+            n_iter=30,
+            scoring='f1_macro',
+            cv=3,
+            verbose=0,
+            n_jobs=n_jobs,
+            random_state=42
+        )
+    else:
+        # Successive halving affords more starting candidates than the 30 above
+        search = SuccessiveHalvingSearch(base_model, param_dist, n_candidates=81, n_jobs=n_jobs, random_state=42)
+
+    start = time.perf_counter()
+    search.fit(X_train, y_train)
+    return search, time.perf_counter() - start
+
+# Function to process each pair; `modes` are the search modes to run, the first one's model is kept
+def process_pair(pair, modes=search_modes, n_jobs=-1, threads=None):
     print(f"\n[INFO] Processing {pair}...")
     result = {}
 
-    # Prepare data for this pair
-    pair_df = df[df['pair_name'] == pair].sort_values('time').dropna(subset=[target_col])
-    if len(pair_df) < 100:
+    if dataset.size(pair) < 100:
         print(f"[SKIPPED] {pair}: Not enough labeled samples.")
         return None
 
-    # Time-based train/test split
-    split_idx = int(0.8 * len(pair_df))
-    train_df, test_df = pair_df.iloc[:split_idx], pair_df.iloc[split_idx:]
+    # Time-based train/test split (views of the pair's rows)
+    train_df, test_df = dataset.split(pair)
     X_train, y_train = train_df[features], train_df[target_col]
     X_test, y_test = test_df[features], test_df[target_col]
 
-    # Initialize base model
-    base_model = LGBMClassifier(objective='multiclass', num_class=3, random_state=42)
-
-    # Randomized search
-    search = RandomizedSearchCV(
-        estimator=base_model,
-        param_distributions=param_dist,
-        n_iter=30,
-        scoring='f1_macro',
-        cv=3,
-        verbose=0,
-        n_jobs=-1,
-        random_state=42
-    )
-    search.fit(X_train, y_train)
-
-    best_model = search.best_estimator_
-    y_pred = best_model.predict(X_test)
-
-    acc = accuracy_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred, average='macro')
-    report = classification_report(y_test, y_pred, digits=3)
+    # Each mode is evaluated on the same held-out test rows
+    runs = {}
+    for mode in modes:
+        search, seconds = tune(mode, X_train, y_train, n_jobs, threads)
+        y_pred = search.best_estimator_.predict(X_test)
+        runs[mode] = {
+            'search': search,
+            'seconds': seconds,
+            'accuracy': accuracy_score(y_test, y_pred),
+            'f1_macro': f1_score(y_test, y_pred, average='macro'),
+            'report': classification_report(y_test, y_pred, digits=3),
+        }
+        print(f"[{mode.upper()}] {pair} - {seconds:.1f}s, Accuracy: {runs[mode]['accuracy']:.4f}, F1-macro: {runs[mode]['f1_macro']:.4f}")
+
+    run = runs[modes[0]]
+    best_model = run['search'].best_estimator_
+    acc, f1, report = run['accuracy'], run['f1_macro'], run['report']
 
     print(f"[RESULT] {pair} - Accuracy: {acc:.4f}, F1-macro: {f1:.4f}")
 
@@ -77,24 +106,36 @@ def process_pair(pair):
     with open(f"model_logs/{pair}_vol_report.txt", "w") as f:
         f.write(f"== {pair} (Volatility) ==\n")
         f.write(f"Accuracy: {acc:.4f}\nMacro-F1: {f1:.4f}\n")
-        f.write(f"Best Params: {search.best_params_}\n\n")
+        f.write(f"Best Params: {run['search'].best_params_}\n")
+        f.write(f"Search: {modes[0]}\n\n")
+        for mode, r in runs.items():
+            f.write(f"{mode:<8} Macro-F1: {r['f1_macro']:.4f}  Accuracy: {r['accuracy']:.4f}  Wall time: {r['seconds']:.1f}s\n")
+        f.write("\n")
         f.write(report)
 
     # Return result
     result['pair'] = pair
     result['accuracy'] = acc
     result['f1_macro'] = f1
+    result['search'] = modes[0]
+    for mode, r in runs.items():
+        result[f'{mode}_f1_macro'] = r['f1_macro']
+        result[f'{mode}_seconds'] = r['seconds']
     return result
 
-if __name__ == "__main__":
-    # Run in parallel with limited cores (safe for Windows/laptops)
-    pairs = df['pair_name'].dropna().unique()
-    results = Parallel(n_jobs=4)(delayed(process_pair)(pair) for pair in pairs)  # limit to 4 cores
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tune and train one volatility model per pair (train_all.py trains both models).")
+    parser.add_argument("--search", choices=search_modes, default=search_modes[0],
+                        help="Mode whose model is saved: 30 random candidates with 3-fold CV (default) or successive "
+                             "halving with early stopping. Both always run and are reported side by side.")
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="CPU budget for the whole run.")
+    return parser.parse_args()
 
-    # Filter out None results (skipped pairs)
-    results = [res for res in results if res is not None]
+if __name__ == "__main__":
+    args = parse_args()
+    modes = [args.search] + [m for m in search_modes if m != args.search]
 
-    # Save summary
-    summary_df = pd.DataFrame(results).sort_values(by='f1_macro', ascending=False)
-    summary_df.to_csv("model_logs/volatility_summary_metrics.csv", index=False)
+    # Pairs, candidates and LightGBM threads share one CPU budget
+    from train_all import train
+    train({'volatility': modes}, cores=args.cores)
     print("\nAll volatility models saved to /models and logs in /model_logs.")
@@ -0,0 +1,96 @@
+import hashlib
+import inspect
+import json
+import os
+from typing import Callable, Dict, NamedTuple, Tuple
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+from joblib import Parallel, delayed
+
+# Chart rendering, kept apart from the scripts that produce data.
+#
+# A chart is a render function, the slice of data it draws and its
+# parameters. Its key hashes all of them (the function by its source code,
+# plus any input files such as a model), and a manifest maps each saved PNG
+# to the key it was drawn from. Only charts whose key changed, or whose PNG
+# is missing, are drawn again, in a pool of worker processes.
+
+CACHE_FILE = ".plot_cache.json"
+
+
+class Chart(NamedTuple):
+    path: str
+    render: Callable          # render(data, **params) draws on a new figure; saving is done here
+    data: pd.DataFrame        # or a Series
+    params: Dict = {}
+    files: Tuple[str, ...] = ()
+
+
+def chart_key(chart):
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(chart.render).encode())
+    digest.update(repr(sorted(chart.params.items())).encode())
+    if isinstance(chart.data, pd.DataFrame):
+        digest.update(repr(list(chart.data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(chart.data, index=False).to_numpy().tobytes())
+    for path in chart.files:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache, cache_file):
+    tmp = f"{cache_file}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, cache_file)
+
+
+def _draw(chart):
+    # Runs in a worker; an error is returned so one broken chart doesn't stop the others
+    try:
+        os.makedirs(os.path.dirname(chart.path) or ".", exist_ok=True)
+        chart.render(chart.data, **chart.params)
+        plt.tight_layout()
+        plt.savefig(chart.path)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    finally:
+        plt.close("all")
+
+
+def render_charts(charts, cache_file=CACHE_FILE, n_jobs=-1):
+    """Draw the charts that are missing or out of date; returns (drawn, unchanged)."""
+    cache = _load_cache(cache_file)
+    stale = []
+    for chart in charts:
+        chart = chart._replace(path=os.path.normpath(chart.path))
+        key = chart_key(chart)
+        if cache.get(chart.path) != key or not os.path.exists(chart.path):
+            stale.append((chart, key))
+
+    drawn = 0
+    if stale:
+        errors = Parallel(n_jobs=min(n_jobs, len(stale)) if n_jobs > 0 else n_jobs)(
+            delayed(_draw)(chart) for chart, _ in stale)
+        for (chart, key), error in zip(stale, errors):
+            if error is None:
+                cache[chart.path] = key
+                drawn += 1
+            else:
+                cache.pop(chart.path, None)
+                print(f"[FAILED] {chart.path}: {error}")
+        _save_cache(cache, cache_file)
+    return drawn, len(charts) - len(stale)
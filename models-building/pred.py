@@ -1,160 +1,133 @@
-import MetaTrader5 as mt5
 import pandas as pd
 import numpy as np
-import pandas_ta as ta
+import argparse
 import time
 import os
-import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from joblib import load
 from datetime import datetime
 
+from bar_sources import MT5Source, CSVReplaySource, StoreReplaySource
+from bar_store import STORE_DIR, BarStore
+
+# The prediction log writer, feature definitions and outlier filter are shared with the API service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "docked-api", "app"))
+from utils.prediction_log import PredictionLog
+from utils.features import FEATURE_COLS, compute_features
+from utils.outliers import FILTER_FILE, load_filter
+
 # === Configuration ===
 PAIRS = [
     'AUDUSD', 'EURUSD', 'GBPUSD', 'NZDUSD', 'USDCAD',
     'USDCHF', 'USDHKD', 'USDNOK', 'USDSEK'
 ]
-TIMEFRAME = mt5.TIMEFRAME_H4
 CANDLES = 500
 MODEL_PATH = "models"
 DB_PATH = "prediction_logs.db"
-
-# === Initialize MetaTrader 5 ===
-if not mt5.initialize():
-    print("MetaTrader5 initialization failed")
-    quit()
-
-# === SQLite Setup ===
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS predictions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            pair TEXT,
-            trend_class INTEGER,
-            trend_label TEXT,
-            vol_class INTEGER,
-            vol_label TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-# === Compute technical indicators ===
-def compute_indicators(df):
-    df.ta.sma(length=14, append=True)
-    df.ta.adx(length=14, append=True)
-    df.ta.stoch(k=14, d=3, smooth_k=3, append=True)
-    df.ta.rsi(length=14, append=True)
-    df.ta.cci(length=20, append=True)
-    df.ta.roc(length=10, append=True)
-    df.ta.atr(length=14, append=True)
-
-    # Bollinger Bands
-    bb = df.ta.bbands(length=20, std=2.0, append=True)
-    df['bb_width'] = bb['BBU_20_2.0'] - bb['BBL_20_2.0']
-
-    # OBV needs volume, we map tick_volume
-    df['volume'] = df['tick_volume']
-    df.ta.obv(append=True)
-
-    df.ta.mfi(length=14, append=True)
-    df.ta.macd(append=True)
-
-    # Candle features
-    df['candle_body'] = abs(df['close'] - df['open'])
-    df['candle_range'] = df['high'] - df['low']
-
-    # Rename to match model features
-    rename_map = {
-        'SMA_14': 'sma_14',
-        'ADX_14': 'adx_14',
-        'STOCHk_14_3_3': 'stoch_k',
-        'RSI_14': 'rsi_14',
-        'CCI_20_0.015': 'cci_20',
-        'ROC_10': 'roc_10',
-        'ATRr_14': 'atr_14',
-        'OBV': 'obv',
-        'MFI_14': 'mfi_14',
-        'MACD_12_26_9': 'macd_line',
-        'MACDh_12_26_9': 'macd_hist'
-    }
-    df.rename(columns=rename_map, inplace=True)
-
-    return df
-
-# === Insert into SQLite DB ===
-def log_to_db(entry):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO predictions (timestamp, pair, trend_class, trend_label, vol_class, vol_label)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (
-        entry['timestamp'], entry['pair'],
-        entry['trend_class'], entry['trend_label'],
-        entry['vol_class'], entry['vol_label']
-    ))
-    conn.commit()
-    conn.close()
-
-# === Feature columns used for model prediction ===
-FEATURE_COLS = [
-    'open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume',
-    'sma_14', 'adx_14', 'stoch_k', 'rsi_14', 'cci_20', 'roc_10', 'atr_14',
-    'bb_width', 'obv', 'mfi_14', 'macd_line', 'macd_hist', 'candle_body', 'candle_range'
-]
+RETENTION_DAYS = None  # e.g. 90 to prune older predictions
+REPLAY_DIR = "data/separate data"
+RECORD_BARS = True  # Append live MetaTrader5 bars to the bar store (STORE_DIR)
 
 # === Label maps ===
 trend_map = {-1: "Downtrend", 0: "Ranging", 1: "Uptrend"}
 vol_map = {0: "Low", 1: "Medium", 2: "High"}
 
-# === Initialize database if not present ===
-init_db()
+# === Stage timings: {stage: [seconds]}, collected only when set (see replay.py) ===
+stage_seconds = None
+
+@contextmanager
+def stage(name):
+    if stage_seconds is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.setdefault(name, []).append(time.perf_counter() - start)
+
+# === Warm state: the last CANDLES closed bars (outliers replaced), the models and the outlier filter ===
+history = {}
+models = {}
+outlier_filter = None  # Loaded with the models; None if training saved no filter
+bar_store = None  # Set in main when live bars are recorded
 
-# === Run prediction once ===
-print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting prediction test run...\n")
+def get_models(pair):
+    if pair in models:
+        return models[pair]
 
-for pair in PAIRS:
-    rates = mt5.copy_rates_from_pos(pair, TIMEFRAME, 0, CANDLES)
+    trend_model_file = os.path.join(MODEL_PATH, f"{pair}_model.joblib")
+    vol_model_file = os.path.join(MODEL_PATH, f"{pair}_vol_model.joblib")
+
+    if not os.path.exists(trend_model_file) or not os.path.exists(vol_model_file):
+        print(f"[ERROR] Model file(s) missing for {pair}")
+        return None
+
+    try:
+        models[pair] = (load(trend_model_file), load(vol_model_file))
+    except Exception as e:
+        print(f"[ERROR] Could not load model for {pair}: {e}")
+        return None
+    return models[pair]
+
+def load_all_models(workers):
+    global outlier_filter
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(get_models, PAIRS))
+    outlier_filter = load_filter(MODEL_PATH)
+    if outlier_filter is None:
+        print(f"[WARNING] No {FILTER_FILE} in {MODEL_PATH}: bars are used without outlier replacement")
+
+def update_history(source, pair):
+    """Fetch only the bars closed since the last stored one; returns how many."""
+    since = history[pair]['time'].iloc[-1] if pair in history else None
+    with stage("fetch"):
+        new_bars = source.fetch(pair, since=since, count=CANDLES)
+    if new_bars.empty:
+        return 0
+    if bar_store is not None:
+        with stage("store"):
+            bar_store.append(pair, new_bars)  # Pairs never share files, so workers can append concurrently
+    if outlier_filter is not None:
+        # Same per-bar replacement as training; the filter keeps learning from new bars
+        with stage("outliers"):
+            new_bars = outlier_filter.clean_frame(pair, new_bars)
+    bars = new_bars if since is None else pd.concat([history[pair], new_bars], ignore_index=True)
+    history[pair] = bars.tail(CANDLES).reset_index(drop=True)
+    return len(new_bars)
+
+def predict_pair(pair):
+    rates = history.get(pair)
     if rates is None or len(rates) < 60:
         print(f"[WARNING] Not enough data for {pair}")
-        continue
+        return None
 
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    df = compute_indicators(df)
-    print(f"[DEBUG] {pair}: Rows before dropna = {len(df)}, after dropna = {len(df.dropna())}")
-    df.dropna(inplace=True)
+    with stage("indicators"):
+        df = compute_features(rates, FEATURE_COLS)
+        print(f"[DEBUG] {pair}: Rows before dropna = {len(df)}, after dropna = {len(df.dropna())}")
+        df.dropna(inplace=True)
 
     if df.empty:
         print(f"[SKIPPED] {pair}: Indicator calculation resulted in empty data.")
-        continue
+        return None
 
     latest = df.iloc[-1]
     try:
         X = latest[FEATURE_COLS].values.reshape(1, -1)
     except KeyError as e:
         print(f"[ERROR] {pair}: Missing feature column(s): {e}")
-        continue
-
-    trend_model_file = os.path.join(MODEL_PATH, f"{pair}_model.joblib")
-    vol_model_file = os.path.join(MODEL_PATH, f"{pair}_vol_model.joblib")
-
-    if not os.path.exists(trend_model_file) or not os.path.exists(vol_model_file):
-        print(f"[ERROR] Model file(s) missing for {pair}")
-        continue
+        return None
 
-    try:
-        trend_model = load(trend_model_file)
-        vol_model = load(vol_model_file)
-    except Exception as e:
-        print(f"[ERROR] Could not load model for {pair}: {e}")
-        continue
+    pair_models = get_models(pair)
+    if pair_models is None:
+        return None
+    trend_model, vol_model = pair_models
 
-    trend_pred = trend_model.predict(X)[0]
-    vol_pred = vol_model.predict(X)[0]
+    with stage("predict"):
+        trend_pred = trend_model.predict(X)[0]
+        vol_pred = vol_model.predict(X)[0]
 
     entry = {
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -162,11 +135,93 @@ for pair in PAIRS:
         'trend_class': int(trend_pred),
         'trend_label': trend_map.get(trend_pred, "Unknown"),
         'vol_class': int(vol_pred),
-        'vol_label': vol_map.get(vol_pred, "Unknown")
+        'vol_label': vol_map.get(vol_pred, "Unknown"),
+        'bar_time': latest['time']
     }
-
-    log_to_db(entry)
-    print(f"[LOGGED] {pair}: Trend={entry['trend_label']}, Volatility={entry['vol_label']}")
-
-# === Shutdown MetaTrader 5 ===
-mt5.shutdown()
+    return entry
+
+def process_pair(source, pair, only_new):
+    """Fetch, compute indicators and predict for one pair; returns (entry, seconds)."""
+    start = time.perf_counter()
+    new_bars = update_history(source, pair)
+    entry = None
+    if new_bars or not only_new:
+        entry = predict_pair(pair)
+    return entry, time.perf_counter() - start
+
+def run_cycle(source, prediction_log, workers=1, only_new=False):
+    """Update every pair's history and predict; with `only_new`, skip pairs without a new bar.
+
+    Pairs run concurrently on `workers` threads (indicator and LightGBM code
+    release the GIL for most of their work); all results are committed in a
+    single transaction by the log writer.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda pair: process_pair(source, pair, only_new), PAIRS))
+
+    entries = [entry for entry, _ in results if entry is not None]
+    with stage("log"):
+        prediction_log.log_many(entries)
+    for entry in entries:
+        print(f"[LOGGED] {entry['pair']} @ {entry['bar_time']}: Trend={entry['trend_label']}, Volatility={entry['vol_label']}")
+
+    timings = ", ".join(f"{pair}={seconds * 1000:.0f}ms" for pair, (_, seconds) in zip(PAIRS, results))
+    print(f"[TIMING] total={(time.perf_counter() - start) * 1000:.0f}ms ({workers} workers): {timings}")
+    return entries
+
+def run_daemon(source, prediction_log, workers=1):
+    # Warm up from the last CANDLES bars, then wake at each bar close and
+    # fetch only what closed since.
+    run_cycle(source, prediction_log, workers)
+    while True:
+        try:
+            source.wait_for_next_close(PAIRS[0])
+        except StopIteration:
+            print("[DONE] Replay finished.")
+            return
+        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Bar closed, fetching new bars...")
+        run_cycle(source, prediction_log, workers, only_new=True)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Predict trend and volatility regimes for every pair.")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and predict at every H4 bar close.")
+    parser.add_argument("--source", choices=["mt5", "store", "csv"], default="mt5",
+                        help="Live MetaTrader5 bars, or a replay of the bar store or of the exported CSVs.")
+    parser.add_argument("--replay-dir", help=f"Bar store ({STORE_DIR}) or directory of {{pair}}_H4.csv files ({REPLAY_DIR}) to replay.")
+    parser.add_argument("--replay-delay", type=float, default=0.0,
+                        help="Seconds to wait between replayed bars.")
+    parser.add_argument("--workers", type=int, default=min(len(PAIRS), os.cpu_count() or 1),
+                        help="Pairs processed concurrently (1 = one after another).")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.source == "mt5":
+        try:
+            source = MT5Source()
+        except RuntimeError as e:
+            print(e)
+            quit()
+        if RECORD_BARS:
+            bar_store = BarStore(STORE_DIR)
+    elif args.source == "store":
+        source = StoreReplaySource(args.replay_dir or STORE_DIR, pairs=PAIRS, warmup=CANDLES, delay=args.replay_delay)
+    else:
+        source = CSVReplaySource(args.replay_dir or REPLAY_DIR, pairs=PAIRS, warmup=CANDLES, delay=args.replay_delay)
+
+    # === Open the prediction log and load every model once ===
+    prediction_log = PredictionLog(DB_PATH, retention_days=RETENTION_DAYS).start()
+    load_all_models(args.workers)
+
+    print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting prediction {'daemon' if args.daemon else 'test run'}...\n")
+    try:
+        if args.daemon:
+            run_daemon(source, prediction_log, args.workers)
+        else:
+            run_cycle(source, prediction_log, args.workers)
+    except KeyboardInterrupt:
+        print("[STOPPED] Interrupted.")
+    finally:
+        prediction_log.close()
+        source.close()
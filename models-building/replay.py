@@ -0,0 +1,155 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import pred
+from bar_sources import H4, CSVReplaySource, StoreReplaySource, SyntheticSource
+from bar_store import STORE_DIR
+from utils.prediction_log import PredictionLog
+
+# Replays historical bars through pred.py's daemon path (fetch -> indicators
+# -> predict -> log) as fast as possible, or at a chosen speed-up of real
+# time, and reports throughput, stage latencies and peak memory.
+
+STAGES = ["fetch", "outliers", "indicators", "predict", "log", "cycle", "commit"]
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Bytes on macOS, KiB on Linux
+
+
+def alias_pairs(symbols):
+    """`symbols` names cycling over pred.PAIRS; copies reuse the models of their base pair."""
+    names = []
+    for i in range(symbols):
+        base = pred.PAIRS[i % len(pred.PAIRS)]
+        copy = i // len(pred.PAIRS)
+        names.append(base if copy == 0 else f"{base}.{copy}")
+    return names
+
+
+def bars_between(source, start, end):
+    return sum(int(((df['time'] > start) & (df['time'] <= end)).sum()) for df in source.frames.values())
+
+
+def replay(source, prediction_log, workers=1, steps=None):
+    """Warm up, then run one pred.run_cycle per replayed bar close, like pred.run_daemon."""
+    pred.stage_seconds = {}
+    start_clock = source.clock
+    output = io.StringIO()  # pred prints every prediction; keep it off the terminal
+    with contextlib.redirect_stdout(output):
+        pred.run_cycle(source, prediction_log, workers)
+        prediction_log.flush()
+        pred.stage_seconds.clear()  # The warm-up fetches 500 bars per pair; not steady state
+        warmup_rows = prediction_log.stats["rows"]
+
+        started = time.perf_counter()
+        busy = 0.0
+        cycles = 0
+        while steps is None or cycles < steps:
+            try:
+                source.wait_for_next_close()
+            except StopIteration:
+                break
+            with pred.stage("cycle"):
+                pred.run_cycle(source, prediction_log, workers, only_new=True)
+            busy += pred.stage_seconds["cycle"][-1]
+            # pred.py never waits for the writer; flushing here only measures commit latency
+            with pred.stage("commit"):
+                prediction_log.flush()
+            cycles += 1
+        wall = time.perf_counter() - started
+
+    timings, pred.stage_seconds = pred.stage_seconds, None
+    return {
+        "cycles": cycles,
+        "bars": bars_between(source, start_clock, source.clock),
+        "predictions": prediction_log.stats["rows"] - warmup_rows,
+        "wall": wall,
+        "busy": busy,
+        "timings": timings,
+        "peak_rss": peak_rss_bytes(),
+    }
+
+
+def print_report(report, interval=None):
+    bars, busy, wall = report["bars"], report["busy"], report["wall"]
+    print(f"Replayed {report['cycles']} bar closes: {bars} bars, {report['predictions']} predictions logged")
+    print(f"Throughput: {bars / busy if busy else 0:.1f} bars/sec processing, {bars / wall if wall else 0:.1f} bars/sec wall clock")
+    print(f"\n{'stage':<12}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name in STAGES:
+        values = report["timings"].get(name)
+        if not values:
+            continue
+        p50, p90, p99 = np.percentile(values, [50, 90, 99]) * 1000
+        print(f"{name:<12}{len(values):>8}{p50:>10.2f}{p90:>10.2f}{p99:>10.2f}{max(values) * 1000:>10.2f}")
+
+    if report["peak_rss"] is not None:
+        print(f"\nPeak memory (RSS): {report['peak_rss'] / 2**20:.1f} MiB")
+    cycles = report["timings"].get("cycle")
+    if interval and cycles:
+        # A cycle slower than the bar interval means the replay (or live feed) is falling behind
+        late = sum(seconds > interval for seconds in cycles)
+        print(f"Cycles slower than the {interval:.3g}s bar interval: {late} of {len(cycles)}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay historical bars through the pred.py pipeline and report throughput.")
+    parser.add_argument("--source", choices=["csv", "store", "synthetic"], default="csv")
+    parser.add_argument("--replay-dir", help=f"Directory of {{pair}}_H4.csv files ({pred.REPLAY_DIR}) or bar store ({STORE_DIR}).")
+    parser.add_argument("--symbols", type=int, default=len(pred.PAIRS),
+                        help="Synthetic symbols; beyond the modelled pairs, copies reuse their models.")
+    parser.add_argument("--bars", type=int, default=3000, help="Bars per synthetic symbol.")
+    parser.add_argument("--speedup", type=float, default=0,
+                        help="Replay at this multiple of real time (14400 = one H4 bar per second); 0 = as fast as possible.")
+    parser.add_argument("--steps", type=int, help="Stop after this many bar closes.")
+    parser.add_argument("--workers", type=int, default=1, help="Pairs processed concurrently, as in pred.py.")
+    parser.add_argument("--db", help="Prediction log to write (default: a temporary database).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    interval = H4.total_seconds() / args.speedup if args.speedup else None
+    delay = interval or 0.0
+
+    if args.source == "synthetic":
+        pairs = alias_pairs(args.symbols)
+        source = SyntheticSource(pairs, bars=args.bars, warmup=pred.CANDLES, delay=delay)
+    elif args.source == "store":
+        pairs = pred.PAIRS
+        source = StoreReplaySource(args.replay_dir or STORE_DIR, pairs=pairs, warmup=pred.CANDLES, delay=delay)
+    else:
+        pairs = pred.PAIRS
+        source = CSVReplaySource(args.replay_dir or pred.REPLAY_DIR, pairs=pairs, warmup=pred.CANDLES, delay=delay)
+
+    pred.load_all_models(args.workers)
+    for pair in pairs:
+        if pair not in pred.models:
+            pred.models[pair] = pred.get_models(pair.split(".")[0])
+    pred.PAIRS = pairs
+    load_rss = peak_rss_bytes()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prediction_log = PredictionLog(args.db or os.path.join(tmp, "replay.db")).start()
+        try:
+            report = replay(source, prediction_log, args.workers, args.steps)
+        finally:
+            prediction_log.close()
+
+    print(f"{len(pairs)} symbols from {args.source}, {args.workers} worker(s), "
+          f"{'max speed' if not args.speedup else f'{args.speedup:g}x real time'}")
+    if load_rss is not None:
+        print(f"Memory after loading data and models: {load_rss / 2**20:.1f} MiB")
+    print_report(report, interval)
@@ -0,0 +1,96 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bar_sources import MT5Source
+from bar_store import BarStore
+
+# extraction.py fetches through MT5Source and appends to the BarStore. The bar
+# still forming must never reach the store: later runs skip bars that are
+# already stored, so a partial bar would keep its truncated OHLC for good.
+
+RATE_DTYPE = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                       ('tick_volume', '<i8'), ('spread', '<i4'), ('real_volume', '<i8')])
+H4 = 4 * 60 * 60
+START = 1_700_006_400  # A bar open (multiple of 4h)
+
+
+class FakeTerminal(types.ModuleType):
+    """The parts of the MetaTrader5 module MT5Source uses, over a list of bars.
+
+    The last bar is the one forming; `tick` moves the clock within it and
+    `close_bar` finishes it with its final close and opens the next one.
+    """
+
+    TIMEFRAME_H4 = 16388
+
+    def __init__(self, bars):
+        super().__init__("MetaTrader5")
+        self.rates = np.zeros(bars, dtype=RATE_DTYPE)
+        self.rates['time'] = START + H4 * np.arange(bars)
+        self.rates['close'] = 1.0 + 0.01 * np.arange(bars)
+        self.rates['open'] = self.rates['low'] = self.rates['close'] - 0.005
+        self.rates['high'] = self.rates['close'] + 0.005
+
+    def initialize(self, **login):
+        return True
+
+    def last_error(self):
+        return (1, "Success")
+
+    def shutdown(self):
+        pass
+
+    def copy_rates_from_pos(self, symbol, timeframe, start, count):
+        end = len(self.rates) - start
+        return self.rates[max(end - count, 0):end].copy()
+
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        times = self.rates['time']
+        return self.rates[(times >= date_from.timestamp()) & (times <= date_to.timestamp())].copy()
+
+    def close_bar(self, final_close):
+        self.rates[-1]['close'] = final_close
+        following = self.rates[-1:].copy()
+        following['time'] += H4
+        self.rates = np.concatenate([self.rates, following])
+
+
+@pytest.fixture
+def terminal(monkeypatch):
+    fake = FakeTerminal(bars=20)
+    monkeypatch.setitem(sys.modules, "MetaTrader5", fake)
+    return fake
+
+
+def test_forming_bar_is_not_stored(terminal, tmp_path):
+    store = BarStore(str(tmp_path))
+    source = MT5Source()
+    forming = int(terminal.rates['time'][-1])
+
+    assert store.append("EURUSD", source.fetch("EURUSD", count=3000)) == 19
+    assert store.last_time("EURUSD") == forming - H4
+
+    # The forming bar closes well away from the price it had on the first run
+    terminal.rates[-1]['close'] = 1.5
+    terminal.close_bar(final_close=2.0)
+    assert store.append("EURUSD", source.fetch("EURUSD", count=3000)) == 1
+
+    stored = store.frame("EURUSD")
+    assert stored['time'].iloc[-1].timestamp() == forming
+    assert stored['close'].iloc[-1] == 2.0
+    np.testing.assert_array_equal(stored['close'].to_numpy(), terminal.rates['close'][:-1])
+
+
+def test_fetch_since_returns_only_new_closed_bars(terminal):
+    source = MT5Source()
+    last = source.fetch("EURUSD", count=3000)['time'].iloc[-1]
+    terminal.close_bar(final_close=2.0)
+    terminal.close_bar(final_close=2.1)
+
+    new = source.fetch("EURUSD", since=last)
+    assert list(new['close']) == [2.0, 2.1]
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bar_store import COLUMNS, read_unified, write_unified
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "separate data")
+
+
+def _pair_frames(pairs=("EURUSD", "USDHKD", "USDJPY")):
+    return {pair: pd.read_csv(os.path.join(DATA_DIR, f"{pair}_H4.csv"), parse_dates=['time']) for pair in pairs}
+
+
+def test_unified_round_trip(tmp_path):
+    frames = _pair_frames()
+    path = str(tmp_path / "ohlcv.npz")
+    assert write_unified(path, frames.items()) == sum(len(df) for df in frames.values())
+
+    df = read_unified(path)
+    assert isinstance(df['pair'].dtype, pd.CategoricalDtype)
+    assert list(df['pair'].cat.categories) == list(frames)
+    # Rows stay grouped by pair, in the order written
+    for pair, expected in frames.items():
+        rows = df[df['pair'] == pair].drop(columns='pair').reset_index(drop=True)
+        pd.testing.assert_frame_equal(rows, expected[list(COLUMNS)], check_dtype=False, rtol=1e-12)
+
+
+def test_unified_rejects_prices_it_cannot_store_exactly(tmp_path):
+    df = _pair_frames(("EURUSD",))["EURUSD"].head(5)
+    df.loc[2, 'close'] += 0.000001
+    with pytest.raises(ValueError, match="EURUSD close"):
+        write_unified(str(tmp_path / "ohlcv.npz"), [("EURUSD", df)])
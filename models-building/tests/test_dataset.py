@@ -0,0 +1,93 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset import PairDataset
+
+PAIRS = {"USDJPY": 7, "EURUSD": 5, "GBPUSD": 10}
+
+
+@pytest.fixture
+def df():
+    """Pairs of different lengths, rows shuffled, one unlabeled bar and one row without a pair."""
+    frames = [pd.DataFrame({
+        'time': pd.date_range("2025-01-06", periods=n, freq="4h"),
+        'pair_name': pair,
+        'close': 100.0 * (j + 1) + np.arange(n),
+        'label': np.arange(n) % 3,
+    }) for j, (pair, n) in enumerate(PAIRS.items())]
+    df = pd.concat(frames, ignore_index=True)
+    df['label'] = df['label'].astype(float)
+    df.loc[len(df)] = [pd.Timestamp("2025-01-06"), None, 0.0, 1.0]
+    df.loc[3, 'label'] = np.nan
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def test_each_pair_is_one_contiguous_time_ordered_slice(df):
+    dataset = PairDataset(df)
+    assert dataset.pairs() == sorted(PAIRS)
+    assert len(dataset) == sum(PAIRS.values())  # The row without a pair is dropped
+
+    position = 0
+    for pair, rows in dataset:
+        start, stop = dataset.bounds[pair]
+        assert (start, stop) == (position, position + PAIRS[pair])
+        assert dataset.size(pair) == PAIRS[pair]
+        assert (rows['pair_name'] == pair).all()
+        assert rows['time'].is_monotonic_increasing
+        assert list(rows.index) == list(range(start, stop))
+        position = stop
+    assert position == len(dataset)
+
+
+def test_split_is_chronological_within_the_pair(df):
+    dataset = PairDataset(df)
+    train, test = dataset.split("GBPUSD")
+    assert (len(train), len(test)) == (8, 2)
+    assert train['time'].max() < test['time'].min()
+    assert dataset.split_index("GBPUSD", 0.5) == 5
+    pd.testing.assert_frame_equal(pd.concat([train, test]), dataset["GBPUSD"])
+
+
+def test_target_drops_unlabeled_rows(df):
+    dataset = PairDataset(df, target='label')
+    assert dataset.size("USDJPY") == PAIRS["USDJPY"] - 1
+    assert not dataset.frame['label'].isna().any()
+    assert dataset.feature_columns() == ['close']
+
+
+def test_panel_and_unpack_round_trip(df):
+    dataset = PairDataset(df)
+    panel = dataset.panel('close')
+    assert panel.shape == (max(PAIRS.values()), len(PAIRS))
+    for j, pair in enumerate(dataset.pairs()):
+        n = dataset.size(pair)
+        np.testing.assert_array_equal(panel[:n, j], dataset[pair]['close'].to_numpy())
+        assert np.isnan(panel[n:, j]).all()  # Padding after the pair's last bar
+
+    np.testing.assert_array_equal(dataset.unpack(panel), dataset.frame['close'].to_numpy())
+    # Column-wise work on the panel comes back aligned with the frame, per pair
+    cumulative = dataset.unpack(np.nancumsum(panel, axis=0))
+    expected = dataset.frame.groupby('pair_name', sort=False)['close'].cumsum().to_numpy()
+    np.testing.assert_array_equal(cumulative, expected)
+
+
+def test_empty_dataset(df):
+    dataset = PairDataset(df.iloc[:0])
+    assert dataset.pairs() == [] and len(dataset) == 0
+    assert dataset.panel('close').shape == (0, 0)
+    assert dataset.unpack(dataset.panel('close')).shape == (0,)
+
+
+def test_read_csv_reads_the_pair_as_category(df, tmp_path):
+    path = tmp_path / "bars.csv"
+    df.to_csv(path, index=False)
+    dataset = PairDataset.read_csv(path, parse_dates=['time'])
+    assert isinstance(dataset.frame['pair_name'].dtype, pd.CategoricalDtype)
+    assert dataset.pairs() == sorted(PAIRS)
+    pd.testing.assert_frame_equal(dataset["EURUSD"].drop(columns='pair_name'),
+                                  PairDataset(df)["EURUSD"].drop(columns='pair_name'))
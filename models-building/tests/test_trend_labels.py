@@ -0,0 +1,83 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "labeling"))
+from dataset import PairDataset
+from trend_labels import trend_variants, variant_name
+
+# trend_variants must give exactly the labels of the per-row apply it replaced
+# in market_direction_label.py, kept here as the reference.
+
+SHORT, LONG, ATR, MULTIPLIERS = [3, 5], [8, 12], [4, 6], [0.25, 0.5, 1.0]
+
+
+def apply_labels(df, short, long, atr_window, multiplier, use_ema):
+    """The old labeler: a groupby per pair and a Python call per row."""
+    labeled = []
+    for _, group in df.groupby('pair_name', observed=True):
+        group = group.sort_values(by='time').copy()
+        if use_ema:
+            group['ma_short'] = group['close'].ewm(span=short, adjust=False).mean()
+            group['ma_long'] = group['close'].ewm(span=long, adjust=False).mean()
+        else:
+            group['ma_short'] = group['close'].rolling(window=short).mean()
+            group['ma_long'] = group['close'].rolling(window=long).mean()
+        group['atr'] = (group['high'] - group['low']).rolling(window=atr_window).mean()
+
+        def compute_label(row):
+            if pd.isna(row['ma_short']) or pd.isna(row['ma_long']) or pd.isna(row['atr']):
+                return np.nan
+            diff = row['ma_short'] - row['ma_long']
+            if abs(diff) < row['atr'] * multiplier:
+                return 0
+            return 1 if diff > 0 else -1
+
+        group['trend_label'] = group.apply(compute_label, axis=1)
+        labeled.append(group)
+    return pd.concat(labeled)
+
+
+@pytest.fixture(scope="module")
+def bars():
+    """Three pairs of different lengths, rows shuffled across pairs."""
+    rng = np.random.default_rng(7)
+    frames = []
+    for pair, n in [("EURUSD", 60), ("USDJPY", 45), ("GBPUSD", 80)]:
+        close = 1.0 + np.cumsum(rng.normal(0, 0.01, n))
+        close[20:30] = close[19]  # A flat stretch: zero MA gap and zero range
+        spread = np.abs(rng.normal(0, 0.005, n))
+        spread[20:30] = 0.0
+        frames.append(pd.DataFrame({
+            'time': pd.date_range("2025-01-06", periods=n, freq="4h"),
+            'pair_name': pair,
+            'close': close,
+            'high': close + spread,
+            'low': close - spread,
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("use_ema", [True, False])
+def test_matches_per_row_apply(bars, use_ema):
+    dataset = PairDataset(bars)
+    labels = trend_variants(dataset, SHORT, LONG, ATR, MULTIPLIERS, use_ema=use_ema)
+    assert labels.shape == (len(bars), len(SHORT) * len(LONG) * len(ATR) * len(MULTIPLIERS))
+
+    for short, long, atr, multiplier in itertools.product(SHORT, LONG, ATR, MULTIPLIERS):
+        expected = apply_labels(bars, short, long, atr, multiplier, use_ema)
+        # Both sides in (pair, time) order
+        expected = expected.sort_values(['pair_name', 'time'], kind='stable')['trend_label'].to_numpy(dtype=float)
+        np.testing.assert_array_equal(labels[variant_name(short, long, atr, multiplier)].to_numpy(), expected,
+                                      err_msg=variant_name(short, long, atr, multiplier))
+
+
+def test_skips_short_not_below_long(bars):
+    labels = trend_variants(PairDataset(bars), [5, 8], [8], [4], [0.5])
+    assert list(labels.columns) == [variant_name(5, 8, 4, 0.5)]
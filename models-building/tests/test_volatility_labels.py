@@ -0,0 +1,60 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "labeling"))
+from dataset import PairDataset
+from volatility_labels import VOL_COLUMN, WINDOW, VolatilityLabeler, replay, volatility_labels
+
+# The batch labels used for training must be exactly what the live labeler
+# gives when the same bars arrive one at a time, for the default window, a
+# short one and an expanding one.
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    """Pairs longer and shorter than WINDOW, with warm-up NaNs, gaps and tied values."""
+    rng = np.random.default_rng(3)
+    frames = []
+    for pair, n in [("EURUSD", WINDOW + 700), ("USDJPY", WINDOW + 50), ("NZDUSD", 250)]:
+        # Volatility regimes shift, so old bars leaving the window matter
+        level = np.repeat(rng.uniform(0.5, 3.0, n // 200 + 1), 200)[:n]
+        atr = np.round(level * rng.lognormal(0, 0.3, n), 2)  # Rounded: many ties
+        atr[:13] = np.nan  # atr_14 warming up
+        atr[rng.random(n) < 0.01] = np.nan
+        frames.append(pd.DataFrame({
+            'time': pd.date_range("2020-01-01", periods=n, freq="4h"),
+            'pair_name': pair,
+            VOL_COLUMN: atr,
+        }))
+    return PairDataset(pd.concat(frames, ignore_index=True).sample(frac=1, random_state=1))
+
+
+@pytest.mark.parametrize("window", [WINDOW, 300, None])
+def test_batch_matches_bar_by_bar(dataset, window):
+    batch = volatility_labels(dataset, window=window)
+    live = replay(dataset, window=window)
+    pd.testing.assert_series_equal(batch, live)
+
+    labeled = batch.dropna()
+    assert set(labeled.unique()) == {0.0, 1.0, 2.0}
+    # Every pair starts labeling once it has MIN_PERIODS values
+    assert batch.isna().sum() < len(batch) / 2
+
+
+def test_window_changes_the_labels(dataset):
+    # Otherwise the test above would not exercise evictions
+    assert not volatility_labels(dataset, window=300).equals(volatility_labels(dataset, window=None))
+    assert not volatility_labels(dataset, window=WINDOW).equals(volatility_labels(dataset, window=None))
+
+
+def test_labels_never_change_once_given(dataset):
+    rows = dataset["EURUSD"]
+    labeler = VolatilityLabeler()
+    live = [labeler.update(value) for value in rows[VOL_COLUMN]]
+    prefix = PairDataset(rows.iloc[:WINDOW + 100])
+    np.testing.assert_array_equal(volatility_labels(prefix).to_numpy(), live[:WINDOW + 100])